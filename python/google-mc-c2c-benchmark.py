@@ -0,0 +1,844 @@
+#################################################################
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Migration Pricing Reports C2C Data Import - Synthetic data generator & ingest benchmark
+
+# v0.2
+# Google
+# amarcum@google.com
+#################################################################
+
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyarrow.csv as pyarrow_csv
+import gspread
+import requests
+import importlib.util
+import contextlib
+import subprocess
+import argparse
+import resource
+import tempfile
+import shutil
+import threading
+import random
+import copy
+import time
+import json
+import sys
+import io
+import os
+import re
+
+script_directory = os.path.dirname(os.path.abspath(__file__))
+import_script = os.path.join(script_directory, "google-mc-c2c-data-import.py")
+
+# Row counts benchmarked by default
+default_benchmark_rows = "1000000,10000000,60000000"
+
+# Rows generated & written to the CSV files at a time
+generate_block_rows = 100000
+
+# Benchmark stages & the run metrics phases timing them. The pandas MC reader renames & converts each chunk while
+# parsing it, so its parse time includes the rename & validate time. With --parquet the MC files are parsed &
+# serialized by the Parquet staging.
+benchmark_stages = {
+    "parse": "csv_parse",
+    "rename": "column_rename",
+    "validate": "schema_conversion",
+    "serialize": "serialize",
+    "parquet": "parquet_staging"
+}
+
+# Report building scenarios of the Sheets benchmark & their import script arguments. {mc} & {cur} are the generated
+# data directories, {template} the ID of the fake template spreadsheet.
+sheets_benchmark_scenarios = {
+    "sheets": ["-d", "{mc}"],
+    "aggregate": ["-d", "{mc}", "--aggregate"],
+    "mc-connected": ["-d", "{mc}", "-b", "-n", "-o", "-i", "benchmark.benchmark.mc_"],
+    "cur-connected": ["-d", "{cur}", "-a", "-n", "-o", "-i", "benchmark.benchmark.cur"],
+    "mc-template": ["-d", "{mc}", "-b", "-n", "-o", "-i", "benchmark.benchmark.mc_", "--sheets-template", "{template}"]
+}
+fake_template_id = "fake-template"
+
+# Distinct values per column, None means a unique value on every row. Other columns get default_cardinality values.
+default_cardinality = 20
+column_cardinalities = {
+    "ID": None,
+    "identity_LineItemIds": None,
+    "identity_LineItemId": None,
+    "Account_Or_Subscription": 50,
+    "lineItem_UsageAccountId": 50,
+    "Source_Product": 40,
+    "Source_Product_Name": 40,
+    "lineItem_ProductCode": 40,
+    "lineItem_ProductName": 40,
+    "product_ProductName": 40,
+    "GCP_Service": 15,
+    "Description": 5000,
+    "lineItem_LineItemDescription": 5000,
+    "Source_Shape": 300,
+    "Destination_Shape": 150,
+    "product_instanceType": 300,
+    "lineItem_UsageType": 2000,
+    "lineItem_Operation": 200,
+    "lineItem_ResourceId": 100000,
+    "Source_Currency": 1,
+    "GCP_Currency": 1,
+    "lineItem_CurrencyCode": 1,
+    "Warning": 3,
+    "Error": 3
+}
+
+# Realistic values for some columns, the other columns get "<column> <n>" values
+column_values = {
+    "Region": ["us-east-1", "us-east-2", "us-west-1", "us-west-2", "eu-west-1", "eu-central-1", "ap-southeast-1",
+               "ap-northeast-1", "ca-central-1", "sa-east-1"],
+    "product_region": ["us-east-1", "us-east-2", "us-west-1", "us-west-2", "eu-west-1", "eu-central-1",
+                       "ap-southeast-1", "ap-northeast-1", "ca-central-1", "sa-east-1"],
+    "Item_Type": ["Compute", "Storage", "Database", "Network", "Other"],
+    "GCP_Service": ["Compute Engine", "Cloud Storage", "Cloud SQL", "Persistent Disk", "Cloud Load Balancing",
+                    "Networking", "BigQuery", "Cloud Run"],
+    "Destination_Series": ["N2", "N2D", "E2", "C3", "T2D", "N4"],
+    "Quantity_Type": ["Hours", "GB-Mo", "Requests", "GB"],
+    "Source_Currency": ["USD"],
+    "GCP_Currency": ["USD"],
+    "lineItem_CurrencyCode": ["USD"],
+    "lineItem_LineItemType": ["Usage", "Tax", "Credit", "DiscountedUsage", "SavingsPlanCoveredUsage"],
+    "pricing_term": ["OnDemand", "Reserved"],
+    "pricing_unit": ["Hrs", "GB-Mo", "Requests", "GB"],
+    "product_operatingSystem": ["Linux", "Windows", "RHEL", "SUSE"]
+}
+
+# Machine sizes for the number columns that describe shapes, Memory_GB is vCPUs times one of memory_per_vcpu like
+# the standard, highmem & highcpu machine types. The other number columns are costs & amounts with continuous values
+column_number_values = {
+    "vCPUs": [1, 2, 4, 8, 16, 32, 48, 64, 96],
+    "External_Memory_GB": [10, 20, 50, 100, 200, 500, 1000, 2000]
+}
+memory_per_vcpu = [1, 2, 4, 8]
+
+# Share of empty values per column
+column_empty_shares = {
+    "External_Memory_GB": 0.9,
+    "Sub_Type_2": 0.7,
+    "Warning": 0.95,
+    "Warning_Messages": 0.95,
+    "Error": 0.95,
+    "ErrorMessage": 0.95,
+    "product_instanceType": 0.5,
+    "product_operatingSystem": 0.5
+}
+
+# Free text columns, some values have commas, quotes & newlines so the CSV files have quoted multi-line values
+text_columns = ["Description", "lineItem_LineItemDescription", "Warning_Messages", "ErrorMessage"]
+
+# CUR columns holding numbers & timestamps
+cur_number_columns = ["lineItem_UsageAmount", "lineItem_UnblendedRate", "lineItem_UnblendedCost",
+                      "lineItem_BlendedCost"]
+cur_timestamp_columns = ["identity_TimeInterval", "bill_BillingPeriodStartDate", "lineItem_UsageStartDate",
+                         "lineItem_UsageEndDate"]
+
+
+def load_settings():
+    with open(os.path.join(script_directory, "settings.json")) as f:
+        return json.load(f)
+
+
+# Load the import script as a module, it isn't importable by name because of the dashes in the file name
+def load_import_module():
+    spec = importlib.util.spec_from_file_location("c2c_data_import", import_script)
+    c2c = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(c2c)
+    return c2c
+
+
+# Values a column is generated from
+def column_value_pool(column):
+    if column in column_values:
+        return np.array(column_values[column], dtype=object)
+
+    cardinality = column_cardinalities.get(column, default_cardinality)
+    values = [f"{column} {x}" for x in range(cardinality)]
+    if column in text_columns:
+        for x in range(0, cardinality, 10):
+            values[x] = f'{values[x]}, "quoted" text\nwith a second line'
+
+    return np.array(values, dtype=object)
+
+
+# Generate a block of rows, rows are numbered from first_row so unique values stay unique across blocks
+def generate_rows(rng, columns, first_row, num_rows, value_pools):
+    rows = {}
+    for column, column_type in columns.items():
+        if column == "Memory_GB" and "vCPUs" in rows:
+            values = rows["vCPUs"] * rng.choice(memory_per_vcpu, num_rows)
+        elif column in column_number_values:
+            # Skewed towards the smaller sizes
+            number_values = np.array(column_number_values[column], dtype=float)
+            values = pd.Series(number_values[(len(number_values) * rng.random(num_rows) ** 2).astype(int)])
+        elif column_type == "FLOAT64":
+            values = pd.Series(rng.gamma(2.0, 50.0, num_rows).round(6))
+        elif column_type == "TIMESTAMP":
+            hours = rng.integers(0, 24 * 30, num_rows)
+            values = pd.Series(pd.Timestamp("2024-01-01", tz="UTC") + pd.to_timedelta(hours, unit="h"))
+            values = values.dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+        elif column_cardinalities.get(column, default_cardinality) is None:
+            values = pd.Series(np.arange(first_row, first_row + num_rows)).map(f"{column}-{{}}".format)
+        else:
+            # Skewed towards the first values in the pool, like real accounts, products & regions
+            value_pool = value_pools[column]
+            values = pd.Series(value_pool[(len(value_pool) * rng.random(num_rows) ** 2).astype(int)])
+
+        empty_share = column_empty_shares.get(column)
+        if empty_share is not None:
+            values = values.where(rng.random(num_rows) >= empty_share)
+
+        rows[column] = values
+
+    return pd.DataFrame(rows)
+
+
+# Write num_rows generated rows to a CSV file, the header uses header_names in place of the column names
+def write_csv_file(rng, csv_file, columns, num_rows, first_row=0, header_names=None):
+    value_pools = {}
+    for column, column_type in columns.items():
+        if column_type == "STRING" and column_cardinalities.get(column, default_cardinality) is not None:
+            value_pools[column] = column_value_pool(column)
+
+    with open(csv_file, "w", newline="") as f:
+        header = True if header_names is None else header_names
+        for block_row in range(0, max(num_rows, 1), generate_block_rows):
+            block_rows = min(generate_block_rows, num_rows - block_row)
+            rows = generate_rows(rng, columns, first_row + block_row, block_rows, value_pools)
+            rows.to_csv(f, index=False, header=header, lineterminator="\n")
+            header = False
+
+
+# Generate Migration Center report files (mapped, unmapped & discount) & AWS CUR files with the settings.json columns
+def generate_data(data_directory, rows, cur_files, seed):
+    settings = load_settings()
+    rng = np.random.default_rng(seed)
+
+    mc_directory = os.path.join(data_directory, "mc")
+    os.makedirs(mc_directory, exist_ok=True)
+    mc_rows = {"mapped": rows, "unmapped": rows, "discount": rows // 100}
+    for file, columns in settings["mc_column_names"].items():
+        csv_file = os.path.join(mc_directory, f"{file}.csv")
+        print(f"Generating {mc_rows[file]} rows in {csv_file}")
+        write_csv_file(rng, csv_file, columns, mc_rows[file])
+
+    # CUR CSV files name columns lineItem/UsageStartDate, the import replaces the / with _
+    cur_directory = os.path.join(data_directory, "cur")
+    os.makedirs(cur_directory, exist_ok=True)
+    cur_column_types = {}
+    for column in settings["cur_columns"].keys():
+        if column in cur_number_columns:
+            cur_column_types[column] = "FLOAT64"
+        elif column in cur_timestamp_columns:
+            cur_column_types[column] = "TIMESTAMP"
+        else:
+            cur_column_types[column] = "STRING"
+    cur_header = [x.replace("_", "/", 1) for x in cur_column_types.keys()]
+
+    cur_file_rows = -(-rows // cur_files)
+    for cur_file in range(cur_files):
+        first_row = cur_file * cur_file_rows
+        csv_file = os.path.join(cur_directory, f"cur-{cur_file + 1:05d}.csv")
+        print(f"Generating {min(cur_file_rows, rows - first_row)} rows in {csv_file}")
+        write_csv_file(rng, csv_file, cur_column_types, min(cur_file_rows, rows - first_row), first_row, cur_header)
+
+    with open(os.path.join(data_directory, "generated.json"), "w") as f:
+        json.dump({"rows": rows, "cur_files": cur_files, "seed": seed}, f, indent=4)
+
+
+# Offline sink for the import functions. Dataframes are serialized to header-less CSV like the BQ client does before an
+# upload & the rows the load job would read are counted, nothing is uploaded.
+class BenchmarkSink:
+    def __init__(self, c2c):
+        self.c2c = c2c
+        self.destination = "benchmark"
+        self.tables = {}
+        self.load_jobs = 0
+
+    def create_dataset(self, dataset_id):
+        pass
+
+    def table_exists(self, table_id):
+        return table_id in self.tables
+
+    def delete_table(self, table_id):
+        self.tables.pop(table_id, None)
+
+    def table_size(self, table_id):
+        return self.tables[table_id]
+
+    def table_layout_changed(self, table_id, table_layout):
+        return False
+
+    def add_rows(self, table_id, write_disposition, num_rows, num_columns):
+        if write_disposition == self.c2c.bigquery.WriteDisposition.WRITE_TRUNCATE or table_id not in self.tables:
+            self.tables[table_id] = (0, num_columns)
+        self.tables[table_id] = (self.tables[table_id][0] + num_rows, num_columns)
+        self.load_jobs += 1
+        return f"benchmark-{self.load_jobs}"
+
+    def load_dataframe(self, dataframe, table_id, write_disposition, table_layout, column_types=None):
+        job_config = self.c2c.dataframe_load_job_config(write_disposition, table_layout, dataframe.columns,
+                                                         column_types)
+
+        with tempfile.TemporaryDirectory() as serialize_directory:
+            csv_file = os.path.join(serialize_directory, "upload.csv")
+            with self.c2c.run_metrics.phase("serialize", rows=len(dataframe)) as measurement:
+                dataframe.to_csv(csv_file, index=False, header=False, encoding="utf-8", float_format="%.17g",
+                                 date_format="%Y-%m-%d %H:%M:%S.%f")
+                measurement["bytes"] = os.path.getsize(csv_file)
+
+            num_rows = self.count_loaded_rows(csv_file, job_config, len(dataframe.columns))
+
+        if num_rows != len(dataframe):
+            print(f"Load job for {table_id} would load {num_rows} of {len(dataframe)} rows! Exiting!")
+            exit(1)
+
+        return self.add_rows(table_id, write_disposition, num_rows, len(dataframe.columns))
+
+    # Rows BQ would load from the uploaded CSV file with the load job settings
+    def count_loaded_rows(self, csv_file, job_config, num_columns):
+        column_names = [f"column_{x}" for x in range(num_columns)]
+        read_options = pyarrow_csv.ReadOptions(column_names=column_names)
+        parse_options = pyarrow_csv.ParseOptions(newlines_in_values=job_config.allow_quoted_newlines is True)
+        convert_options = pyarrow_csv.ConvertOptions(column_types={x: pa.string() for x in column_names})
+        csv_rows = pyarrow_csv.read_csv(csv_file, read_options=read_options, parse_options=parse_options,
+                                        convert_options=convert_options).num_rows
+        return csv_rows - (job_config.skip_leading_rows or 0)
+
+    # Parquet staged files are already serialized
+    def load_parquet(self, parquet_file, table_id, write_disposition, table_layout):
+        parquet_metadata = pq.read_metadata(parquet_file)
+        return self.add_rows(table_id, write_disposition, parquet_metadata.num_rows, parquet_metadata.num_columns)
+
+
+# Recording fake of the Sheets & Drive APIs, used in place of the authorized HTTP session of the gspread client.
+# Spreadsheets are kept in memory & answered with replies shaped like the real APIs (sheetIds, dataSourceIds). Every
+# call can be delayed by a simulated latency & a share of the calls is answered with quota errors.
+class FakeGoogleApiSession:
+    def __init__(self, latency=0.0, error_rate=0.0, seed=1):
+        self.lock = threading.Lock()
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.spreadsheets = {}
+        self.file_count = 0
+        self.calls = []
+
+    def get(self, url, **kwargs):
+        return self.request("get", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("post", url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request("put", url, **kwargs)
+
+    def request(self, method, url, **kwargs):
+        body = kwargs.get("json")
+        if body is not None:
+            bytes_sent = len(json.dumps(body))
+        else:
+            bytes_sent = len(kwargs.get("data") or "")
+
+        time.sleep(self.latency)
+
+        with self.lock:
+            endpoint = self.endpoint_name(url)
+            if self.random.random() < self.error_rate:
+                status, reply = self.error(429, "RESOURCE_EXHAUSTED", f"Quota exceeded for {endpoint}.")
+            else:
+                status, reply = self.handle(method, url, kwargs.get("params") or {}, body)
+
+            content = json.dumps(reply).encode()
+            self.calls.append({
+                "method": method.upper(),
+                "endpoint": endpoint,
+                "status": status,
+                "requests": [list(x)[0] for x in body.get("requests", [])] if isinstance(body, dict) else [],
+                "bytes_sent": bytes_sent,
+                "bytes_received": len(content)
+            })
+
+        response = requests.Response()
+        response.status_code = status
+        response.url = url
+        response.encoding = "utf-8"
+        response.headers["Content-Type"] = "application/json; charset=UTF-8"
+        response._content = content
+        return response
+
+    # URL without the file IDs & ranges, i.e. sheets spreadsheets:batchUpdate
+    def endpoint_name(self, url):
+        if url.startswith(gspread.urls.SPREADSHEETS_API_V4_BASE_URL):
+            path = url[len(gspread.urls.SPREADSHEETS_API_V4_BASE_URL) + 1:]
+            return "sheets spreadsheets" + re.sub("^[^/:]+", "", re.sub("/values/[^:]+", "/values", path))
+
+        path = url[len(gspread.urls.DRIVE_FILES_API_V3_URL):]
+        return "drive files" + re.sub("^/[^/]+", "", path)
+
+    def error(self, code, status, message):
+        return code, {"error": {"code": code, "message": message, "status": status}}
+
+    def new_spreadsheet(self, title, spreadsheet_id=None):
+        self.file_count += 1
+        if spreadsheet_id is None:
+            spreadsheet_id = f"fake-spreadsheet-{self.file_count}"
+
+        self.spreadsheets[spreadsheet_id] = {
+            "spreadsheetId": spreadsheet_id,
+            "properties": {"title": title, "locale": "en_US", "timeZone": "Etc/GMT"},
+            "sheets": [{"properties": {"sheetId": 0, "title": "Sheet1", "index": 0, "sheetType": "GRID",
+                                       "gridProperties": {"rowCount": 1000, "columnCount": 26}}}],
+            "dataSources": []
+        }
+        return self.spreadsheets[spreadsheet_id]
+
+    # Connected Sheets report to copy, with a BQ data source for each table
+    def add_template(self, spreadsheet_id, bq_tables):
+        spreadsheet = self.new_spreadsheet("Template", spreadsheet_id)
+        requests = []
+        for bq_table in bq_tables:
+            requests.append({"addDataSource": {"dataSource": {"spec": {"bigQuery": {
+                "projectId": "template", "tableSpec": {"tableProjectId": "template", "datasetId": "template",
+                                                       "tableId": bq_table}}}}}})
+        self.batch_update(spreadsheet, requests)
+
+    def handle(self, method, url, params, body):
+        if url.startswith(gspread.urls.SPREADSHEETS_API_V4_BASE_URL):
+            path = url[len(gspread.urls.SPREADSHEETS_API_V4_BASE_URL) + 1:]
+            spreadsheet = self.spreadsheets.get(re.split("[/:]", path)[0])
+            if spreadsheet is None:
+                return self.error(404, "NOT_FOUND", "Requested entity was not found.")
+
+            if method == "get" and "/" not in path:
+                return 200, self.metadata(spreadsheet, params.get("fields"))
+            if method == "post" and path.endswith(":batchUpdate") and "/values" not in path:
+                return self.batch_update(spreadsheet, body.get("requests", []))
+            if "/values" in path:
+                return 200, {"spreadsheetId": spreadsheet["spreadsheetId"]}
+        elif url.startswith(gspread.urls.DRIVE_FILES_API_V3_URL):
+            path = url[len(gspread.urls.DRIVE_FILES_API_V3_URL) + 1:].split("/")
+            if method == "post" and path == [""]:
+                spreadsheet = self.new_spreadsheet(body["name"])
+                return 200, {"kind": "drive#file", "id": spreadsheet["spreadsheetId"], "name": body["name"],
+                             "mimeType": body.get("mimeType")}
+            if path[0] not in self.spreadsheets:
+                return self.error(404, "NOT_FOUND", f"File not found: {path[0]}.")
+            if method == "post" and path[1:] == ["copy"]:
+                spreadsheet = self.new_spreadsheet(body["name"])
+                spreadsheet.update(copy.deepcopy({k: v for k, v in self.spreadsheets[path[0]].items()
+                                                  if k in ["sheets", "dataSources"]}))
+                spreadsheet["properties"]["title"] = body["name"]
+                return 200, {"kind": "drive#file", "id": spreadsheet["spreadsheetId"], "name": body["name"]}
+            if method == "post" and path[1:] == ["permissions"]:
+                return 200, {"kind": "drive#permission", "id": f"permission-{len(self.calls)}",
+                             "type": body["type"], "role": body["role"]}
+
+        return self.error(404, "NOT_FOUND", f"Unsupported fake API call: {method.upper()} {url}")
+
+    # Spreadsheet metadata, only the top level fields listed in a fields parameter are returned
+    def metadata(self, spreadsheet, fields):
+        if fields is None:
+            return spreadsheet
+
+        field_names = [re.split("[.(/]", x.strip())[0] for x in fields.split(",")]
+        return {k: v for k, v in spreadsheet.items() if k in field_names}
+
+    def new_sheet_id(self, sheets):
+        sheet_ids = [x["properties"]["sheetId"] for x in sheets]
+        sheet_id = self.random.randrange(1, 2 ** 31)
+        while sheet_id in sheet_ids:
+            sheet_id = self.random.randrange(1, 2 ** 31)
+        return sheet_id
+
+    # Apply a batchUpdate, like the real API all requests fail if one of them is invalid
+    def batch_update(self, spreadsheet, requests):
+        sheets = copy.deepcopy(spreadsheet["sheets"])
+        data_sources = copy.deepcopy(spreadsheet["dataSources"])
+        replies = []
+        for request in requests:
+            kind = list(request)[0]
+            sheets_by_id = {x["properties"]["sheetId"]: x for x in sheets}
+
+            if kind == "addSheet":
+                properties = copy.deepcopy(request[kind].get("properties", {}))
+                properties.setdefault("sheetId", self.new_sheet_id(sheets))
+                properties.setdefault("title", f"Sheet{len(sheets) + 1}")
+                if properties["sheetId"] in sheets_by_id or \
+                        properties["title"] in [x["properties"]["title"] for x in sheets]:
+                    return self.error(400, "INVALID_ARGUMENT",
+                                      f"Invalid requests[{len(replies)}].addSheet: A sheet with the name "
+                                      f"\"{properties['title']}\" or ID {properties['sheetId']} already exists.")
+                properties.setdefault("index", len(sheets))
+                properties.setdefault("sheetType", "GRID")
+                properties.setdefault("gridProperties", {"rowCount": 1000, "columnCount": 26})
+                sheets.append({"properties": properties})
+                replies.append({"addSheet": {"properties": properties}})
+            elif kind == "addDataSource":
+                data_source = copy.deepcopy(request[kind]["dataSource"])
+                data_source["dataSourceId"] = "%016x" % self.random.getrandbits(64)
+                data_source["sheetId"] = self.new_sheet_id(sheets)
+                sheets.append({"properties": {
+                    "sheetId": data_source["sheetId"], "title": data_source["spec"]["bigQuery"]["tableSpec"]["tableId"],
+                    "index": len(sheets), "sheetType": "DATA_SOURCE",
+                    "dataSourceSheetProperties": {"dataSourceId": data_source["dataSourceId"]}}})
+                data_sources.append(data_source)
+                replies.append({"addDataSource": {"dataSource": data_source,
+                                                  "dataExecutionStatus": {"state": "SUCCEEDED"}}})
+            elif kind == "updateDataSource":
+                data_source = request[kind]["dataSource"]
+                matches = [x for x in data_sources if x["dataSourceId"] == data_source["dataSourceId"]]
+                if len(matches) == 0:
+                    return self.error(400, "INVALID_ARGUMENT", f"No data source with id: {data_source['dataSourceId']}")
+                matches[0]["spec"] = copy.deepcopy(data_source["spec"])
+                replies.append({"updateDataSource": {"dataSource": matches[0],
+                                                     "dataExecutionStatus": {"state": "SUCCEEDED"}}})
+            elif kind == "deleteSheet":
+                if request[kind]["sheetId"] not in sheets_by_id:
+                    return self.error(400, "INVALID_ARGUMENT", f"No grid with id: {request[kind]['sheetId']}")
+                sheets.remove(sheets_by_id[request[kind]["sheetId"]])
+                replies.append({})
+            elif kind == "updateSheetProperties":
+                properties = request[kind]["properties"]
+                if properties["sheetId"] not in sheets_by_id:
+                    return self.error(400, "INVALID_ARGUMENT", f"No grid with id: {properties['sheetId']}")
+                sheets_by_id[properties["sheetId"]]["properties"].update(copy.deepcopy(properties))
+                replies.append({})
+            elif kind == "refreshDataSource":
+                replies.append({"refreshDataSource": {"statuses": [
+                    {"reference": {"dataSourceId": x["dataSourceId"]}, "dataExecutionStatus": {"state": "SUCCEEDED"}}
+                    for x in data_sources]}})
+            else:
+                replies.append({})
+
+        spreadsheet["sheets"] = sheets
+        spreadsheet["dataSources"] = data_sources
+        return 200, {"spreadsheetId": spreadsheet["spreadsheetId"], "replies": replies}
+
+    # API round trips, payload bytes & batchUpdate requests of the recorded calls
+    def summary(self):
+        with self.lock:
+            endpoints = {}
+            request_kinds = {}
+            for call in self.calls:
+                endpoint = f"{call['method']} {call['endpoint']}"
+                endpoints[endpoint] = endpoints.get(endpoint, 0) + 1
+                for kind in call["requests"]:
+                    request_kinds[kind] = request_kinds.get(kind, 0) + 1
+
+            return {
+                "round_trips": len(self.calls),
+                "errors": len([x for x in self.calls if x["status"] >= 400]),
+                "batch_requests": sum(request_kinds.values()),
+                "bytes_sent": sum(x["bytes_sent"] for x in self.calls),
+                "bytes_received": sum(x["bytes_received"] for x in self.calls),
+                "endpoints": endpoints,
+                "request_kinds": request_kinds
+            }
+
+
+# Send the Sheets & Drive API calls of an import script module to a fake session instead of Google
+def install_fake_google_api(c2c, fake_session):
+    c2c.google_auth = lambda service_account_key, scope: None
+    c2c.authorize_sheets_client = lambda credentials: c2c.rate_limited_client_class()(None, session=fake_session)
+
+
+# Build a report with the import script against the fake APIs
+def build_sheets_report(scenario, arguments, latency, error_rate, seed):
+    c2c = load_import_module()
+    fake_session = FakeGoogleApiSession(latency, error_rate, seed)
+    fake_session.add_template(fake_template_id, [f"template_{x}" for x in c2c.mc_names.keys()])
+    install_fake_google_api(c2c, fake_session)
+
+    output = io.StringIO()
+    sys.argv = ["google-mc-c2c-data-import.py"] + arguments
+    started = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(output):
+            c2c.main()
+    except SystemExit:
+        print(output.getvalue())
+        print(f"Building the {scenario} report failed! Exiting!")
+        exit(1)
+    seconds = time.perf_counter() - started
+
+    api_calls = c2c.run_metrics.report()["api_calls"].values()
+    result = {"scenario": scenario, "seconds": round(seconds, 3)}
+    result.update(fake_session.summary())
+    result["retries"] = sum(x["tries"] - x["calls"] for x in api_calls)
+    result["rate_limiter_seconds"] = round(sum(x["rate_limiter_seconds"] for x in api_calls), 3)
+    return result
+
+
+def print_sheets_results(results):
+    print()
+    print(f"{'Scenario':>14} {'Seconds':>9} {'Round trips':>12} {'Requests':>9} {'Errors':>7} {'Retries':>8} "
+          f"{'KiB sent':>10} {'KiB received':>13} {'Limiter sec':>12}")
+    for result in results:
+        print(f"{result['scenario']:>14} {result['seconds']:>9.2f} {result['round_trips']:>12} "
+              f"{result['batch_requests']:>9} {result['errors']:>7} {result['retries']:>8} "
+              f"{result['bytes_sent'] / 1024:>10.1f} {result['bytes_received'] / 1024:>13.1f} "
+              f"{result['rate_limiter_seconds']:>12.2f}")
+
+
+# Build each report scenario against the fake Sheets & Drive APIs
+def run_sheets_benchmark(args):
+    with tempfile.TemporaryDirectory() as generated_directory:
+        if args.d is not None:
+            data_directory = os.path.abspath(args.d)
+        else:
+            data_directory = generated_directory
+            generate_data(data_directory, args.rows, 1, args.seed)
+
+        import_arguments = ["-c", "Benchmark Customer", "-e", "benchmark@example.com",
+                            "--sheets-quota", str(args.sheets_quota), "--workers", str(args.workers),
+                            "--sheets-batch-rows", str(args.sheets_batch_rows), "--sheets-upload", args.sheets_upload]
+
+        results = []
+        for scenario in args.scenarios.split(","):
+            print(f"Building {scenario} report...")
+            arguments = [x.format(mc=os.path.join(data_directory, "mc"), cur=os.path.join(data_directory, "cur"),
+                                  template=fake_template_id) for x in sheets_benchmark_scenarios[scenario]]
+            results.append(build_sheets_report(scenario, arguments + import_arguments, args.latency, args.error_rate,
+                                               args.seed))
+
+    print_sheets_results(results)
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+        print(f"\nBenchmark results written to {args.output}")
+
+
+# Peak resident memory of this process in bytes
+def peak_rss_bytes():
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak_rss if sys.platform == "darwin" else peak_rss * 1024
+
+
+# Import the generated MC or CUR files into the offline sink & measure the stages
+def ingest_data(data_directory, source, chunk_size, csv_engine, parquet_staging, workers, cur_batch_files):
+    c2c = load_import_module()
+    sink = BenchmarkSink(c2c)
+
+    started = time.perf_counter()
+    if source == "mc":
+        c2c.import_mc_into_bq(os.path.join(data_directory, "mc"), "benchmark", "benchmark", "mc_", None, "Benchmark",
+                              chunk_size, parquet_staging, csv_engine, workers, sink=sink)
+    else:
+        c2c.import_cur_into_bq(os.path.join(data_directory, "cur"), "benchmark", "benchmark", "cur", None,
+                               "Benchmark", parquet_staging, csv_engine, workers, cur_batch_files, sink=sink)
+    seconds = time.perf_counter() - started
+
+    rows = sum(num_rows for num_rows, _ in sink.tables.values())
+    phases = c2c.run_metrics.report()["phases"]
+
+    stages = {}
+    for stage, phase in benchmark_stages.items():
+        if phase in phases:
+            stage_seconds = phases[phase]["seconds"]
+            stages[stage] = {"seconds": stage_seconds,
+                             "rows_per_second": round(rows / stage_seconds, 1) if stage_seconds > 0 else None}
+
+    return {
+        "source": source,
+        "rows": rows,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(rows / seconds, 1) if seconds > 0 else None,
+        "peak_rss_bytes": peak_rss_bytes(),
+        "stages": stages,
+        "phases": phases
+    }
+
+
+# Options passed on to the import functions
+def ingest_arguments(args):
+    ingest_args = ["--csv-engine", args.csv_engine, "--workers", str(args.workers),
+                   "--cur-batch-files", str(args.cur_batch_files)]
+    if args.chunk_size is not None:
+        ingest_args += ["--chunk-size", str(args.chunk_size)]
+    if args.parquet is True:
+        ingest_args.append("--parquet")
+
+    return ingest_args
+
+
+def print_results(results):
+    print()
+    print(f"{'Rows':>12} {'Source':>6} {'Seconds':>9} {'Rows/sec':>11} {'Peak RSS MiB':>13}", end="")
+    for stage in benchmark_stages.keys():
+        print(f" {stage + ' rows/sec':>19}", end="")
+    print()
+
+    for result in results:
+        print(f"{result['generated_rows']:>12} {result['source']:>6} {result['seconds']:>9.1f} "
+              f"{result['rows_per_second']:>11.0f} {result['peak_rss_bytes'] / 1024 / 1024:>13.0f}", end="")
+        for stage in benchmark_stages.keys():
+            rows_per_second = result["stages"].get(stage, {}).get("rows_per_second")
+            print(f" {'-' if rows_per_second is None else format(rows_per_second, '.0f'):>19}", end="")
+        print()
+
+
+# Generate the data for each row count & import it in a new process per source, so peak RSS is measured per import
+def run_benchmark(args):
+    results = []
+    for rows in [int(x) for x in args.rows.split(",")]:
+        data_directory = os.path.join(args.work_dir, f"{rows}-rows")
+        generated_file = os.path.join(data_directory, "generated.json")
+        if os.path.exists(generated_file):
+            print(f"Using the data generated in {data_directory}")
+        else:
+            generate_data(data_directory, rows, args.cur_files, args.seed)
+
+        for source in ["mc", "cur"]:
+            print(f"Importing {rows} {source} rows...")
+            with tempfile.NamedTemporaryFile(suffix=".json") as result_file:
+                ingest = subprocess.run([sys.executable, os.path.abspath(__file__), "ingest", "-d", data_directory,
+                                         "--source", source, "--result-file", result_file.name] +
+                                        ingest_arguments(args), capture_output=True, text=True)
+                if ingest.returncode != 0:
+                    print(ingest.stdout + ingest.stderr)
+                    print(f"Import of {rows} {source} rows failed! Exiting!")
+                    exit(1)
+
+                with open(result_file.name) as f:
+                    result = json.load(f)
+
+            result["generated_rows"] = rows
+            results.append(result)
+
+        if args.keep_data is False:
+            shutil.rmtree(data_directory)
+
+    print_results(results)
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+        print(f"\nBenchmark results written to {args.output}")
+
+
+# Parse CLI Arguments
+def parse_cli_args():
+    parser = argparse.ArgumentParser(prog='google-mc-c2c-benchmark.py',
+                                     description='Generates synthetic Migration Center & AWS CUR data & benchmarks importing it.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    import_options = argparse.ArgumentParser(add_help=False)
+    import_options.add_argument('--chunk-size', metavar='Rows', type=int, required=False,
+                                help='Import the Migration Center files in chunks of this many rows.')
+    import_options.add_argument('--csv-engine', metavar='Engine', choices=['pandas', 'pyarrow'], default='pandas',
+                                required=False, help='CSV parser: pandas (default) or pyarrow.')
+    import_options.add_argument('--parquet', action='store_true', required=False,
+                                help='Stage the data as local Parquet files, like the --parquet import.')
+    import_options.add_argument('--workers', metavar='Workers', type=int, default=1, required=False,
+                                help='Number of files imported at the same time (default 1).')
+    import_options.add_argument('--cur-batch-files', metavar='Files', type=int, default=1, required=False,
+                                help='Number of AWS CUR files combined into each load (default 1).')
+
+    generate_parser = subparsers.add_parser('generate', help='Generate Migration Center & AWS CUR CSV files.')
+    generate_parser.add_argument('-d', metavar='Data Directory', required=True,
+                                 help='Directory to write the mc/ & cur/ data files to.')
+    generate_parser.add_argument('--rows', metavar='Rows', type=int, required=True,
+                                 help='Rows in the mapped & unmapped files & in all AWS CUR files together. The discount file gets 1%% of the rows.')
+    generate_parser.add_argument('--cur-files', metavar='Files', type=int, default=4, required=False,
+                                 help='Number of AWS CUR files to split the rows over (default 4).')
+    generate_parser.add_argument('--seed', metavar='Seed', type=int, default=1, required=False,
+                                 help='Random seed (default 1).')
+
+    ingest_parser = subparsers.add_parser('ingest', parents=[import_options],
+                                          help='Import generated data into an offline sink & report the stage timings.')
+    ingest_parser.add_argument('-d', metavar='Data Directory', required=True,
+                               help='Directory with generated data.')
+    ingest_parser.add_argument('--source', metavar='Source', choices=['mc', 'cur'], required=True,
+                               help='Data to import: mc (Migration Center files) or cur (AWS CUR files).')
+    ingest_parser.add_argument('--result-file', metavar='File', required=False,
+                               help='Write the results as JSON to this file instead of printing them.')
+
+    run_parser = subparsers.add_parser('run', parents=[import_options],
+                                       help='Generate data & benchmark the import at each row count.')
+    run_parser.add_argument('--rows', metavar='Rows', default=default_benchmark_rows, required=False,
+                            help=f'Comma separated row counts to benchmark (default {default_benchmark_rows}).')
+    run_parser.add_argument('--work-dir', metavar='Directory', default='c2c-benchmark-data', required=False,
+                            help='Directory for the generated data (default c2c-benchmark-data).')
+    run_parser.add_argument('--cur-files', metavar='Files', type=int, default=4, required=False,
+                            help='Number of AWS CUR files to split the rows over (default 4).')
+    run_parser.add_argument('--seed', metavar='Seed', type=int, default=1, required=False,
+                            help='Random seed (default 1).')
+    run_parser.add_argument('--keep-data', action='store_true', required=False,
+                            help='Keep the generated data, it is reused by the next run.')
+    run_parser.add_argument('--output', metavar='File', required=False,
+                            help='Write the benchmark results as JSON to this file.')
+
+    sheets_parser = subparsers.add_parser('sheets', help='Build the Sheets reports against fake Sheets & Drive APIs & count the API calls.')
+    sheets_parser.add_argument('-d', metavar='Data Directory', required=False,
+                               help='Directory with generated data. Without it, --rows rows are generated.')
+    sheets_parser.add_argument('--rows', metavar='Rows', type=int, default=1000, required=False,
+                               help='Rows to generate when no data directory is given (default 1000).')
+    sheets_parser.add_argument('--scenarios', metavar='Scenarios', default=','.join(sheets_benchmark_scenarios.keys()),
+                               required=False,
+                               help=f'Comma separated reports to build (default {",".join(sheets_benchmark_scenarios.keys())}).')
+    sheets_parser.add_argument('--latency', metavar='Seconds', type=float, default=0.2, required=False,
+                               help='Simulated latency of every API call (default 0.2).')
+    sheets_parser.add_argument('--error-rate', metavar='Rate', type=float, default=0.0, required=False,
+                               help='Share of API calls answered with a quota error, between 0 & 1 (default 0).')
+    sheets_parser.add_argument('--sheets-quota', metavar='Requests', type=int, default=60, required=False,
+                               help='Sheets API requests per minute allowed by the import rate limiter (default 60).')
+    sheets_parser.add_argument('--workers', metavar='Workers', type=int, default=1, required=False,
+                               help='Number of data batches uploaded at the same time (default 1).')
+    sheets_parser.add_argument('--sheets-batch-rows', metavar='Rows', type=int, default=10000, required=False,
+                               help='Number of rows per Sheets data upload request (default 10000).')
+    sheets_parser.add_argument('--sheets-upload', metavar='Mode', choices=['values', 'paste'], default='values',
+                               required=False, help='Sheets data upload: values (default) or paste.')
+    sheets_parser.add_argument('--seed', metavar='Seed', type=int, default=1, required=False,
+                               help='Random seed (default 1).')
+    sheets_parser.add_argument('--output', metavar='File', required=False,
+                               help='Write the benchmark results as JSON to this file.')
+
+    return parser.parse_args()
+
+
+def main():
+    args = parse_cli_args()
+
+    if args.command == "generate":
+        generate_data(args.d, args.rows, args.cur_files, args.seed)
+    elif args.command == "ingest":
+        result = ingest_data(os.path.abspath(args.d), args.source, args.chunk_size, args.csv_engine, args.parquet,
+                             args.workers, args.cur_batch_files)
+        if args.result_file is not None:
+            with open(args.result_file, "w") as f:
+                json.dump(result, f, indent=4)
+        else:
+            print(json.dumps(result, indent=4))
+    elif args.command == "sheets":
+        run_sheets_benchmark(args)
+    else:
+        args.work_dir = os.path.abspath(args.work_dir)
+        run_benchmark(args)
+
+
+if __name__ == "__main__":
+    main()
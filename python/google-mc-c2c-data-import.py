@@ -20,71 +20,712 @@
 # amarcum@google.com
 #################################################################
 
-import pandas as pd
-import urllib
-import gspread
+import urllib.parse
 import csv
 import datetime
-from oauth2client.service_account import ServiceAccountCredentials
-from google.cloud import bigquery
-import google.auth
-from gspread_formatting import *
+import copy
+from dataclasses import dataclass
+import importlib
 import argparse
 import time
 import os
 import json
+import re
+import hashlib
+import tempfile
+import gzip
+import zipfile
+import io
+import concurrent.futures
+import contextlib
+import functools
+import atexit
+import cProfile
+import pstats
+import tracemalloc
+import random
+import threading
+import uuid
+
+
+# Module imported on first use, so pandas, pyarrow, gspread & the BQ client are only loaded by the modes using them
+class LazyModule:
+    def __init__(self, module_name):
+        self.__dict__["_module_name"] = module_name
+        self.__dict__["_module"] = None
+        lazy_modules.append(self)
+
+    def __getattr__(self, name):
+        if self._module is None:
+            self.__dict__["_module"] = importlib.import_module(self._module_name)
+        return getattr(self._module, name)
+
+
+lazy_modules = []
+pd = LazyModule("pandas")
+pa = LazyModule("pyarrow")
+pq = LazyModule("pyarrow.parquet")
+pyarrow_csv = LazyModule("pyarrow.csv")
+gspread = LazyModule("gspread")
+bigquery = LazyModule("google.cloud.bigquery")
+
+
+def import_lazy_modules():
+    for lazy_module in lazy_modules:
+        importlib.import_module(lazy_module._module_name)
 
 version = "v0.2"
 datetime = str(datetime.datetime.now().strftime("%Y-%m-%d %H:%M"))
-username = os.environ['USER']
-if username == 'root':
-    print("User root not allowed to run this application! Exiting...")
-    exit()
 
 # Order to sort worksheets and new names to use
-f = open('settings.json', )
-settings_file = json.load(f)
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "settings.json")) as f:
+    settings_file = json.load(f)
 mc_names = settings_file["mc_names"]
 mc_column_names = settings_file["mc_column_names"]
 refresh_data_sources_body = settings_file["refresh_data_sources"]
-f.close()
+cur_columns = settings_file["cur_columns"]
+bq_table_layouts = settings_file["bq_table_layouts"]
 
 default_mc_looker_template_id = "421c8150-e7ad-4190-b044-6a18ecdbd391"
 default_cur_looker_template_id = "c4e0ccbc-907a-4bc4-85f1-1711ee47c345"
 
+# Column names used by the different MC report versions
+mc_column_renames = {
+    "mapped": {
+        "Memory (GB)": "Memory_GB",
+        "External Memory (GB)": "External_Memory_GB",
+        "Sub-Type 1": "Sub_Type_1",
+        "Sub-Type 2": "Sub_Type_2",
+        "Dest Series": "Destination_Series",
+        "Extended Memory GB": "External_Memory_GB",
+        "Dest Shape": "Destination_Shape",
+        "OS or Licenses Cost": "OS_Licenses_Cost",
+        "Dest. Shape": "Destination_Shape",
+        "Dest. Series": "Destination_Series",
+        "OS / Licenses Cost": "OS_Licenses_Cost",
+        "Account/Subscription": "Account_Or_Subscription",
+        "Ext. Memory (GB)": "External_Memory_GB"
+    },
+    "unmapped": {
+        "ID": "identity_LineItemIds"
+    },
+    "discount": {
+        "ID": "identity_LineItemIds"
+    }
+}
+
+# Report file profiles (row count, column count, header, size) by file path
+report_profiles = {}
+
+# Sheets value uploads & batchUpdates: upper bound on the size of a single request
+sheets_batch_max_bytes = 2 * 1024 * 1024
+
+# Sheets & Drive API quotas (requests per minute per user), shared by all API calls the application makes.
+# Rate limited & failed API requests are retried with jittered exponential backoff, up to api_max_backoff seconds.
+api_quotas = {"sheets_read": 60, "sheets_write": 60, "drive": 12000}
+api_rate_limiters = {}
+api_rate_limiters_lock = threading.Lock()
+api_request_tries = 6
+api_max_backoff = 64
+
+# Sheets batchUpdate requests that overwrite fixed ranges/properties & can be sent again after a server error
+sheets_idempotent_requests = ["updateCells", "repeatCell", "pasteData", "updateSheetProperties",
+                              "autoResizeDimensions", "refreshDataSource", "updateDataSource"]
+
+# Worksheet metadata caches by spreadsheet ID
+sheets_metadata_caches = {}
+
+# Import manifest, kept in the reports directory for incremental imports
+import_manifest_file_name = ".c2c-import-manifest.json"
+
+# A pivot table value: the column to summarize (BQ column name or Sheets column offset) & its header in the pivot table
+@dataclass
+class ValueSpec:
+    column: object
+    name: str = None
+
+
+# A pivot table: row group columns, values, filter & where it goes on its worksheet ([column, row]). filter_column is
+# None to only show rows with a first value greater than 0, "CONTAINS" for Description containing "Compute Engine" or
+# a column that must not be blank.
+@dataclass
+class PivotSpec:
+    rows: list
+    values: list
+    filter_column: object = None
+    location: list = None
+    summarize_function: str = "SUM"
+
+    def value_columns(self):
+        return [value.column for value in self.values]
+
+    # Sheets filterSpec of the pivot table as [condition type, column]
+    def filter(self):
+        if self.filter_column is None:
+            return ["NUMBER_GREATER", self.values[0].column]
+        elif self.filter_column == "CONTAINS":
+            return ["TEXT_CONTAINS", "Description"]
+        else:
+            return ["NOT_BLANK", self.filter_column]
+
+
+# Pivot tables generate_mc_sheets creates, aggregated locally for the LOCAL Sheets mode
+mc_local_pivot_tables = [
+    {"file": "mapped", "pivot_table": PivotSpec(["GCP_Service"], [ValueSpec("Source_Cost"), ValueSpec("GCP_Cost")],
+                                                "Source_Cost")},
+    {"file": "mapped", "pivot_table": PivotSpec(["Region", "GCP_Service"], [ValueSpec("GCP_Cost")], "Region")},
+    {"file": "mapped", "pivot_table": PivotSpec(["Region", "Destination_Shape"], [ValueSpec("GCP_Cost")],
+                                                "Destination_Shape")},
+    {"file": "mapped", "pivot_table": PivotSpec(["Source_Product"], [ValueSpec("Source_Cost"), ValueSpec("GCP_Cost")],
+                                                "Source_Cost")},
+    {"file": "mapped", "pivot_table": PivotSpec(["GCP_Service", "Destination_Series", "Description"],
+                                                [ValueSpec("OS_Licenses_Cost"), ValueSpec("Infra_Cost")],
+                                                "GCP_Service")},
+    {"file": "mapped", "pivot_table": PivotSpec(
+        ["Region", "Source_Shape", "Destination_Shape", "vCPUs", "Memory_GB", "Description"],
+        [ValueSpec("Quantity"), ValueSpec("Source_Cost"), ValueSpec("Infra_Cost"), ValueSpec("OS_Licenses_Cost"),
+         ValueSpec("GCP_Cost")], "CONTAINS")},
+    {"file": "unmapped", "pivot_table": PivotSpec(["lineItem_ProductCode"], [ValueSpec("lineItem_UnblendedCost")])},
+    {"file": "unmapped", "pivot_table": PivotSpec(["lineItem_ProductCode", "lineItem_UsageType"],
+                                                  [ValueSpec("lineItem_UnblendedCost")])},
+]
+
+
+# Profiling written with --profile: a cProfile pstats file, the top functions & the top memory allocations of every
+# pipeline stage. Stages nest (i.e. csv_parse inside import_mc_into_bq) & every stage gets its own profile, the profile
+# of a stage also includes the stages nested in it. Threads started during a stage on the main thread are part of its
+# profile. Memory is traced for the whole process, the allocations of stages running at the same time in worker threads
+# show up in each other's reports.
+class StageProfiler:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.directory = None
+        self.stage_count = 0
+        self.top_lines = 30
+        self.running = []
+        self.thread_stages = threading.local()
+
+    def enable(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        # Imports under tracemalloc are slow & would show up in the profile of the first stage using them
+        import_lazy_modules()
+        tracemalloc.start(25)
+
+    # Stages running in the current thread, innermost last
+    def stage_stack(self):
+        if not hasattr(self.thread_stages, "stack"):
+            self.thread_stages.stack = []
+
+        return self.thread_stages.stack
+
+    @contextlib.contextmanager
+    def profile(self, name):
+        if self.directory is None:
+            yield
+            return
+
+        stack = self.stage_stack()
+        with self.lock:
+            self.stage_count += 1
+            stage_file_prefix = os.path.join(self.directory, f"{self.stage_count:02d}-{name}")
+
+        # Only one profiler runs per thread, the enclosing stage is paused & gets the stats of this stage added after it
+        if len(stack) > 0:
+            stack[-1]["profiler"].disable()
+
+        stage = {"profiler": cProfile.Profile(), "peak_bytes": 0}
+        stage["profilers"] = [stage["profiler"]]
+        self.start_tracing(stage)
+        stack.append(stage)
+        is_thread_starting_stage = len(stack) == 1 and threading.current_thread() is threading.main_thread()
+        if is_thread_starting_stage:
+            threading.setprofile(functools.partial(self.profile_thread, stage))
+        stage["profiler"].enable()
+        try:
+            yield
+        finally:
+            stage["profiler"].disable()
+            stack.pop()
+            if is_thread_starting_stage:
+                threading.setprofile(None)
+            end_snapshot = self.stop_tracing(stage)
+            with self.lock:
+                stats = pstats.Stats(*stage["profilers"])
+                if len(stack) > 0:
+                    stack[-1]["profilers"].extend(stage["profilers"])
+            if len(stack) > 0:
+                stack[-1]["profiler"].enable()
+            self.save(stage_file_prefix, name, stats, stage["start_snapshot"], end_snapshot, stage["current_bytes"],
+                      stage["peak_bytes"])
+
+    # The traced memory peak is shared by all stages, it's folded into every running stage before it's reset
+    def update_peaks(self):
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+        for stage in self.running:
+            stage["peak_bytes"] = max(stage["peak_bytes"], peak_bytes)
+
+    def start_tracing(self, stage):
+        with self.lock:
+            self.update_peaks()
+            tracemalloc.reset_peak()
+            self.running.append(stage)
+        stage["start_snapshot"] = tracemalloc.take_snapshot()
+
+    def stop_tracing(self, stage):
+        end_snapshot = tracemalloc.take_snapshot()
+        with self.lock:
+            self.update_peaks()
+            self.running.remove(stage)
+            stage["current_bytes"] = tracemalloc.get_traced_memory()[0]
+
+        return end_snapshot
+
+    # Profile hook of the threads started during a main thread stage, replaces itself with a cProfile profiler for the
+    # thread. Stages of the thread pause it like the profiler of any enclosing stage.
+    def profile_thread(self, main_thread_stage, frame, event, arg):
+        thread_stage = {"profiler": cProfile.Profile(), "profilers": main_thread_stage["profilers"]}
+        with self.lock:
+            thread_stage["profilers"].append(thread_stage["profiler"])
+        self.stage_stack().append(thread_stage)
+        thread_stage["profiler"].enable()
+
+    def save(self, stage_file_prefix, name, stats, start_snapshot, end_snapshot, current_bytes, peak_bytes):
+        stats.dump_stats(f"{stage_file_prefix}.pstats")
+
+        with open(f"{stage_file_prefix}-functions.txt", "w") as f:
+            stats.stream = f
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top_lines)
+
+        snapshot_filters = [tracemalloc.Filter(False, tracemalloc.__file__),
+                            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>")]
+        start_snapshot = start_snapshot.filter_traces(snapshot_filters)
+        end_snapshot = end_snapshot.filter_traces(snapshot_filters)
+
+        with open(f"{stage_file_prefix}-allocations.txt", "w") as f:
+            f.write(f"Stage: {name}\n")
+            f.write(f"Peak traced memory: {peak_bytes / 1024 / 1024:.1f} MiB\n")
+            f.write(f"Traced memory at end of stage: {current_bytes / 1024 / 1024:.1f} MiB\n\n")
+
+            f.write(f"Top {self.top_lines} allocations still held at end of stage, by line:\n")
+            for statistic in end_snapshot.compare_to(start_snapshot, "lineno")[:self.top_lines]:
+                f.write(f"{statistic}\n")
+
+            f.write(f"\nTop {self.top_lines} allocations still held at end of stage, by call stack:\n")
+            for statistic in end_snapshot.compare_to(start_snapshot, "traceback")[:self.top_lines]:
+                f.write(f"\n{statistic}\n")
+                for line in statistic.traceback.format(limit=10, most_recent_first=True):
+                    f.write(f"{line}\n")
+
+        print(f"Profile of {name} written to {stage_file_prefix}.pstats")
+
+
+stage_profiler = StageProfiler()
+
+
+# Run metrics written with --metrics: wall time, calls, rows & bytes per phase, Sheets/Drive API calls & BQ load jobs.
+# Phases can nest, i.e. csv_parse time is also part of import_mc_into_bq.
+class RunMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.api_calls = {}
+        self.load_jobs = []
+
+    def record(self, name, seconds, rows=0, num_bytes=0):
+        with self.lock:
+            phase = self.phases.setdefault(name, {"calls": 0, "seconds": 0.0, "rows": 0, "bytes": 0})
+            phase["calls"] += 1
+            phase["seconds"] += seconds
+            phase["rows"] += rows
+            phase["bytes"] += num_bytes
+
+    # Time a block of code, rows & bytes can be set on the yielded measurement
+    @contextlib.contextmanager
+    def phase(self, name, rows=0, num_bytes=0):
+        measurement = {"rows": rows, "bytes": num_bytes}
+        started = time.perf_counter()
+        try:
+            yield measurement
+        finally:
+            self.record(name, time.perf_counter() - started, measurement["rows"], measurement["bytes"])
+
+    # Time a block of code like phase, & profile it as a pipeline stage with --profile
+    @contextlib.contextmanager
+    def stage(self, name, rows=0, num_bytes=0):
+        with self.phase(name, rows, num_bytes) as measurement, stage_profiler.profile(name):
+            yield measurement
+
+    # Function decorator timing every call as a stage
+    def timed(self, name):
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return function(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    # Pass through the chunks of a reader, only timing the reader & counting the rows of each chunk
+    def measure_chunks(self, name, chunks):
+        chunks = iter(chunks)
+        while True:
+            started = time.perf_counter()
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                return
+            self.record(name, time.perf_counter() - started, rows=len(chunk))
+            yield chunk
+
+    def record_api_call(self, name, seconds, tries, limiter_seconds, bytes_sent, num_requests):
+        with self.lock:
+            api_call = self.api_calls.setdefault(name, {"calls": 0, "tries": 0, "seconds": 0.0,
+                                                        "rate_limiter_seconds": 0.0, "bytes_sent": 0, "requests": 0})
+            api_call["calls"] += 1
+            api_call["tries"] += tries
+            api_call["seconds"] += seconds
+            api_call["rate_limiter_seconds"] += limiter_seconds
+            api_call["bytes_sent"] += bytes_sent
+            api_call["requests"] += num_requests
+
+    def record_load_job(self, table_id, job_id, seconds, rows, num_bytes):
+        with self.lock:
+            self.load_jobs.append({"table_id": table_id, "job_id": job_id, "seconds": round(seconds, 3),
+                                   "rows": rows, "bytes": num_bytes})
+
+    def report(self):
+        with self.lock:
+            phases = {}
+            for name, phase in self.phases.items():
+                phases[name] = dict(phase, seconds=round(phase["seconds"], 3), rows_per_second=None)
+                if phase["rows"] > 0 and phase["seconds"] > 0:
+                    phases[name]["rows_per_second"] = round(phase["rows"] / phase["seconds"], 1)
+
+            api_calls = {}
+            for name, api_call in self.api_calls.items():
+                api_calls[name] = dict(api_call, seconds=round(api_call["seconds"], 3),
+                                       rate_limiter_seconds=round(api_call["rate_limiter_seconds"], 3))
+
+            return {
+                "version": version,
+                "started": datetime,
+                "total_seconds": round(time.perf_counter() - self.started, 3),
+                "phases": phases,
+                "api_calls": api_calls,
+                "load_jobs": list(self.load_jobs)
+            }
+
+    def save(self, metrics_file):
+        with open(metrics_file, "w") as f:
+            json.dump(self.report(), f, indent=4)
+        print(f"Run metrics written to {metrics_file}")
+
+
+run_metrics = RunMetrics()
+
+
+# List the CSV report files in a directory as (name, path) pairs. CSV files inside .zip archives are listed as
+# "<archive>.zip/<member>.csv" & read straight from the archive.
+def list_report_files(reports_directory, include_parquet=False):
+    report_files = []
+    for file in sorted(os.listdir(reports_directory)):
+        file_fullpath = os.path.join(reports_directory, file)
+        if file.endswith(".csv"):
+            report_files.append((file[:-len(".csv")], file_fullpath))
+        elif file.endswith(".csv.gz"):
+            report_files.append((file[:-len(".csv.gz")], file_fullpath))
+        elif file.endswith(".parquet") and include_parquet is True:
+            report_files.append((file[:-len(".parquet")], file_fullpath))
+        elif file.endswith(".zip"):
+            with zipfile.ZipFile(file_fullpath) as zip_file:
+                for member in zip_file.namelist():
+                    if member.endswith(".csv"):
+                        report_files.append((os.path.basename(member)[:-len(".csv")], f"{file_fullpath}/{member}"))
+
+    return report_files
+
+
+# Open a report file as a binary stream, .gz files & .zip archive members are decompressed while reading
+def open_report_file(file_fullpath):
+    if ".zip/" in file_fullpath:
+        zip_fullpath, member = file_fullpath.split(".zip/", 1)
+        return zipfile.ZipFile(f"{zip_fullpath}.zip").open(member)
+    elif file_fullpath.endswith(".gz"):
+        return gzip.open(file_fullpath, "rb")
+
+    return open(file_fullpath, "rb")
+
+
+# Load the import manifest (content hash, size & BQ table, sink & table layout of every imported file) from the reports
+# directory
+def load_import_manifest(reports_directory):
+    try:
+        with open(os.path.join(reports_directory, import_manifest_file_name)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"files": {}}
+
+
+def save_import_manifest(reports_directory, import_manifest):
+    manifest_fullpath = os.path.join(reports_directory, import_manifest_file_name)
+    with open(f"{manifest_fullpath}.tmp", "w") as f:
+        json.dump(import_manifest, f, indent=4)
+    os.replace(f"{manifest_fullpath}.tmp", manifest_fullpath)
+
+
+# Content hash of a report file. CSV files are hashed by profile_report_file in the same pass that profiles them,
+# Parquet files are only read here.
+def report_file_hash(file_fullpath):
+    if not file_fullpath.endswith(".parquet"):
+        return profile_report_file(file_fullpath)["hash"]
+
+    file_hash = hashlib.blake2b(digest_size=16)
+    with open(file_fullpath, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            file_hash.update(block)
+
+    return f"blake2b:{file_hash.hexdigest()}"
+
+
+# Record a file loaded into BQ in the import manifest
+def record_import_manifest(import_manifest, reports_directory, file_fullpath, file_hash, table_id, sink, table_layout,
+                           job_id):
+    import_manifest["files"][os.path.relpath(file_fullpath, reports_directory)] = {
+        "hash": file_hash,
+        "size": profile_report_file(file_fullpath)["num_bytes"],
+        "rows": profile_report_file(file_fullpath)["num_rows"],
+        "table_id": table_id,
+        "sink": sink.destination,
+        "table_layout": table_layout,
+        "job_id": job_id,
+        "imported": datetime
+    }
+
+
+# Whether a manifest entry records the same file content imported into the same destination: table, sink & table
+# layout. Entries written before the sink & table layout were recorded count as changed.
+def import_manifest_entry_unchanged(manifest_entry, file_hash, table_id, sink, table_layout):
+    return manifest_entry is not None and manifest_entry["hash"] == file_hash and \
+        manifest_entry["table_id"] == table_id and manifest_entry.get("sink") == sink.destination and \
+        manifest_entry.get("table_layout") == table_layout
+
+
+# Single pass over a CSV file for its header, row/column counts, size & content hash. Results are cached for later
+# stages. Parquet files are profiled from their footer metadata.
+def profile_report_file(file_fullpath):
+    if file_fullpath in report_profiles:
+        return report_profiles[file_fullpath]
+
+    if file_fullpath.endswith(".parquet"):
+        parquet_metadata = pq.read_metadata(file_fullpath)
+        report_profiles[file_fullpath] = {
+            "num_rows": parquet_metadata.num_rows,
+            "num_columns": parquet_metadata.num_columns,
+            "header": parquet_metadata.schema.names,
+            "num_bytes": os.path.getsize(file_fullpath),
+            "empty": parquet_metadata.num_rows == 0
+        }
+
+        return report_profiles[file_fullpath]
+
+    number_of_rows = 0
+    number_of_bytes = 0
+    in_quotes = False
+    header_lines = []
+    header = []
+    file_hash = hashlib.blake2b(digest_size=16)
+    with open_report_file(file_fullpath) as f:
+        for line in f:
+            number_of_bytes += len(line)
+            file_hash.update(line)
+            # An odd number of quotes means a quoted newline, so the row continues on the next line
+            if line.count(b'"') % 2 == 1:
+                in_quotes = not in_quotes
+            if number_of_rows == 0 and (in_quotes or line.strip() != b""):
+                header_lines.append(line)
+            if in_quotes or line.strip() == b"":
+                continue
+            number_of_rows += 1
+
+            # A header with a quoted newline spans several lines, it is parsed once its quotes are balanced
+            if number_of_rows == 1:
+                header = next(csv.reader(io.StringIO(b"".join(header_lines).decode("utf-8"), newline='')), [])
+
+    report_profiles[file_fullpath] = {
+        "num_rows": max(number_of_rows - 1, 0),  # Header not included
+        "num_columns": len(header),
+        "header": header,
+        "num_bytes": number_of_bytes,  # Uncompressed
+        "hash": f"blake2b:{file_hash.hexdigest()}",  # Uncompressed content
+        "empty": number_of_rows <= 1
+    }
+
+    return report_profiles[file_fullpath]
+
 
 # Check number of rows & columns in CSV file
+@run_metrics.timed("check_csv_size")
 def check_csv_size(mc_reports_directory):
     print("Checking CSV sizes...")
-    mc_file_list = os.listdir(mc_reports_directory)
-    if any('.csv' in file for file in mc_file_list):
-        for file in mc_file_list:
-            if file.endswith(".csv"):
-                file_fullpath = (mc_reports_directory + "/" + file)
-                csv_data = pd.read_csv(file_fullpath, nrows=1)
-                try:
-                    number_of_columns = len(csv_data.values[0].tolist())
-                except:
-                    number_of_columns = 0
-
-                with open(file_fullpath, "rb") as f:
-                    number_of_rows = sum(1 for _ in f)
-
-                total_cells = number_of_rows * number_of_columns
-                if total_cells > 5000000:
-                    print(file + " exceeds the 5 million cell Google Sheets limit (" + str(
-                        total_cells) + ") and therefor cannot be imported through the Google Sheets API. Consider using the -b & -n argument to import into Big Query & Sheets instead.")
-                    exit()
+    mc_file_list = list_report_files(mc_reports_directory)
+    if len(mc_file_list) > 0:
+        for file_name, file_fullpath in mc_file_list:
+            csv_profile = profile_report_file(file_fullpath)
+
+            if csv_profile["empty"]:
+                total_cells = 0
+            else:
+                total_cells = (csv_profile["num_rows"] + 1) * csv_profile["num_columns"]
+
+            if total_cells > 5000000:
+                print(os.path.basename(file_fullpath) + " exceeds the 5 million cell Google Sheets limit (" + str(
+                    total_cells) + ") and therefor cannot be imported through the Google Sheets API. Consider using the -b & -n argument to import into Big Query & Sheets instead.")
+                exit()
     else:
         print("No CSV files found in " + mc_reports_directory + "! Exiting!")
         exit()
 
 
+# Token bucket rate limiter, holds up to 10 seconds worth of requests so bursts stay inside the per minute quota
+class TokenBucket:
+    def __init__(self, requests_per_minute):
+        self.rate = requests_per_minute / 60
+        self.capacity = max(self.rate * 10, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    # Take a token, waiting until one is available. Tokens are reserved under the lock, waits happen outside of it.
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate
+
+        if wait > 0:
+            time.sleep(wait)
+
+
+# Rate limiter for an API quota in api_quotas, shared between all clients & threads
+def get_api_rate_limiter(quota):
+    with api_rate_limiters_lock:
+        if quota not in api_rate_limiters:
+            api_rate_limiters[quota] = TokenBucket(api_quotas[quota])
+
+        return api_rate_limiters[quota]
+
+
+# gspread client that keeps Sheets & Drive API requests inside the quotas & retries rate limited or failed requests.
+# Rate limited requests were not applied & are always retried, server errors are only retried for requests that are
+# safe to repeat. The class is created on first use, gspread is only imported by the Sheets modes.
+@functools.cache
+def rate_limited_client_class():
+    class RateLimitedClient(gspread.Client):
+        def request(self, method, endpoint, params=None, data=None, json=None, files=None, headers=None):
+            # json is the keyword gspread passes the body by, it is only read here so nothing below mistakes it for the
+            # json module, request_body_size does the JSON encoding
+            body = json
+
+            if endpoint.startswith(gspread.urls.SPREADSHEETS_API_V4_BASE_URL):
+                quota = "sheets_read" if method == "get" else "sheets_write"
+            else:
+                quota = "drive"
+
+            started = time.perf_counter()
+            limiter_seconds = 0.0
+            tries = 0
+            try:
+                for attempt in range(api_request_tries):
+                    tries += 1
+                    limiter_started = time.perf_counter()
+                    get_api_rate_limiter(quota).acquire()
+                    limiter_seconds += time.perf_counter() - limiter_started
+                    try:
+                        return super().request(method, endpoint, params=params, data=data, json=body, files=files,
+                                               headers=headers)
+                    except gspread.exceptions.APIError as e:
+                        response = e.response
+                        if attempt == api_request_tries - 1:
+                            raise
+                        if is_rate_limit_error(response):
+                            retry_after = response.headers.get("Retry-After", "")
+                        elif response.status_code in [500, 502, 503, 504] and \
+                                is_idempotent_request(method, endpoint, body):
+                            retry_after = ""
+                        else:
+                            raise
+
+                    # Full jitter so parallel workers & imports don't retry in lock step. A Retry-After from the API is
+                    # followed, up to api_max_backoff seconds.
+                    if retry_after.isdigit():
+                        time.sleep(min(int(retry_after), api_max_backoff))
+                    else:
+                        time.sleep(random.uniform(0, min(api_max_backoff, 2 ** (attempt + 1))))
+            finally:
+                num_requests = len(body.get("requests", [])) if isinstance(body, dict) else 0
+                run_metrics.record_api_call(f"{quota} {method.upper()}", time.perf_counter() - started, tries,
+                                            limiter_seconds, request_body_size(data, body) * tries, num_requests)
+
+    return RateLimitedClient
+
+
+# Size in bytes of an API request body, JSON bodies are sized as gspread's session sends them
+def request_body_size(data, body):
+    if body is not None:
+        return len(json.dumps(body))
+    if data is not None:
+        return len(data)
+
+    return 0
+
+
+# Sheets returns 429 when over quota, Drive can also return 403 with a rate limit reason
+def is_rate_limit_error(response):
+    if response.status_code == 429:
+        return True
+
+    if response.status_code == 403:
+        try:
+            errors = response.json()["error"].get("errors", [])
+        except (ValueError, KeyError, AttributeError):
+            return False
+        return any(error.get("reason") in ["rateLimitExceeded", "userRateLimitExceeded"] for error in errors)
+
+    return False
+
+
+# Requests that can be sent again without changing the result: reads, value writes to fixed ranges & batchUpdates only
+# made of requests in sheets_idempotent_requests
+def is_idempotent_request(method, endpoint, body):
+    if method in ["get", "put"]:
+        return True
+
+    if method == "post" and endpoint.endswith("values:batchUpdate"):
+        return True
+
+    if method == "post" and endpoint.endswith(":batchUpdate") and body is not None:
+        return all(list(request)[0] in sheets_idempotent_requests for request in body.get("requests", []))
+
+    return False
+
+
+# Sheets & Drive API client, every request goes through the rate limits & retries of RateLimitedClient
+def authorize_sheets_client(credentials):
+    return gspread.authorize(credentials, client_factory=rate_limited_client_class())
+
+
 # Create Initial Google Sheets
-def create_google_sheets(customer_name, sheets_email_addresses, service_account_key, sheets_id):
+@run_metrics.timed("create_google_sheets")
+def create_google_sheets(customer_name, sheets_email_addresses, service_account_key, sheets_id, template_id=""):
     if sheets_id == "":
-        # print("\nCreating new Google Sheets...")
-        test = 0
+        if template_id != "":
+            print("\nCopying Google Sheets template: " + template_id)
     else:
         print("\nUpdating Google Sheets: " + sheets_id)
 
@@ -95,12 +736,14 @@ def create_google_sheets(customer_name, sheets_email_addresses, service_account_
 
     credentials = google_auth(service_account_key, scope)
 
-    client = gspread.authorize(credentials)
+    client = authorize_sheets_client(credentials)
+
+    # Depending on CLI Args - create new sheet, copy a template sheet or update existing
+    if sheets_id == '' and template_id != '':
+        spreadsheet = client.copy(template_id, title=sheets_title, copy_comments=False)
 
-    # Depending on CLI Args - create new sheet or update existing
-    if sheets_id == '':
+    elif sheets_id == '':
         spreadsheet = client.create(sheets_title)
-        spreadsheet = client.open(sheets_title)
 
     else:
         spreadsheet = client.open_by_key(sheets_id)
@@ -112,35 +755,262 @@ def create_google_sheets(customer_name, sheets_email_addresses, service_account_
     return spreadsheet, credentials
 
 
+# Worksheet properties (title, sheetId, grid size...) of a spreadsheet by title. Fetched at most once & then kept up to
+# date from the requests & replies of the batchUpdates the application sends, so worksheet lookups don't need API calls.
+class SheetsMetadataCache:
+    def __init__(self, spreadsheet):
+        self.spreadsheet = spreadsheet
+        self.worksheet_properties = None
+
+    def load(self):
+        if self.worksheet_properties is None:
+            metadata = self.spreadsheet.fetch_sheet_metadata({"fields": "sheets.properties"})
+            self.worksheet_properties = {}
+            for sheet in metadata.get("sheets", []):
+                self.worksheet_properties[sheet["properties"]["title"]] = sheet["properties"]
+
+        return self.worksheet_properties
+
+    def worksheet(self, title):
+        if title not in self.load():
+            raise gspread.exceptions.WorksheetNotFound(title)
+
+        return gspread.Worksheet(self.spreadsheet, self.worksheet_properties[title])
+
+    def add_worksheet(self, properties):
+        if self.worksheet_properties is not None:
+            self.worksheet_properties[properties["title"]] = properties
+
+    def delete_worksheet(self, sheet_id):
+        if self.worksheet_properties is not None:
+            self.worksheet_properties = {title: properties for title, properties in self.worksheet_properties.items()
+                                         if properties["sheetId"] != sheet_id}
+
+    # Apply the changes of a sent batchUpdate
+    def update(self, requests, replies):
+        for request, reply in zip(requests, replies):
+            if "addSheet" in reply:
+                self.add_worksheet(reply["addSheet"]["properties"])
+            elif "addDataSource" in reply:
+                # Sheets names the data source worksheet after its BQ table
+                data_source = reply["addDataSource"]["dataSource"]
+                self.add_worksheet({
+                    "sheetId": data_source["sheetId"],
+                    "title": data_source["spec"]["bigQuery"]["tableSpec"]["tableId"],
+                    "sheetType": "DATA_SOURCE"
+                })
+            elif "deleteSheet" in request:
+                self.delete_worksheet(request["deleteSheet"]["sheetId"])
+            elif "updateSheetProperties" in request and self.worksheet_properties is not None:
+                properties = request["updateSheetProperties"]["properties"]
+                for worksheet_properties in self.worksheet_properties.values():
+                    if worksheet_properties["sheetId"] == properties["sheetId"]:
+                        worksheet_properties.update(properties)
+
+
+# Metadata cache of a spreadsheet, shared by everything working on the same spreadsheet
+def get_sheets_metadata(spreadsheet):
+    if spreadsheet.id not in sheets_metadata_caches:
+        sheets_metadata_caches[spreadsheet.id] = SheetsMetadataCache(spreadsheet)
+
+    return sheets_metadata_caches[spreadsheet.id]
+
+
+# Collects Sheets API requests for a spreadsheet & sends them in as few batchUpdate calls as possible. Requests are
+# applied in the order they are added, new worksheets get their sheetId up front so later requests can reference them.
+# Worksheets added to the batch grow to fit the cells written into them, so they are sized once when they are created.
+class SheetsRequestBatch:
+    def __init__(self, spreadsheet):
+        self.spreadsheet = spreadsheet
+        self.requests = []
+        # Grid properties of the worksheets added to the batch & not sent yet, by sheetId
+        self.new_worksheets = {}
+        # sheetIds are picked by the client, start from a random offset so they don't clash with existing worksheets
+        self.next_sheet_id = random.randint(1 << 20, 1 << 30)
+
+    # Add the requests of a batchUpdate body
+    def add(self, body):
+        for request in body["requests"]:
+            self.fit_worksheet(request)
+        self.requests += body["requests"]
+
+    def add_worksheet(self, title, rows, cols):
+        sheet_id = self.next_sheet_id
+        self.next_sheet_id += 1
+
+        self.requests.append({
+            "addSheet": {
+                "properties": {
+                    "sheetId": sheet_id,
+                    "title": title,
+                    "gridProperties": {
+                        "rowCount": rows,
+                        "columnCount": cols
+                    }
+                }
+            }
+        })
+        self.new_worksheets[sheet_id] = self.requests[-1]["addSheet"]["properties"]["gridProperties"]
+
+        return sheet_id
+
+    # Grow a worksheet added to the batch so the cells of an updateCells request fit into it
+    def fit_worksheet(self, request):
+        if "updateCells" not in request or "start" not in request["updateCells"]:
+            return
+
+        update_cells = request["updateCells"]
+        grid_properties = self.new_worksheets.get(update_cells["start"]["sheetId"])
+        if grid_properties is None:
+            return
+
+        num_columns = max([len(x.get("values", [])) for x in update_cells["rows"]], default=0)
+        grid_properties["rowCount"] = max(grid_properties["rowCount"],
+                                          update_cells["start"].get("rowIndex", 0) + len(update_cells["rows"]))
+        grid_properties["columnCount"] = max(grid_properties["columnCount"],
+                                             update_cells["start"].get("columnIndex", 0) + num_columns)
+
+    # Same as Worksheet.batch_update, with USER_ENTERED strings starting with "=" are written as formulas
+    def update_values(self, sheet_id, data, value_input_option="RAW"):
+        for value_range in data:
+            grid_range = gspread.utils.a1_range_to_grid_range(value_range["range"], sheet_id)
+
+            rows = []
+            for row in value_range["values"]:
+                cells = []
+                for cell_value in row:
+                    if not isinstance(cell_value, str):
+                        cells.append({"userEnteredValue": {"numberValue": cell_value}})
+                    elif value_input_option == "USER_ENTERED" and cell_value.startswith("="):
+                        cells.append({"userEnteredValue": {"formulaValue": cell_value}})
+                    else:
+                        cells.append({"userEnteredValue": {"stringValue": cell_value}})
+                rows.append({"values": cells})
+
+            self.add({"requests": [{
+                "updateCells": {
+                    "rows": rows,
+                    "start": {
+                        "sheetId": sheet_id,
+                        "rowIndex": grid_range.get("startRowIndex", 0),
+                        "columnIndex": grid_range.get("startColumnIndex", 0)
+                    },
+                    "fields": "userEnteredValue"
+                }
+            }]})
+
+    # Same as Worksheet.batch_format
+    def format(self, sheet_id, formats):
+        for cell_format in formats:
+            self.requests.append({
+                "repeatCell": {
+                    "range": gspread.utils.a1_range_to_grid_range(cell_format["range"], sheet_id),
+                    "cell": {"userEnteredFormat": cell_format["format"]},
+                    "fields": "userEnteredFormat({})".format(",".join(cell_format["format"].keys()))
+                }
+            })
+
+    def delete_worksheet(self, sheet_id):
+        self.requests.append({"deleteSheet": {"sheetId": sheet_id}})
+
+    # Move worksheets to the front of the spreadsheet, in the given order
+    def reorder_worksheets(self, sheet_ids):
+        for index, sheet_id in enumerate(sheet_ids):
+            self.requests.append({
+                "updateSheetProperties": {
+                    "properties": {"sheetId": sheet_id, "index": index},
+                    "fields": "index"
+                }
+            })
+
+    # Split the collected requests into batchUpdates of at most sheets_batch_max_bytes. updateCells requests over the
+    # limit are split into several updateCells requests of consecutive rows.
+    def request_batches(self):
+        batch = []
+        batch_bytes = len(json.dumps({"requests": []}))
+        for request in self.requests:
+            request_bytes = len(json.dumps(request))
+            if "updateCells" in request and "start" in request["updateCells"] and \
+                    request_bytes > sheets_batch_max_bytes and len(request["updateCells"]["rows"]) > 1:
+                requests = self.split_update_cells(request)
+            else:
+                requests = [(request, request_bytes)]
+
+            for request, request_bytes in requests:
+                if len(batch) > 0 and batch_bytes + request_bytes + 2 > sheets_batch_max_bytes:
+                    yield batch
+                    batch = []
+                    batch_bytes = len(json.dumps({"requests": []}))
+
+                batch.append(request)
+                batch_bytes += request_bytes + 2
+
+        if len(batch) > 0:
+            yield batch
+
+    # Split an updateCells request into requests of consecutive rows, each at most sheets_batch_max_bytes
+    def split_update_cells(self, request):
+        update_cells = request["updateCells"]
+        start_row = update_cells["start"].get("rowIndex", 0)
+        # Leave room for the batchUpdate body & the rest of the updateCells request
+        request_bytes = len(json.dumps({"requests": [self.update_cells_rows(update_cells, start_row, [])]}))
+        rows = []
+        rows_bytes = request_bytes
+        for row in update_cells["rows"]:
+            row_bytes = len(json.dumps(row)) + 2
+            if len(rows) > 0 and rows_bytes + row_bytes > sheets_batch_max_bytes:
+                yield self.update_cells_rows(update_cells, start_row, rows), rows_bytes
+                start_row += len(rows)
+                rows = []
+                rows_bytes = request_bytes
+
+            rows.append(row)
+            rows_bytes += row_bytes
+
+        if len(rows) > 0:
+            yield self.update_cells_rows(update_cells, start_row, rows), rows_bytes
+
+    @staticmethod
+    def update_cells_rows(update_cells, start_row, rows):
+        return {"updateCells": dict(update_cells, rows=rows, start=dict(update_cells["start"], rowIndex=start_row))}
+
+    # Send all collected requests, in a single batchUpdate unless they are over sheets_batch_max_bytes. The replies of
+    # all batchUpdates are returned together, in the order of the requests.
+    def execute(self):
+        if len(self.requests) == 0:
+            return None
+
+        response = None
+        for requests in self.request_batches():
+            batch_response = self.spreadsheet.batch_update({"requests": requests})
+            get_sheets_metadata(self.spreadsheet).update(requests, batch_response.get("replies", []))
+            if response is None:
+                response = batch_response
+            else:
+                response["replies"] = response.get("replies", []) + batch_response.get("replies", [])
+        self.requests = []
+        self.new_worksheets = {}
+
+        return response
+
+
 def generate_pie_table_request(spreadsheet, chart_title, ref_column, value_column, position_data):
     # Google Sheets Charts API: https://developers.google.com/sheets/api/samples/charts
+    new_pie_chart_request = request_template("pie_chart_request")
+    chart = new_pie_chart_request["requests"][0]["addChart"]["chart"]
+
+    chart["spec"]["title"] = chart_title
+    chart["spec"]["pieChart"]["domain"]["sourceRange"]["sources"][0]["sheetId"] = spreadsheet
+    chart["spec"]["pieChart"]["domain"]["sourceRange"]["sources"][0]["startColumnIndex"] = ref_column
+    chart["spec"]["pieChart"]["domain"]["sourceRange"]["sources"][0]["endColumnIndex"] = ref_column + 1
+
+    chart["spec"]["pieChart"]["series"]["sourceRange"]["sources"][0]["sheetId"] = spreadsheet
+    chart["spec"]["pieChart"]["series"]["sourceRange"]["sources"][0]["startColumnIndex"] = value_column
+    chart["spec"]["pieChart"]["series"]["sourceRange"]["sources"][0]["endColumnIndex"] = value_column + 1
 
-    f = open('settings.json', )
-    template_file = json.load(f)
-    new_pie_chart_request = template_file["pie_chart_request"]
-    f.close()
-
-    new_pie_chart_request["requests"][0]["addChart"]["chart"]["spec"]["title"] = chart_title
-    new_pie_chart_request["requests"][0]["addChart"]["chart"]["spec"]["pieChart"]["domain"]["sourceRange"]["sources"][
-        0]["sheetId"] = spreadsheet
-    new_pie_chart_request["requests"][0]["addChart"]["chart"]["spec"]["pieChart"]["domain"]["sourceRange"]["sources"][
-        0]["startColumnIndex"] = ref_column
-    new_pie_chart_request["requests"][0]["addChart"]["chart"]["spec"]["pieChart"]["domain"]["sourceRange"]["sources"][
-        0]["endColumnIndex"] = ref_column + 1
-
-    new_pie_chart_request["requests"][0]["addChart"]["chart"]["spec"]["pieChart"]["series"]["sourceRange"]["sources"][
-        0]["sheetId"] = spreadsheet
-    new_pie_chart_request["requests"][0]["addChart"]["chart"]["spec"]["pieChart"]["series"]["sourceRange"]["sources"][
-        0]["startColumnIndex"] = value_column
-    new_pie_chart_request["requests"][0]["addChart"]["chart"]["spec"]["pieChart"]["series"]["sourceRange"]["sources"][
-        0]["endColumnIndex"] = value_column + 1
-
-    new_pie_chart_request["requests"][0]["addChart"]["chart"]["position"]["overlayPosition"]["anchorCell"][
-        "sheetId"] = spreadsheet
-    new_pie_chart_request["requests"][0]["addChart"]["chart"]["position"]["overlayPosition"]["anchorCell"][
-        "columnIndex"] = position_data[0]
-    new_pie_chart_request["requests"][0]["addChart"]["chart"]["position"]["overlayPosition"]["anchorCell"]["rowIndex"] = \
-        position_data[1]
+    chart["position"]["overlayPosition"]["anchorCell"]["sheetId"] = spreadsheet
+    chart["position"]["overlayPosition"]["anchorCell"]["columnIndex"] = position_data[0]
+    chart["position"]["overlayPosition"]["anchorCell"]["rowIndex"] = position_data[1]
 
     return new_pie_chart_request
 
@@ -195,20 +1065,76 @@ def autosize_worksheet(sheet_id, first_col, last_col):
     return body
 
 
-def apply_conditional_color_rule(sheet_id, grid_range, boolean_condition, boolean_value, colors):
-    # Set up conditional rules (Red/Green) to GCP Overview Differences
-    rule = ConditionalFormatRule(
-        ranges=[GridRange.from_a1_range(grid_range, sheet_id)],
-        booleanRule=BooleanRule(
-            condition=BooleanCondition(boolean_condition, [boolean_value]),
-            format=CellFormat(textFormat=textFormat(foregroundColor=Color(colors[0], colors[1], colors[2])))
+# Create API Request to add a conditional rule that colors the text of matching cells (Red/Green)
+def generate_conditional_color_rule_request(sheet_id, grid_range, boolean_condition, boolean_value, colors):
+    body = {
+        "requests": [
+            {
+                "addConditionalFormatRule": {
+                    "rule": {
+                        "ranges": [gspread.utils.a1_range_to_grid_range(grid_range, sheet_id)],
+                        "booleanRule": {
+                            "condition": {
+                                "type": boolean_condition,
+                                "values": [{"userEnteredValue": boolean_value}]
+                            },
+                            "format": {
+                                "textFormat": {
+                                    "foregroundColor": {
+                                        "red": colors[0],
+                                        "green": colors[1],
+                                        "blue": colors[2]
+                                    }
+                                }
+                            }
+                        }
+                    },
+                    "index": 0
+                }
+            }
+        ]
+    }
 
-        )
-    )
+    return body
+
+
+# Create API Request to point the BQ data sources of a copied template Sheets at the new BQ tables. Each data source is
+# matched to the BQ table with the longest name suffix (mapped, unmapped...) its current table ends with.
+def rebind_bq_data_sources_request(data_sources, gcp_project_id, bq_dataset_name, bq_table_prefix, bq_tables):
+    requests = []
+    bq_table_suffixes = sorted([bq_table[len(bq_table_prefix):] for bq_table in bq_tables], key=len, reverse=True)
+
+    for data_source in data_sources:
+        table_id = data_source["spec"]["bigQuery"]["tableSpec"]["tableId"]
+        matches = [suffix for suffix in bq_table_suffixes if table_id.endswith(suffix)]
+        if len(matches) == 0:
+            print(f"No BQ table for template data source {table_id}, leaving it unchanged.")
+            continue
+
+        requests.append({
+            "updateDataSource": {
+                "dataSource": {
+                    "dataSourceId": data_source["dataSourceId"],
+                    "spec": {
+                        "bigQuery": {
+                            "projectId": gcp_project_id,
+                            "tableSpec": {
+                                "tableProjectId": gcp_project_id,
+                                "datasetId": bq_dataset_name,
+                                "tableId": bq_table_prefix + matches[0]
+                            }
+                        }
+                    }
+                },
+                "fields": "spec"
+            }
+        })
+
+    body = {
+        "requests": requests
+    }
 
-    sheet_rules = get_conditional_format_rules(sheet_id)
-    sheet_rules.append(rule)
-    sheet_rules.save()
+    return body
 
 
 # Create API Request to Connect BQ Table to Google Sheets
@@ -256,491 +1182,109 @@ def generate_protect_sheet_request(sheet_id):
     return body
 
 
-# Create Pivot table with sums for Google Sheets
-def generate_pivot_table_request(source, data_source, row_col, value_col, location_spreadsheet,
-                                 pivot_table_location, summarize_function, row_name, row_col_2nd, row_name_2nd,
-                                 value_name, value_col_2nd, value_name_2nd, filter_col, show_diff, row_col_3rd, row_name_3rd, row_col_4th, row_name_4th, row_col_5th, row_name_5th, value_col_3rd, value_name_3rd, value_col_4th, value_name_4th, value_col_5th, value_name_5th, row_col_6th, row_name_6th):
-    # Google Sheets Pivot Table API: https://developers.google.com/sheets/api/samples/pivot-tables
-    f = open('settings.json', )
-    template_file = json.load(f)
-    new_pivot_table_request = template_file["pivot_table_request"]
-    f.close()
+# Copy of a request template from settings.json, safe for the caller to fill in
+def request_template(template_name):
+    return copy.deepcopy(settings_file[template_name])
 
-    if source == "BQ":
-        new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"][
-            "dataSourceId"] = data_source[0]
-        new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"][
-            "dataSourceId"] = data_source[0]
-
-        # If defined, add a 2nd column source for the Pivot Table
-        if row_col_2nd is not None:
-
-            new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][0][
-                "dataSourceColumnReference"] = {}
-            new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][0][
-                "dataSourceColumnReference"]["name"] = row_col
-
-            new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"].append(
-                {})
-            new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][1][
-                "showTotals"] = False
-            new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][1][
-                "sortOrder"] = "DESCENDING"
-            new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][1][
-                "valueBucket"] = {}
-            new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][1][
-                "dataSourceColumnReference"] = {}
-            new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][1][
-                "dataSourceColumnReference"]["name"] = row_col_2nd
-
-            if row_col_3rd is not None:
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"][
-                    "rows"].append({})
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][2][
-                    "showTotals"] = False
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][2][
-                    "sortOrder"] = "DESCENDING"
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][2][
-                    "valueBucket"] = {}
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][2][
-                    "dataSourceColumnReference"] = {}
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][2][
-                    "dataSourceColumnReference"]["name"] = row_col_3rd
-
-            if row_col_4th is not None:
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"][
-                    "rows"].append({})
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][3][
-                    "showTotals"] = False
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][3][
-                    "sortOrder"] = "DESCENDING"
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][3][
-                    "valueBucket"] = {}
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][3][
-                    "dataSourceColumnReference"] = {}
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][3][
-                    "dataSourceColumnReference"]["name"] = row_col_4th
-
-            if row_col_5th is not None:
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"][
-                    "rows"].append({})
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][4][
-                    "showTotals"] = False
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][4][
-                    "sortOrder"] = "DESCENDING"
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][4][
-                    "valueBucket"] = {}
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][4][
-                    "dataSourceColumnReference"] = {}
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][4][
-                    "dataSourceColumnReference"]["name"] = row_col_5th
-
-            if row_col_6th is not None:
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"][
-                    "rows"].append({})
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][5][
-                    "showTotals"] = False
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][5][
-                    "sortOrder"] = "DESCENDING"
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][5][
-                    "valueBucket"] = {}
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][5][
-                    "dataSourceColumnReference"] = {}
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][5][
-                    "dataSourceColumnReference"]["name"] = row_col_6th
 
-        else:
-            new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][0][
-                "dataSourceColumnReference"]["name"] = row_col
+# Create Pivot table with sums for Google Sheets from a PivotSpec. BQ pivot tables reference columns by name, Sheets
+# pivot tables by column offset in the data worksheet.
+def generate_pivot_table_request(source, data_source, pivot_spec, location_spreadsheet):
+    # Google Sheets Pivot Table API: https://developers.google.com/sheets/api/samples/pivot-tables
+    if source == "LOCAL":
+        return generate_local_pivot_table_request(data_source[0]["pivot_tables"][local_pivot_table_key(pivot_spec)],
+                                                  pivot_spec, location_spreadsheet)
 
-        # If defined, add a 2nd column values for the Pivot Table
-        if value_col_2nd is not None:
+    new_pivot_table_request = request_template("pivot_table_request")
+    pivot_table = new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]
 
-            if value_name is not None:
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["values"][
-                    0]["name"] = value_name
-            else:
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["values"][
-                    0]["name"] = "Total"
-
-            new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["values"][0][
-                "dataSourceColumnReference"] = {}
-            new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["values"][0][
-                "dataSourceColumnReference"]["name"] = value_col
-
-            # 2nd Values Column
-            new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"][
-                "values"].append({})
-            new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["values"][1][
-                "summarizeFunction"] = "SUM"
-
-            if value_name_2nd is not None:
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["values"][
-                    1]["name"] = value_name_2nd
-            else:
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["values"][
-                    1]["name"] = "2nd Total"
-
-            new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["values"][1][
-                "dataSourceColumnReference"] = {}
-            new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["values"][1][
-                "dataSourceColumnReference"]["name"] = value_col_2nd
-
-            if value_col_3rd is not None:
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"][
-                    "values"].append({})
-                if value_name_3rd is not None:
-                    new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"][
-                        "values"][2]["name"] = value_name_3rd
-                else:
-                    new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"][
-                        "values"][2]["name"] = "3rd Total"
-
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["values"][
-                    2]["dataSourceColumnReference"] = {}
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["values"][
-                    2]["dataSourceColumnReference"]["name"] = value_col_3rd
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["values"][
-                    2]["summarizeFunction"] = "SUM"
-
-            if value_col_4th is not None:
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"][
-                    "values"].append({})
-                if value_name_4th is not None:
-                    new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"][
-                        "values"][3]["name"] = value_name_4th
-                else:
-                    new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"][
-                        "values"][3]["name"] = "4th Total"
-
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["values"][
-                    3]["dataSourceColumnReference"] = {}
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["values"][
-                    3]["dataSourceColumnReference"]["name"] = value_col_4th
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["values"][
-                    3]["summarizeFunction"] = "SUM"
-
-            if value_col_5th is not None:
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"][
-                    "values"].append({})
-                if value_name_5th is not None:
-                    new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"][
-                        "values"][4]["name"] = value_name_5th
-                else:
-                    new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"][
-                        "values"][4]["name"] = "5th Total"
-
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["values"][
-                    4]["dataSourceColumnReference"] = {}
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["values"][
-                    4]["dataSourceColumnReference"]["name"] = value_col_5th
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["values"][
-                    4]["summarizeFunction"] = "SUM"
-
-            if show_diff is True:
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"][
-                    "values"].append({})
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["values"][
-                    2]["summarizeFunction"] = "SUM"
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["values"][
-                    2]["name"] = "Cost Difference"
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["values"][
-                    2]["formula"] = "=(GCP_Cost - Source_Cost)"
-
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"][
-                    "values"].append({})
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["values"][
-                    3]["summarizeFunction"] = "SUM"
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["values"][
-                    3]["name"] = "% Difference"
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["values"][
-                    3]["formula"] = "=((GCP_Cost - Source_Cost) / Source_Cost)"
+    (filter_type, filter_column) = pivot_spec.filter()
+    filter_criteria = {"condition": {"type": filter_type}}
+    if filter_type == "NUMBER_GREATER":
+        filter_criteria["condition"]["values"] = [{"userEnteredValue": "0"}]
+    elif filter_type == "TEXT_CONTAINS":
+        filter_criteria["condition"]["values"] = [{"userEnteredValue": "Compute Engine"}]
 
-        else:
-            new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["values"][0][
-                "dataSourceColumnReference"]["name"] = value_col
-
-            if show_diff is True:
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["values"][
-                    1]["summarizeFunction"] = "SUM"
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["values"][
-                    1]["name"] = "Cost Difference"
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["values"][
-                    1]["formula"] = "=(GCP_Cost - Source_Cost)"
-
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["values"][
-                    2]["summarizeFunction"] = "SUM"
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["values"][
-                    2]["name"] = "% Difference"
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["values"][
-                    2]["formula"] = "=((GCP_Cost - Source_Cost) / Source_Cost)"
-
-        if filter_col is None:
-            new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["filterSpecs"][
-                0][
-                "dataSourceColumnReference"]["name"] = value_col
-        else:
-            if filter_col != "CONTAINS":
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["filterSpecs"][
-                    0][
-                    "dataSourceColumnReference"]["name"] = filter_col
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["filterSpecs"][
-                    0][
-                    "filterCriteria"]["condition"]["type"] = "NOT_BLANK"
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["filterSpecs"][
-                    0][
-                    "filterCriteria"]["condition"]["values"] = []
-            else:
-
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["filterSpecs"][
-                    0][
-                    "dataSourceColumnReference"]["name"] = "Description"
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["filterSpecs"][
-                    0][
-                    "filterCriteria"]["condition"]["type"] = "TEXT_CONTAINS"
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["filterSpecs"][
-                    0][
-                    "filterCriteria"]["condition"]["values"] = {"userEnteredValue": "Compute Engine"}
+    if source == "BQ":
+        pivot_table["dataSourceId"] = data_source[0]
+        pivot_table["filterSpecs"] = [
+            {"filterCriteria": filter_criteria, "dataSourceColumnReference": {"name": filter_column}}]
+
+        pivot_table["rows"] = []
+        for row in pivot_spec.rows:
+            pivot_table["rows"].append({"dataSourceColumnReference": {"name": row}, "sortOrder": "DESCENDING",
+                                        "showTotals": False, "valueBucket": {}})
+
+        # A single value keeps the template's "Total Cost" name, several values are named or numbered
+        value_names = ["Total", "2nd Total", "3rd Total", "4th Total", "5th Total"]
+        for value_index, value in enumerate(pivot_spec.values):
+            if value_index > 0:
+                pivot_table["values"].append({"summarizeFunction": pivot_spec.summarize_function})
+            if len(pivot_spec.values) > 1:
+                pivot_table["values"][value_index]["name"] = value.name if value.name is not None else \
+                    value_names[value_index]
+            pivot_table["values"][value_index]["dataSourceColumnReference"] = {"name": value.column}
 
     if source == "SHEETS":
         # Clean up template table and remove BQ references
-        new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"].pop("dataSourceId",
-                                                                                                        None)
-        new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"].pop("rows", None)
-
-        new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"].pop("values", None)
-
-        # Create Filter for Pivot Table - default is to not show anything less than zero
-        new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"].pop('filterSpecs',
-                                                                                                        None)
-        new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["filterSpecs"] = []
-        new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"][
-            "filterSpecs"].append({})
-
-        new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["filterSpecs"][0][
-            "filterCriteria"] = {}
-        new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["filterSpecs"][0][
-            "filterCriteria"]["visibleByDefault"] = True
-        new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["filterSpecs"][0][
-            "filterCriteria"]["condition"] = {}
-
-        if filter_col is None:
-            new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["filterSpecs"][
-                0]["columnOffsetIndex"] = value_col
-            new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["filterSpecs"][
-                0]["filterCriteria"]["condition"]["type"] = "NUMBER_GREATER"
-            new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["filterSpecs"][
-                0]["filterCriteria"]["condition"]["values"] = []
-            new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["filterSpecs"][
-                0]["filterCriteria"]["condition"]["values"].append({})
-            new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["filterSpecs"][
-                0]["filterCriteria"]["condition"]["values"][0]["userEnteredValue"] = "0"
-        else:
-            if filter_col != "CONTAINS":
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["filterSpecs"][
-                    0]["columnOffsetIndex"] = filter_col
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["filterSpecs"][
-                    0]["filterCriteria"]["condition"]["type"] = "NOT_BLANK"
-            else:
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["filterSpecs"][
-                    0]["columnOffsetIndex"] = 6
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["filterSpecs"][
-                    0]["filterCriteria"]["condition"]["type"] = "TEXT_CONTAINS"
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"][
-                    "filterSpecs"][
-                    0]["filterCriteria"]["condition"]["values"] = {"userEnteredValue": "Compute Engine"}
+        pivot_table.pop("dataSourceId", None)
 
         # Change templated Pivot Table source to use cells from worksheet
-        new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["source"] = {}
-        new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["source"][
-            "sheetId"] = data_source[0]
-        new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["source"][
-            "startRowIndex"] = 0
-        new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["source"][
-            "startColumnIndex"] = 0
-        new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["source"][
-            "endColumnIndex"] = data_source[1]
-        new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["source"][
-            "endRowIndex"] = data_source[2]
-
-        new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"] = []
-        new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"].append({})
-
-        new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][0][
-            "sourceColumnOffset"] = row_col
-        new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][0][
-            "showTotals"] = False
-        new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][0][
-            "sortOrder"] = "DESCENDING"
-        new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][0][
-            "valueBucket"] = {}
-
-        # If defined, add a 2nd column source for the Pivot Table
-        if row_col_2nd is not None:
-            new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"].append(
-                {})
-
-            new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][1][
-                "sourceColumnOffset"] = row_col_2nd
-            new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][1][
-                "showTotals"] = False
-            new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][1][
-                "sortOrder"] = "DESCENDING"
-            new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][1][
-                "valueBucket"] = {}
-
-            if row_col_3rd is not None:
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"][
-                    "rows"].append(
-                    {})
-
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][2][
-                    "sourceColumnOffset"] = row_col_3rd
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][2][
-                    "showTotals"] = False
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][2][
-                    "sortOrder"] = "DESCENDING"
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][2][
-                    "valueBucket"] = {}
-
-            if row_col_4th is not None:
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"][
-                    "rows"].append(
-                    {})
-
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][3][
-                    "sourceColumnOffset"] = row_col_4th
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][3][
-                    "showTotals"] = False
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][3][
-                    "sortOrder"] = "DESCENDING"
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][3][
-                    "valueBucket"] = {}
-
-            if row_col_5th is not None:
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"][
-                    "rows"].append(
-                    {})
-
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][4][
-                    "sourceColumnOffset"] = row_col_5th
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][4][
-                    "showTotals"] = False
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][4][
-                    "sortOrder"] = "DESCENDING"
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][4][
-                    "valueBucket"] = {}
-
-            if row_col_6th is not None:
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"][
-                    "rows"].append(
-                    {})
-
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][5][
-                    "sourceColumnOffset"] = row_col_6th
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][5][
-                    "showTotals"] = False
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][5][
-                    "sortOrder"] = "DESCENDING"
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["rows"][5][
-                    "valueBucket"] = {}
-
-        new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["values"] = []
-        new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["values"].append({})
-
-        if value_name is not None:
-            new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["values"][0][
-                "name"] = value_name
-
-        new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["values"][0][
-            "sourceColumnOffset"] = value_col
-        new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["values"][0][
-            "summarizeFunction"] = summarize_function
-
-        if value_col_2nd is not None:
-            new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"][
-                "values"].append({})
-
-            if value_name_2nd is not None:
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["values"][
-                    1]["name"] = value_name_2nd
-
-            new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["values"][1][
-                "sourceColumnOffset"] = value_col_2nd
-            new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["values"][1][
-                "summarizeFunction"] = summarize_function
-
-            if value_col_3rd is not None:
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"][
-                    "values"].append({})
-
-                if value_name_3rd is not None:
-                    new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"][
-                        "values"][2]["name"] = value_name_3rd
-
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["values"][
-                    2]["sourceColumnOffset"] = value_col_3rd
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["values"][
-                    2]["summarizeFunction"] = summarize_function
-
-            if value_col_4th is not None:
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"][
-                    "values"].append({})
-
-                if value_name_4th is not None:
-                    new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"][
-                        "values"][3]["name"] = value_name_4th
-
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["values"][
-                    3]["sourceColumnOffset"] = value_col_4th
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["values"][
-                    3]["summarizeFunction"] = summarize_function
-
-            if value_col_5th is not None:
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"][
-                    "values"].append({})
-
-                if value_name_5th is not None:
-                    new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"][
-                        "values"][4]["name"] = value_name_5th
-
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["values"][
-                    4]["sourceColumnOffset"] = value_col_5th
-                new_pivot_table_request["requests"][0]["updateCells"]["rows"][0]["values"][0]["pivotTable"]["values"][
-                    4]["summarizeFunction"] = summarize_function
+        pivot_table["source"] = {
+            "sheetId": data_source[0],
+            "startRowIndex": 0,
+            "startColumnIndex": 0,
+            "endColumnIndex": data_source[1],
+            "endRowIndex": data_source[2]
+        }
+
+        if filter_type == "TEXT_CONTAINS":
+            filter_column = 6  # Data, Column G, Description
+        filter_criteria["visibleByDefault"] = True
+        pivot_table["filterSpecs"] = [{"filterCriteria": filter_criteria, "columnOffsetIndex": filter_column}]
+
+        pivot_table["rows"] = []
+        for row in pivot_spec.rows:
+            pivot_table["rows"].append({"sourceColumnOffset": row, "showTotals": False, "sortOrder": "DESCENDING",
+                                        "valueBucket": {}})
+
+        pivot_table["values"] = []
+        for value in pivot_spec.values:
+            pivot_table["values"].append({"sourceColumnOffset": value.column,
+                                          "summarizeFunction": pivot_spec.summarize_function})
+            if value.name is not None:
+                pivot_table["values"][-1]["name"] = value.name
 
     new_pivot_table_request["requests"][0]["updateCells"]["start"]["sheetId"] = location_spreadsheet
-    new_pivot_table_request["requests"][0]["updateCells"]["start"]["rowIndex"] = pivot_table_location[1]
-    new_pivot_table_request["requests"][0]["updateCells"]["start"]["columnIndex"] = pivot_table_location[0]
+    new_pivot_table_request["requests"][0]["updateCells"]["start"]["rowIndex"] = pivot_spec.location[1]
+    new_pivot_table_request["requests"][0]["updateCells"]["start"]["columnIndex"] = pivot_spec.location[0]
 
     return new_pivot_table_request
 
 
+@run_metrics.timed("generate_mc_sheets")
 def generate_mc_sheets(spreadsheet, worksheet_names, data_source_type, data_source, unmapped_data_worksheet):
     exec_overview_worksheets_name = "Executive Overview"
     gcp_overview_worksheets_name = "GCP Detailed Overview"
     unmapped_worksheets_name = "AWS Unmapped Overview"
     gcp_discounts_worksheets_name = "GCP Discounts"
 
+    sheets_requests = SheetsRequestBatch(spreadsheet)
+
     # Create Executive Overview Worksheet in Sheets
-    exec_overview_worksheet = spreadsheet.add_worksheet(exec_overview_worksheets_name, 60, 25)
-    exec_overview_worksheet_id = exec_overview_worksheet._properties['sheetId']
+    exec_overview_worksheet_id = sheets_requests.add_worksheet(exec_overview_worksheets_name, 60, 25)
 
     # Create GCP Overview Worksheet in Sheets
-    gcp_overview_worksheet = spreadsheet.add_worksheet(gcp_overview_worksheets_name, 125, 25)
-    gcp_overview_worksheet_id = gcp_overview_worksheet._properties['sheetId']
+    gcp_overview_worksheet_id = sheets_requests.add_worksheet(gcp_overview_worksheets_name, 125, 25)
 
     # Create AWS Unmapped Worksheet in Sheets
-    unmapped_worksheet = spreadsheet.add_worksheet(unmapped_worksheets_name, 60, 25)
-    unmapped_worksheet_id = unmapped_worksheet._properties['sheetId']
+    unmapped_worksheet_id = sheets_requests.add_worksheet(unmapped_worksheets_name, 60, 25)
 
     # Create GCP Discounts Worksheet in Sheets
-    gcp_discounts_worksheet = spreadsheet.add_worksheet(gcp_discounts_worksheets_name, 300, 25)
-    gcp_discounts_worksheet_id = gcp_discounts_worksheet._properties['sheetId']
+    gcp_discounts_worksheet_id = sheets_requests.add_worksheet(gcp_discounts_worksheets_name, 300, 25)
 
     # Create Machine Type Overview Worksheet in Sheets
-    mt_overview_worksheet = spreadsheet.add_worksheet("Machine Type Overview", 300, 25)
-    mt_overview_worksheet_id = mt_overview_worksheet._properties['sheetId']
+    mt_overview_worksheet_id = sheets_requests.add_worksheet("Machine Type Overview", 300, 25)
 
     # Create Storage Overview Worksheet in Sheets - CURRENTLY DISABLED
     # storage_overview_worksheet = spreadsheet.add_worksheet("Storage Overview", 60, 25)
@@ -754,8 +1298,11 @@ def generate_mc_sheets(spreadsheet, worksheet_names, data_source_type, data_sour
         unmapped_data_column_formula = f"=SUM(\'{unmapped_data_worksheet}\'!lineItem_UnblendedCost)"
     elif data_source_type == "SHEETS":
         unmapped_data_column_formula = f"=SUM(\'{unmapped_data_worksheet}\'!L2:L)"
+    elif data_source_type == "LOCAL":
+        # No raw data worksheet, use the locally computed total
+        unmapped_data_column_formula = data_source[1]["totals"]["lineItem_UnblendedCost"]
 
-    exec_overview_worksheet.batch_update([
+    sheets_requests.update_values(exec_overview_worksheet_id, [
         {
             'range': "A1:A3",
             'values': [["AWS Spend (GCP Matched)"], ["AWS Spend (Unmatched)"], ["AWS Total Spend"]],
@@ -776,7 +1323,7 @@ def generate_mc_sheets(spreadsheet, worksheet_names, data_source_type, data_sour
                 ["% of AWS Total Spend", "GCP Cost Difference", "GCP Percent Difference"]],
         }
     ]
-        , value_input_option="USER_ENTERED"
+        , "USER_ENTERED"
     )
 
     # Insert Formulas off of pivot tables for above columns
@@ -793,9 +1340,9 @@ def generate_mc_sheets(spreadsheet, worksheet_names, data_source_type, data_sour
         ]
     }
 
-    response = spreadsheet.batch_update(exec_overview_formula_json_request)
+    sheets_requests.add(exec_overview_formula_json_request)
 
-    gcp_overview_worksheet.batch_update([{
+    sheets_requests.update_values(gcp_overview_worksheet_id, [{
         'range': "D1:E1",
         'values': [
             ["GCP Cost Difference", "GCP Percent Difference"]],
@@ -813,7 +1360,7 @@ def generate_mc_sheets(spreadsheet, worksheet_names, data_source_type, data_sour
         ]
     }
 
-    response = spreadsheet.batch_update(gcp_overview_formula_json_request)
+    sheets_requests.add(gcp_overview_formula_json_request)
 
     # GCP % Discounts & GCP Discounted Price
     gcp_discounts_formula_json_request = {"requests":
@@ -828,9 +1375,9 @@ def generate_mc_sheets(spreadsheet, worksheet_names, data_source_type, data_sour
 
         ]
     }
-    response = spreadsheet.batch_update(gcp_discounts_formula_json_request)
+    sheets_requests.add(gcp_discounts_formula_json_request)
 
-    gcp_discounts_worksheet.batch_update([
+    sheets_requests.update_values(gcp_discounts_worksheet_id, [
         {
             'range': "A1",
             'values': [
@@ -858,7 +1405,7 @@ def generate_mc_sheets(spreadsheet, worksheet_names, data_source_type, data_sour
         }
 
 
-    ], value_input_option="USER_ENTERED"
+    ], "USER_ENTERED"
     )
 
     # Machine Type Overview Page
@@ -869,16 +1416,16 @@ def generate_mc_sheets(spreadsheet, worksheet_names, data_source_type, data_sour
 
         ]
     }
-    response = spreadsheet.batch_update(mt_overview_formula_json_request)
+    sheets_requests.add(mt_overview_formula_json_request)
 
-    mt_overview_worksheet.batch_update([
+    sheets_requests.update_values(mt_overview_worksheet_id, [
         {
             'range': "L1:M1",
             'values': [
                 ["GCP Cost Difference", "GCP Percent Difference"]],
         }
 
-    ], value_input_option="USER_ENTERED"
+    ], "USER_ENTERED"
     )
 
     # Add Cost sums to Overview Worksheet. Filter on GCP Cost column being greater than 0.
@@ -887,7 +1434,7 @@ def generate_mc_sheets(spreadsheet, worksheet_names, data_source_type, data_sour
         0  # Row 1
     ]
 
-    if data_source_type == "BQ":
+    if data_source_type == "BQ" or data_source_type == "LOCAL":
         data_source_id = [data_source[0]]
         data_row_col = "GCP_Service"
         data_value_col = "Source_Cost"
@@ -904,13 +1451,14 @@ def generate_mc_sheets(spreadsheet, worksheet_names, data_source_type, data_sour
     value_name = "AWS Cost"
     value_name_2nd = "GCP Cost"
 
-    response = spreadsheet.batch_update(
-        generate_pivot_table_request(data_source_type, data_source_id, data_row_col, data_value_col,
-                                     gcp_overview_worksheet_id,
-                                     pivot_table_location, "SUM", None, None, None, value_name,
-                                     data_value_2nd_col,
-                                     value_name_2nd, filter_column, False, None, None, None, None, None, None, None, None, None, None, None, None, None, None
-                                     ),
+    sheets_requests.add(
+        generate_pivot_table_request(data_source_type, data_source_id,
+                                     PivotSpec(rows=[data_row_col],
+                                               values=[ValueSpec(data_value_col, value_name),
+                                                       ValueSpec(data_value_2nd_col, value_name_2nd)],
+                                               filter_column=filter_column,
+                                               location=pivot_table_location),
+                                     gcp_overview_worksheet_id),
 
     )
 
@@ -920,7 +1468,7 @@ def generate_mc_sheets(spreadsheet, worksheet_names, data_source_type, data_sour
         0  # Row 1
     ]
 
-    if data_source_type == "BQ":
+    if data_source_type == "BQ" or data_source_type == "LOCAL":
         data_source_id = [data_source[0]]
         data_row_col = "Region"
         data_row_col_2nd = "GCP_Service"
@@ -936,13 +1484,13 @@ def generate_mc_sheets(spreadsheet, worksheet_names, data_source_type, data_sour
         filter_column = 7  # Data, Column H, Region
 
     # Add Instance Region Cost
-    response = spreadsheet.batch_update(
-        generate_pivot_table_request(data_source_type, data_source_id, data_row_col, data_value_col,
-                                     gcp_overview_worksheet_id,
-                                     pivot_table_location, "SUM", None, data_row_col_2nd, None, "GCP Cost", None, None,
-                                     filter_column,
-                                     False, None, None, None, None, None, None, None, None, None, None, None, None, None, None
-                                     ))
+    sheets_requests.add(
+        generate_pivot_table_request(data_source_type, data_source_id,
+                                     PivotSpec(rows=[data_row_col, data_row_col_2nd],
+                                               values=[ValueSpec(data_value_col, "GCP Cost")],
+                                               filter_column=filter_column,
+                                               location=pivot_table_location),
+                                     gcp_overview_worksheet_id))
 
     # Add Instance Cost to Overview Worksheet. Filter on Destination_Shape column being not None.
     pivot_table_location = [
@@ -950,7 +1498,7 @@ def generate_mc_sheets(spreadsheet, worksheet_names, data_source_type, data_sour
         0  # Row 1
     ]
 
-    if data_source_type == "BQ":
+    if data_source_type == "BQ" or data_source_type == "LOCAL":
         data_source_id = [data_source[0]]
         data_row_col = "Region"
         data_value_col = "GCP_Cost"
@@ -965,15 +1513,16 @@ def generate_mc_sheets(spreadsheet, worksheet_names, data_source_type, data_sour
         data_row_col_2nd = 10  # Data, Column K, Destination Shape
         filter_col = 10  # Data, Column K, Destination Shape
 
-    response = spreadsheet.batch_update(
-        generate_pivot_table_request(data_source_type, data_source_id, data_row_col, data_value_col,
-                                     gcp_overview_worksheet_id,
-                                     pivot_table_location, "SUM", None, data_row_col_2nd, None, "GCP Cost", None, None,
-                                     filter_col, False, None, None, None, None, None, None, None, None, None, None, None, None, None, None
-                                     ))
+    sheets_requests.add(
+        generate_pivot_table_request(data_source_type, data_source_id,
+                                     PivotSpec(rows=[data_row_col, data_row_col_2nd],
+                                               values=[ValueSpec(data_value_col, "GCP Cost")],
+                                               filter_column=filter_col,
+                                               location=pivot_table_location),
+                                     gcp_overview_worksheet_id))
 
     # Add Cost sums to AWS Unmapped Worksheet. Filter on AWS Cost column being greater than 0.
-    if data_source_type == "BQ":
+    if data_source_type == "BQ" or data_source_type == "LOCAL":
         data_source_id = [data_source[1]]
         data_row_col = "lineItem_ProductCode"
         data_value_col = "lineItem_UnblendedCost"
@@ -988,14 +1537,15 @@ def generate_mc_sheets(spreadsheet, worksheet_names, data_source_type, data_sour
         0  # Row 1
     ]
 
-    response = spreadsheet.batch_update(
-        generate_pivot_table_request(data_source_type, data_source_id, data_row_col, data_value_col,
-                                     unmapped_worksheet_id,
-                                     pivot_table_location, "SUM", None, None, None, "AWS Cost", None, None, None, False, None, None, None, None, None, None, None, None, None, None, None, None, None, None
-                                     ))
+    sheets_requests.add(
+        generate_pivot_table_request(data_source_type, data_source_id,
+                                     PivotSpec(rows=[data_row_col],
+                                               values=[ValueSpec(data_value_col, "AWS Cost")],
+                                               location=pivot_table_location),
+                                     unmapped_worksheet_id))
 
     # Add Instance Region Usage Breakdown.
-    if data_source_type == "BQ":
+    if data_source_type == "BQ" or data_source_type == "LOCAL":
         data_source_id = [data_source[1]]
         data_row_col = "lineItem_ProductCode"
         data_value_col = "lineItem_UnblendedCost"
@@ -1012,12 +1562,12 @@ def generate_mc_sheets(spreadsheet, worksheet_names, data_source_type, data_sour
         0  # Row 1
     ]
 
-    response = spreadsheet.batch_update(
-        generate_pivot_table_request(data_source_type, data_source_id, data_row_col, data_value_col,
-                                     unmapped_worksheet_id,
-                                     pivot_table_location, "SUM", None, data_row_col_2nd, None, "AWS Cost", None, None,
-                                     None, False, None, None, None, None, None, None, None, None, None, None, None, None, None, None
-                                     ))
+    sheets_requests.add(
+        generate_pivot_table_request(data_source_type, data_source_id,
+                                     PivotSpec(rows=[data_row_col, data_row_col_2nd],
+                                               values=[ValueSpec(data_value_col, "AWS Cost")],
+                                               location=pivot_table_location),
+                                     unmapped_worksheet_id))
 
     # Exec Overview Pivot Table
     pivot_table_location = [
@@ -1025,7 +1575,7 @@ def generate_mc_sheets(spreadsheet, worksheet_names, data_source_type, data_sour
         0  # Row 1
     ]
 
-    if data_source_type == "BQ":
+    if data_source_type == "BQ" or data_source_type == "LOCAL":
         data_source_id = [data_source[0]]
     elif data_source_type == "SHEETS":
         data_source_id = [data_source["mapped"]["worksheet_id"].id, data_source["mapped"]["csv_header_length"],
@@ -1037,27 +1587,28 @@ def generate_mc_sheets(spreadsheet, worksheet_names, data_source_type, data_sour
     value_name = "AWS Cost"
     value_name_2nd = "GCP Cost"
 
-    if data_source_type == "BQ":
+    if data_source_type == "BQ" or data_source_type == "LOCAL":
         data_source_id = [data_source[0]]
         data_row_col = "Source_Product"
         data_value_col = "Source_Cost"
-        data_row_col_2nd = "GCP_Cost"
+        data_value_2nd_col = "GCP_Cost"
         filter_column = "Source_Cost"
     elif data_source_type == "SHEETS":
         data_source_id = [data_source["mapped"]["worksheet_id"].id, data_source["mapped"]["csv_header_length"],
                           data_source["mapped"]["csv_num_rows"]]
         data_row_col = 3  # Data, Column D, Source_Product
         data_value_col = 19  # Data, Column T, Source_Cost
-        data_row_col_2nd = 23  # Data, Column K, GCP_Cost
+        data_value_2nd_col = 23  # Data, Column K, GCP_Cost
         filter_column = 19  # Data, Column T, Source_Cost
 
-    response = spreadsheet.batch_update(
-        generate_pivot_table_request(data_source_type, data_source_id, data_row_col, data_value_col,
-                                     exec_overview_worksheet_id,
-                                     pivot_table_location, "SUM", None, None, None, value_name,
-                                     data_row_col_2nd,
-                                     value_name_2nd, filter_column, False, None, None, None, None, None, None, None, None, None, None, None, None, None, None
-                                     ),
+    sheets_requests.add(
+        generate_pivot_table_request(data_source_type, data_source_id,
+                                     PivotSpec(rows=[data_row_col],
+                                               values=[ValueSpec(data_value_col, value_name),
+                                                       ValueSpec(data_value_2nd_col, value_name_2nd)],
+                                               filter_column=filter_column,
+                                               location=pivot_table_location),
+                                     exec_overview_worksheet_id),
 
     )
 
@@ -1067,7 +1618,7 @@ def generate_mc_sheets(spreadsheet, worksheet_names, data_source_type, data_sour
         1  # Row 2
     ]
 
-    if data_source_type == "BQ":
+    if data_source_type == "BQ" or data_source_type == "LOCAL":
         data_source_id = [data_source[0]]
         data_row_col = "GCP_Service"
         data_row_col_2nd = "Destination_Series"
@@ -1089,12 +1640,14 @@ def generate_mc_sheets(spreadsheet, worksheet_names, data_source_type, data_sour
     value_name = "License Cost"
     value_name_2nd = "Infra Cost"
 
-    response = spreadsheet.batch_update(
-        generate_pivot_table_request(data_source_type, data_source_id, data_row_col, data_value_col,
-                                     gcp_discounts_worksheet_id,
-                                     pivot_table_location, "SUM", None, data_row_col_2nd, None, value_name,
-                                     data_value_col_2nd, value_name_2nd, filter_column, False, data_row_col_3rd, None, None, None, None, None, None, None, None, None, None, None, None, None
-                                     ),
+    sheets_requests.add(
+        generate_pivot_table_request(data_source_type, data_source_id,
+                                     PivotSpec(rows=[data_row_col, data_row_col_2nd, data_row_col_3rd],
+                                               values=[ValueSpec(data_value_col, value_name),
+                                                       ValueSpec(data_value_col_2nd, value_name_2nd)],
+                                               filter_column=filter_column,
+                                               location=pivot_table_location),
+                                     gcp_discounts_worksheet_id),
 
     )
 
@@ -1104,7 +1657,7 @@ def generate_mc_sheets(spreadsheet, worksheet_names, data_source_type, data_sour
         0  # Row 1
     ]
 
-    if data_source_type == "BQ":
+    if data_source_type == "BQ" or data_source_type == "LOCAL":
         data_source_id = [data_source[0]]
         data_row_col = "Region"
         data_row_col_2nd = "Source_Shape"
@@ -1143,14 +1696,18 @@ def generate_mc_sheets(spreadsheet, worksheet_names, data_source_type, data_sour
     value_name_4th = "OS Licenses Cost"
     value_name_5th = "GCP Cost"
 
-    response = spreadsheet.batch_update(
-        generate_pivot_table_request(data_source_type, data_source_id, data_row_col, data_value_col,
-                                     mt_overview_worksheet_id,
-                                     pivot_table_location, "SUM", None, data_row_col_2nd, None, value_name,
-                                     data_value_2nd_col,
-                                     value_name_2nd, filter_column, False, data_row_col_3rd, None, data_row_col_4th, None, data_row_col_5th, None, data_value_3rd_col,
-                                     value_name_3rd, data_value_4th_col, value_name_4th, data_value_5th_col, value_name_5th, data_row_col_6th, None
-                                     ),
+    sheets_requests.add(
+        generate_pivot_table_request(data_source_type, data_source_id,
+                                     PivotSpec(rows=[data_row_col, data_row_col_2nd, data_row_col_3rd, data_row_col_4th,
+                                                     data_row_col_5th, data_row_col_6th],
+                                               values=[ValueSpec(data_value_col, value_name),
+                                                       ValueSpec(data_value_2nd_col, value_name_2nd),
+                                                       ValueSpec(data_value_3rd_col, value_name_3rd),
+                                                       ValueSpec(data_value_4th_col, value_name_4th),
+                                                       ValueSpec(data_value_5th_col, value_name_5th)],
+                                               filter_column=filter_column,
+                                               location=pivot_table_location),
+                                     mt_overview_worksheet_id),
 
     )
 
@@ -1163,7 +1720,7 @@ def generate_mc_sheets(spreadsheet, worksheet_names, data_source_type, data_sour
         0  # Row 21
     ]
 
-    res = spreadsheet.batch_update(
+    sheets_requests.add(
         generate_pie_table_request(exec_overview_worksheet_id, chart_title, piechart_row_col, piechart_value_col,
                                    position_data))
 
@@ -1176,7 +1733,7 @@ def generate_mc_sheets(spreadsheet, worksheet_names, data_source_type, data_sour
         0  # Row 1
     ]
 
-    res = spreadsheet.batch_update(
+    sheets_requests.add(
         generate_pie_table_request(gcp_overview_worksheet_id, chart_title, piechart_row_col, piechart_value_col,
                                    position_data))
 
@@ -1189,7 +1746,7 @@ def generate_mc_sheets(spreadsheet, worksheet_names, data_source_type, data_sour
         21  # Row 21
     ]
 
-    res = spreadsheet.batch_update(
+    sheets_requests.add(
         generate_pie_table_request(gcp_overview_worksheet_id, chart_title, piechart_row_col, piechart_value_col,
                                    position_data))
 
@@ -1202,7 +1759,7 @@ def generate_mc_sheets(spreadsheet, worksheet_names, data_source_type, data_sour
         42  # Row 20
     ]
 
-    res = spreadsheet.batch_update(
+    sheets_requests.add(
         generate_pie_table_request(gcp_overview_worksheet_id, chart_title, piechart_row_col, piechart_value_col,
                                    position_data))
 
@@ -1215,7 +1772,7 @@ def generate_mc_sheets(spreadsheet, worksheet_names, data_source_type, data_sour
         0  # Row 1
     ]
 
-    res = spreadsheet.batch_update(
+    sheets_requests.add(
         generate_pie_table_request(unmapped_worksheet_id, chart_title, piechart_row_col, piechart_value_col,
                                    position_data))
 
@@ -1303,7 +1860,7 @@ def generate_mc_sheets(spreadsheet, worksheet_names, data_source_type, data_sour
         },
     ]
 
-    exec_overview_worksheet.batch_format(exec_overview_formats)
+    sheets_requests.format(exec_overview_worksheet_id, exec_overview_formats)
 
     gcp_overview_worksheet_formats = [
         {
@@ -1352,7 +1909,7 @@ def generate_mc_sheets(spreadsheet, worksheet_names, data_source_type, data_sour
         },
     ]
 
-    gcp_overview_worksheet.batch_format(gcp_overview_worksheet_formats)
+    sheets_requests.format(gcp_overview_worksheet_id, gcp_overview_worksheet_formats)
 
     unmapped_worksheet_formats = [
         {
@@ -1375,7 +1932,7 @@ def generate_mc_sheets(spreadsheet, worksheet_names, data_source_type, data_sour
         },
     ]
 
-    unmapped_worksheet.batch_format(unmapped_worksheet_formats)
+    sheets_requests.format(unmapped_worksheet_id, unmapped_worksheet_formats)
 
     gcp_discounts_worksheet_formats = [
         {
@@ -1449,7 +2006,7 @@ def generate_mc_sheets(spreadsheet, worksheet_names, data_source_type, data_sour
         }
     ]
 
-    gcp_discounts_worksheet.batch_format(gcp_discounts_worksheet_formats)
+    sheets_requests.format(gcp_discounts_worksheet_id, gcp_discounts_worksheet_formats)
 
     mt_worksheet_formats = [
         {
@@ -1481,59 +2038,61 @@ def generate_mc_sheets(spreadsheet, worksheet_names, data_source_type, data_sour
         },
     ]
 
-    mt_overview_worksheet.batch_format(mt_worksheet_formats)
+    sheets_requests.format(mt_overview_worksheet_id, mt_worksheet_formats)
 
     # Set up conditional rules (Red/Green) to GCP Overview Differences
-    apply_conditional_color_rule(gcp_overview_worksheet, "D2:E", "NUMBER_GREATER", "0", [1, 0, 0])
-    apply_conditional_color_rule(gcp_overview_worksheet, "D2:E", "NUMBER_LESS", "0", [0, 75, 0])
+    sheets_requests.add(generate_conditional_color_rule_request(gcp_overview_worksheet_id, "D2:E", "NUMBER_GREATER", "0", [1, 0, 0]))
+    sheets_requests.add(generate_conditional_color_rule_request(gcp_overview_worksheet_id, "D2:E", "NUMBER_LESS", "0", [0, 75, 0]))
 
     # Set up conditional rules (Red/Green) to Exec Overview Differences
-    apply_conditional_color_rule(exec_overview_worksheet, "B6", "NUMBER_GREATER", "0", [1, 0, 0])
-    apply_conditional_color_rule(exec_overview_worksheet, "B6", "NUMBER_LESS", "0", [0, 75, 0])
+    sheets_requests.add(generate_conditional_color_rule_request(exec_overview_worksheet_id, "B6", "NUMBER_GREATER", "0", [1, 0, 0]))
+    sheets_requests.add(generate_conditional_color_rule_request(exec_overview_worksheet_id, "B6", "NUMBER_LESS", "0", [0, 75, 0]))
 
     # Set up conditional rules (Red/Green) to Exec Overview Differences
-    apply_conditional_color_rule(exec_overview_worksheet, "H:I", "NUMBER_GREATER", "0", [1, 0, 0])
-    apply_conditional_color_rule(exec_overview_worksheet, "H:I", "NUMBER_LESS", "0", [0, 75, 0])
+    sheets_requests.add(generate_conditional_color_rule_request(exec_overview_worksheet_id, "H:I", "NUMBER_GREATER", "0", [1, 0, 0]))
+    sheets_requests.add(generate_conditional_color_rule_request(exec_overview_worksheet_id, "H:I", "NUMBER_LESS", "0", [0, 75, 0]))
 
     # Set up conditional rules (Red/Green) to MT Overview Differences
-    apply_conditional_color_rule(mt_overview_worksheet, "K:L", "NUMBER_GREATER", "0", [1, 0, 0])
-    apply_conditional_color_rule(mt_overview_worksheet, "K:L", "NUMBER_LESS", "0", [0, 75, 0])
+    sheets_requests.add(generate_conditional_color_rule_request(mt_overview_worksheet_id, "K:L", "NUMBER_GREATER", "0", [1, 0, 0]))
+    sheets_requests.add(generate_conditional_color_rule_request(mt_overview_worksheet_id, "K:L", "NUMBER_LESS", "0", [0, 75, 0]))
 
     # Autosize first cols in Overview worksheet
     first_col = 0
     last_col = 30
-    res = spreadsheet.batch_update(autosize_worksheet(gcp_overview_worksheet_id, first_col, last_col))
+    sheets_requests.add(autosize_worksheet(gcp_overview_worksheet_id, first_col, last_col))
 
     # Autosize first cols in Unmapped worksheet
-    res = spreadsheet.batch_update(autosize_worksheet(unmapped_worksheet_id, first_col, last_col))
+    sheets_requests.add(autosize_worksheet(unmapped_worksheet_id, first_col, last_col))
 
     # Autosize first cols in Exec Overview worksheet
-    res = spreadsheet.batch_update(autosize_worksheet(exec_overview_worksheet_id, first_col, last_col))
-
-    # Refresh all BQ Data sources (removes 'Apply' button from pivot tables)
-    res = spreadsheet.batch_update(refresh_data_sources_body)
+    sheets_requests.add(autosize_worksheet(exec_overview_worksheet_id, first_col, last_col))
 
     # Delete default worksheet
-    worksheet = spreadsheet.worksheet("Sheet1")
-    spreadsheet.del_worksheet(worksheet)
+    sheets_requests.delete_worksheet(get_sheets_metadata(spreadsheet).worksheet("Sheet1").id)
 
     # Reorder Worksheets
-    spreadsheet.reorder_worksheets(
-        [exec_overview_worksheet, gcp_overview_worksheet, unmapped_worksheet, gcp_discounts_worksheet, mt_overview_worksheet]) #, storage_overview_worksheet, db_overview_worksheet])
+    sheets_requests.reorder_worksheets(
+        [exec_overview_worksheet_id, gcp_overview_worksheet_id, unmapped_worksheet_id, gcp_discounts_worksheet_id, mt_overview_worksheet_id])
 
+    # Create the worksheets with their values, pivot tables, charts, formats & conditional rules in one batch
+    sheets_requests.execute()
 
+    # Refresh all BQ Data sources (removes 'Apply' button from pivot tables)
+    res = spreadsheet.batch_update(refresh_data_sources_body)
+
+
+@run_metrics.timed("generate_bq_cur_sheets")
 def generate_bq_cur_sheets(spreadsheet, worksheet_names, data_source_ids):
     overview_worksheets_name = "AWS Overview"
     details_worksheets_name = "AWS Details"
     overview_row_col_name = "lineItem_ProductCode"
     overview_value_col_name = "lineItem_UnblendedCost"
 
-    # Create Overview Worksheet in Sheets
-    overview_worksheet = spreadsheet.add_worksheet(overview_worksheets_name, 60, 25)
-    details_worksheet = spreadsheet.add_worksheet(details_worksheets_name, 60, 25)
+    sheets_requests = SheetsRequestBatch(spreadsheet)
 
-    overview_worksheet_id = overview_worksheet._properties['sheetId']
-    details_worksheet_id = details_worksheet._properties['sheetId']
+    # Create Overview Worksheet in Sheets
+    overview_worksheet_id = sheets_requests.add_worksheet(overview_worksheets_name, 60, 25)
+    details_worksheet_id = sheets_requests.add_worksheet(details_worksheets_name, 60, 25)
 
     source = "BQ"
     data_source = [data_source_ids[0]]
@@ -1544,11 +2103,12 @@ def generate_bq_cur_sheets(spreadsheet, worksheet_names, data_source_ids):
     ]
 
     # AWS Services Cost
-    response = spreadsheet.batch_update(
-        generate_pivot_table_request(source, data_source, overview_row_col_name, overview_value_col_name,
-                                     overview_worksheet_id,
-                                     pivot_table_location, "SUM", None, None, None, None, None, None, None, False, None, None, None, None, None, None, None, None, None, None, None, None, None, None
-                                     ))
+    sheets_requests.add(
+        generate_pivot_table_request(source, data_source,
+                                     PivotSpec(rows=[overview_row_col_name],
+                                               values=[ValueSpec(overview_value_col_name)],
+                                               location=pivot_table_location),
+                                     overview_worksheet_id))
 
     pivot_table_location = [
         5,  # Column F
@@ -1558,11 +2118,12 @@ def generate_bq_cur_sheets(spreadsheet, worksheet_names, data_source_ids):
     overview_row_col_name = "product_region"
     overview_value_col_name = "lineItem_UnblendedCost"
     # AWS Region Cost
-    response = spreadsheet.batch_update(
-        generate_pivot_table_request(source, data_source, overview_row_col_name, overview_value_col_name,
-                                     overview_worksheet_id,
-                                     pivot_table_location, "SUM", None, None, None, None, None, None, None, False, None, None, None, None, None, None, None, None, None, None, None, None, None, None
-                                     ))
+    sheets_requests.add(
+        generate_pivot_table_request(source, data_source,
+                                     PivotSpec(rows=[overview_row_col_name],
+                                               values=[ValueSpec(overview_value_col_name)],
+                                               location=pivot_table_location),
+                                     overview_worksheet_id))
 
     pivot_table_location = [
         8,  # Column F
@@ -1572,12 +2133,13 @@ def generate_bq_cur_sheets(spreadsheet, worksheet_names, data_source_ids):
     overview_row_col_name = "product_instanceType"
     overview_value_col_name = "lineItem_UnblendedCost"
     # AWS Instance Cost
-    response = spreadsheet.batch_update(
-        generate_pivot_table_request(source, data_source, overview_row_col_name, overview_value_col_name,
-                                     overview_worksheet_id,
-                                     pivot_table_location, "SUM", None, None, None, None, None, None,
-                                     "product_instanceType", False, None, None, None, None, None, None, None, None, None, None, None, None, None, None
-                                     ))
+    sheets_requests.add(
+        generate_pivot_table_request(source, data_source,
+                                     PivotSpec(rows=[overview_row_col_name],
+                                               values=[ValueSpec(overview_value_col_name)],
+                                               filter_column="product_instanceType",
+                                               location=pivot_table_location),
+                                     overview_worksheet_id))
 
     pivot_table_location = [
         0,  # Column A
@@ -1587,12 +2149,12 @@ def generate_bq_cur_sheets(spreadsheet, worksheet_names, data_source_ids):
     details_row_col_name = "lineItem_ProductCode"
     details_value_col_name = "lineItem_UnblendedCost"
     # AWS Services Details Cost
-    response = spreadsheet.batch_update(
-        generate_pivot_table_request(source, data_source, details_row_col_name, details_value_col_name,
-                                     details_worksheet_id,
-                                     pivot_table_location, "SUM", None, "lineItem_UsageType", None, None, None, None,
-                                     None, False, None, None, None, None, None, None, None, None, None, None, None, None, None, None
-                                     ))
+    sheets_requests.add(
+        generate_pivot_table_request(source, data_source,
+                                     PivotSpec(rows=[details_row_col_name, "lineItem_UsageType"],
+                                               values=[ValueSpec(details_value_col_name)],
+                                               location=pivot_table_location),
+                                     details_worksheet_id))
 
     pivot_table_location = [
         4,  # Column E
@@ -1602,12 +2164,12 @@ def generate_bq_cur_sheets(spreadsheet, worksheet_names, data_source_ids):
     details_row_col_name = "product_region"
     details_value_col_name = "lineItem_UnblendedCost"
     # AWS Regions Details Cost
-    response = spreadsheet.batch_update(
-        generate_pivot_table_request(source, data_source, details_row_col_name, details_value_col_name,
-                                     details_worksheet_id,
-                                     pivot_table_location, "SUM", None, "product_instanceType", None, None, None, None,
-                                     None, False, None, None, None, None, None, None, None, None, None, None, None, None, None, None
-                                     ))
+    sheets_requests.add(
+        generate_pivot_table_request(source, data_source,
+                                     PivotSpec(rows=[details_row_col_name, "product_instanceType"],
+                                               values=[ValueSpec(details_value_col_name)],
+                                               location=pivot_table_location),
+                                     details_worksheet_id))
 
     # Add Piechart for AWS Services
     chart_title = "AWS Services Breakdown"
@@ -1617,7 +2179,7 @@ def generate_bq_cur_sheets(spreadsheet, worksheet_names, data_source_ids):
         0  # Row 1
     ]
 
-    res = spreadsheet.batch_update(generate_pie_table_request(overview_worksheet_id, chart_title, 2, 3, position_data))
+    sheets_requests.add(generate_pie_table_request(overview_worksheet_id, chart_title, 2, 3, position_data))
 
     # Add Piechart for AWS Regions
     chart_title = "AWS Regions Breakdown"
@@ -1627,7 +2189,7 @@ def generate_bq_cur_sheets(spreadsheet, worksheet_names, data_source_ids):
         21  # Row 21
     ]
 
-    res = spreadsheet.batch_update(generate_pie_table_request(overview_worksheet_id, chart_title, 5, 6, position_data))
+    sheets_requests.add(generate_pie_table_request(overview_worksheet_id, chart_title, 5, 6, position_data))
 
     # Add Piechart for AWS Instances
     chart_title = "AWS Instance Breakdown"
@@ -1637,7 +2199,7 @@ def generate_bq_cur_sheets(spreadsheet, worksheet_names, data_source_ids):
         42  # Row 42
     ]
 
-    res = spreadsheet.batch_update(generate_pie_table_request(overview_worksheet_id, chart_title, 8, 9, position_data))
+    sheets_requests.add(generate_pie_table_request(overview_worksheet_id, chart_title, 8, 9, position_data))
 
     # Add Piechart for AWS Detailed Instances
     chart_title = "AWS Region Instance Breakdown"
@@ -1647,16 +2209,16 @@ def generate_bq_cur_sheets(spreadsheet, worksheet_names, data_source_ids):
         0  # Row 1
     ]
 
-    res = spreadsheet.batch_update(generate_pie_table_request(details_worksheet_id, chart_title, 4, 6, position_data))
+    sheets_requests.add(generate_pie_table_request(details_worksheet_id, chart_title, 4, 6, position_data))
 
-    overview_worksheet.batch_update([{
+    sheets_requests.update_values(overview_worksheet_id, [{
         'range': "A1",
         'values': [["AWS Total Cost"]],
     }, {
         'range': "A2",
         'values': [["=SUM(D2:D)"]],
     }]
-        , value_input_option="USER_ENTERED"
+        , "USER_ENTERED"
     )
 
     overview_worksheet_formats = [
@@ -1705,7 +2267,7 @@ def generate_bq_cur_sheets(spreadsheet, worksheet_names, data_source_ids):
         },
     ]
 
-    overview_worksheet.batch_format(overview_worksheet_formats)
+    sheets_requests.format(overview_worksheet_id, overview_worksheet_formats)
 
     details_worksheet_formats = [
         {
@@ -1728,83 +2290,193 @@ def generate_bq_cur_sheets(spreadsheet, worksheet_names, data_source_ids):
         },
     ]
 
-    details_worksheet.batch_format(details_worksheet_formats)
+    sheets_requests.format(details_worksheet_id, details_worksheet_formats)
 
     # Autosize first cols in Overview worksheet
     first_col = 0
     last_col = 30
-    res = spreadsheet.batch_update(autosize_worksheet(overview_worksheet_id, first_col, last_col))
+    sheets_requests.add(autosize_worksheet(overview_worksheet_id, first_col, last_col))
+
+    # Delete default worksheet
+    sheets_requests.delete_worksheet(get_sheets_metadata(spreadsheet).worksheet("Sheet1").id)
+
+    sheets_requests.reorder_worksheets([overview_worksheet_id, details_worksheet_id])
+
+    # Create the worksheets with their pivot tables, charts & formats in one batch
+    sheets_requests.execute()
 
     # Refresh all BQ Data sources (removes 'Apply' button from pivot tables)
     res = spreadsheet.batch_update(refresh_data_sources_body)
 
-    # Delete default worksheet
-    worksheet = spreadsheet.worksheet("Sheet1")
-    spreadsheet.del_worksheet(worksheet)
 
-    overview_worksheet = spreadsheet.worksheet("AWS Overview")
-    details_worksheet = spreadsheet.worksheet("AWS Details")
+# Group CSV rows into batches of at most batch_rows rows & sheets_batch_max_bytes bytes, with their first row number
+def batch_csv_rows(csv_rows, batch_rows):
+    start_row = 1
+    rows = []
+    batch_bytes = 0
+    for row in csv_rows:
+        # Blank & whitespace only lines aren't rows, like in profile_report_file
+        if len(row) == 0 or (len(row) == 1 and row[0].strip() == ""):
+            continue
+
+        row_bytes = sum(len(x) for x in row) + 3 * len(row)
+        if len(rows) > 0 and (len(rows) >= batch_rows or batch_bytes + row_bytes > sheets_batch_max_bytes):
+            yield start_row, rows
+            start_row += len(rows)
+            rows = []
+            batch_bytes = 0
+
+        rows.append(row)
+        batch_bytes += row_bytes
+
+    if len(rows) > 0:
+        yield start_row, rows
+
+
+# Group the raw CSV text into batches of whole records, without parsing the cells. Records can span lines inside
+# quoted values, so a record ends on the line where the count of quotes becomes even.
+def batch_csv_text(csv_lines, batch_rows):
+    start_row = 1
+    records = []
+    batch_bytes = 0
+    record = ""
+    for line in csv_lines:
+        if record == "" and line.strip() == "":
+            continue
+
+        record += line
+        if record.count('"') % 2 != 0:
+            continue
+
+        if not record.endswith("\n"):
+            record += "\n"
+
+        if len(records) > 0 and (len(records) >= batch_rows or batch_bytes + len(record) > sheets_batch_max_bytes):
+            yield start_row, "".join(records)
+            start_row += len(records)
+            records = []
+            batch_bytes = 0
+
+        records.append(record)
+        batch_bytes += len(record)
+        record = ""
+
+    if record != "":
+        records.append(record)
+
+    if len(records) > 0:
+        yield start_row, "".join(records)
+
 
-    spreadsheet.reorder_worksheets([overview_worksheet, details_worksheet])
+# Write one batch of rows into a worksheet as JSON values
+def upload_sheets_rows(sh, worksheet, start_row, rows):
+    return sh.values_update(
+        "'{}'!A{}".format(worksheet.title.replace("'", "''"), start_row),
+        params={'valueInputOption': 'USER_ENTERED'},
+        body={'values': rows})
+
+
+# Write one batch of raw CSV text into a worksheet, Sheets parses the text on the server
+def upload_sheets_text(sh, worksheet, start_row, text):
+    body = {
+        "requests": [
+            {
+                "pasteData": {
+                    "coordinate": {
+                        "sheetId": worksheet._properties['sheetId'],
+                        "rowIndex": start_row - 1,
+                        "columnIndex": 0
+                    },
+                    "data": text,
+                    "type": "PASTE_NORMAL",
+                    "delimiter": ","
+                }
+            }
+        ]
+    }
+
+    return sh.batch_update(body)
+
+
+# Stream a CSV file into a worksheet in batches, with up to "workers" batches uploading at the same time.
+# upload_mode "values" sends parsed rows as JSON values, "paste" sends the CSV text with pasteData requests.
+def upload_sheets_csv(sh, worksheet, file_fullpath, batch_rows, workers, upload_mode):
+    with io.TextIOWrapper(open_report_file(file_fullpath), newline='') as f, \
+            concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        if upload_mode == "paste":
+            batches = batch_csv_text(f, batch_rows)
+            upload_request = upload_sheets_text
+        else:
+            batches = batch_csv_rows(csv.reader(f), batch_rows)
+            upload_request = upload_sheets_rows
+
+        uploads = set()
+        for start_row, batch in batches:
+            # Only read ahead a couple of batches per worker to keep memory bounded
+            if len(uploads) >= workers * 2:
+                done, uploads = concurrent.futures.wait(uploads, return_when=concurrent.futures.FIRST_COMPLETED)
+                for upload in done:
+                    upload.result()
+
+            uploads.add(executor.submit(upload_request, sh, worksheet, start_row, batch))
+
+        # Raise any errors from the uploads
+        for upload in concurrent.futures.as_completed(uploads):
+            upload.result()
 
 
 # Import mc data from provided reports directory
-def import_mc_data_sheets(mc_reports_directory, spreadsheet, credentials):
-    sheets_id = spreadsheet.id
+@run_metrics.timed("import_mc_data_sheets")
+def import_mc_data_sheets(mc_reports_directory, spreadsheet, batch_rows=10000, workers=1, upload_mode="values"):
+    sh = spreadsheet
     mc_data = {}
     # Grabbing a list of files from the provided mc directory
     try:
-        mc_file_list = os.listdir(mc_reports_directory)
+        mc_file_list = list_report_files(mc_reports_directory)
         print("Importing MC pricing report data: ")
     except:
         print("Unable to access directory: " + mc_reports_directory)
         exit()
 
-    client = gspread.authorize(credentials)
-    sh = client.open_by_key(sheets_id)
-
     if len(mc_file_list) == 0:
         print(f"No files in directory {mc_reports_directory}! Exiting.")
         exit()
 
     # Importing all CSV files into a dictionary of dataframes
-    for file in mc_file_list:
-        if file.endswith(".csv"):
-            file_fullpath = (mc_reports_directory + "/" + file)
-            file_name, _ = file.rsplit(".csv")
-            try:
-                sheet_name = mc_names[file_name]
-            except:
-                print(f"{file_name} does not exist in config! Exiting.")
-                exit()
+    for file_name, file_fullpath in mc_file_list:
+        file = os.path.basename(file_fullpath)
+        try:
+            sheet_name = mc_names[file_name]
+        except:
+            print(f"{file_name} does not exist in config! Exiting.")
+            exit()
 
-            try:
-                mc_data[file_name] = pd.read_csv(file_fullpath, low_memory=False)
-            except:
-                print(f"Unable to open {file}! Exiting.")
-                exit()
+        try:
+            mc_data[file_name] = profile_report_file(file_fullpath)
+        except:
+            print(f"Unable to open {file}! Exiting.")
+            exit()
 
-            # Import Panda/CSV data into worksheet
-            print(f"\t{file}...")
-            # print(list(csv.reader(open(file_fullpath))))
-            worksheet = sh.add_worksheet(title=sheet_name, rows=100, cols=30)
-            sh.values_update(
-                sheet_name,
-                params={'valueInputOption': 'USER_ENTERED'},
-                body={'values': list(csv.reader(open(file_fullpath)))})
+        # Import CSV data into worksheet, sized for the whole file up front
+        print(f"\t{file}...")
+        worksheet = sh.add_worksheet(title=sheet_name, rows=max(mc_data[file_name]["num_rows"] + 1, 1),
+                                     cols=max(mc_data[file_name]["num_columns"], 1))
+        get_sheets_metadata(sh).add_worksheet(worksheet._properties)
+        with run_metrics.stage("sheets_upload", mc_data[file_name]["num_rows"], mc_data[file_name]["num_bytes"]):
+            upload_sheets_csv(sh, worksheet, file_fullpath, batch_rows, workers, upload_mode)
 
-            response = sh.batch_update(generate_protect_sheet_request(worksheet._properties['sheetId']))
+        response = sh.batch_update(generate_protect_sheet_request(worksheet._properties['sheetId']))
 
     data_source = {
         "mapped": {
-            "worksheet_id": sh.worksheet(mc_names["mapped"]),
-            "csv_header_length": 25 + 1,
-            "csv_num_rows": len(mc_data["mapped"]) + 1
+            "worksheet_id": get_sheets_metadata(sh).worksheet(mc_names["mapped"]),
+            "csv_header_length": mc_data["mapped"]["num_columns"],
+            "csv_num_rows": mc_data["mapped"]["num_rows"] + 1
         },
         "unmapped": {
-            "worksheet_id": sh.worksheet(mc_names["unmapped"]),
-            "csv_header_length": 25 + 1,
-            "csv_num_rows": len(mc_data["unmapped"]) + 1
+            "worksheet_id": get_sheets_metadata(sh).worksheet(mc_names["unmapped"]),
+            "csv_header_length": mc_data["unmapped"]["num_columns"],
+            "csv_num_rows": mc_data["unmapped"]["num_rows"] + 1
         },
 
     }
@@ -1812,16 +2484,153 @@ def import_mc_data_sheets(mc_reports_directory, spreadsheet, credentials):
     return data_source
 
 
+def local_pivot_table_key(pivot_spec):
+    return tuple(pivot_spec.rows), tuple(pivot_spec.value_columns()), tuple(pivot_spec.filter())
+
+
+# Sum the values of a pivot table over MC data, rows are filtered the same way as the Sheets pivot table filterSpecs
+def aggregate_pivot_table(mc_data, pivot_spec):
+    (filter_type, filter_column) = pivot_spec.filter()
+    if filter_type == "NOT_BLANK":
+        mc_data = mc_data[mc_data[filter_column].notna() & (mc_data[filter_column] != "")]
+    elif filter_type == "NUMBER_GREATER":
+        mc_data = mc_data[pd.to_numeric(mc_data[filter_column], errors="coerce") > 0]
+    elif filter_type == "TEXT_CONTAINS":
+        mc_data = mc_data[mc_data[filter_column].str.contains("Compute Engine", case=False, regex=False, na=False)]
+
+    return mc_data.groupby(pivot_spec.rows, dropna=False, sort=False)[pivot_spec.value_columns()].sum().reset_index()
+
+
+# Sort a pivot table the way Sheets does for DESCENDING rows: each row group by its total of the first value
+def sort_pivot_table(pivot_data, rows, values):
+    sort_columns = []
+    ascending = []
+    for row_index, row in enumerate(rows):
+        pivot_data[f"sort_{row_index}"] = pivot_data.groupby(rows[:row_index + 1], dropna=False)[values[0]].transform("sum")
+        sort_columns += [f"sort_{row_index}", row]
+        ascending += [False, True]
+
+    return pivot_data.sort_values(sort_columns, ascending=ascending, na_position="last")[rows + values]
+
+
+# Aggregate the MC mapped & unmapped files into the pivot tables of generate_mc_sheets. Each file is read once, chunk
+# by chunk, and only the aggregates are kept in memory.
+@run_metrics.timed("aggregate_mc_data")
+def aggregate_mc_data(mc_reports_directory, chunk_size, csv_engine):
+    mc_file_list = {}
+    try:
+        for file_name, file_fullpath in list_report_files(mc_reports_directory):
+            mc_file_list[file_name] = file_fullpath
+    except:
+        print("Unable to access directory: " + mc_reports_directory)
+        exit()
+
+    if chunk_size is None:
+        chunk_size = 1000000
+
+    data_source = []
+    for file in ["mapped", "unmapped"]:
+        if file not in mc_file_list:
+            print(f"Required MC data file {file} does not exist in {mc_reports_directory}! Exiting!")
+            exit()
+
+        print(f"Aggregating {os.path.basename(mc_file_list[file])}...")
+
+        pivot_tables = [x["pivot_table"] for x in mc_local_pivot_tables if x["file"] == file]
+        columns = []
+        for pivot_table in pivot_tables:
+            for column in pivot_table.rows + pivot_table.value_columns() + pivot_table.filter()[1:]:
+                if column not in columns:
+                    columns.append(column)
+        value_columns = [x for x in columns if mc_column_names[file][x] == 'FLOAT64']
+
+        if profile_report_file(mc_file_list[file])["empty"]:
+            mc_chunks = [mc_arrow_schema(file).empty_table()]
+        else:
+            mc_chunks = read_mc_csv(mc_file_list[file], file, chunk_size, csv_engine)
+
+        partial_pivot_tables = [[] for _ in pivot_tables]
+        partial_totals = []
+        for mc_chunk in mc_chunks:
+            mc_chunk = mc_chunk.select(columns).to_pandas()
+            for pivot_table_index, pivot_table in enumerate(pivot_tables):
+                partial_pivot_tables[pivot_table_index].append(aggregate_pivot_table(mc_chunk, pivot_table))
+            partial_totals.append(mc_chunk[value_columns].sum())
+
+        # Combine the chunk results into the final pivot tables
+        aggregates = {"pivot_tables": {}, "totals": pd.concat(partial_totals, axis=1).sum(axis=1).to_dict()}
+        for pivot_table_index, pivot_table in enumerate(pivot_tables):
+            pivot_data = pd.concat(partial_pivot_tables[pivot_table_index], ignore_index=True)
+            pivot_data = pivot_data.groupby(pivot_table.rows, dropna=False, sort=False)[
+                pivot_table.value_columns()].sum().reset_index()
+
+            aggregates["pivot_tables"][local_pivot_table_key(pivot_table)] = sort_pivot_table(
+                pivot_data, pivot_table.rows, pivot_table.value_columns())
+
+        data_source.append(aggregates)
+
+    return data_source
+
+
+# Write a locally aggregated pivot table as cell values at the pivot table location. Like a Sheets pivot table, nested
+# row labels are only shown on the first row of their group. SheetsRequestBatch sizes the worksheet to fit the table.
+def generate_local_pivot_table_request(pivot_data, pivot_spec, location_spreadsheet):
+    rows = pivot_spec.rows
+    header = []
+    for row in rows:
+        header.append({"userEnteredValue": {"stringValue": row}})
+    for value in pivot_spec.values:
+        value_name = value.name if value.name is not None else f"{pivot_spec.summarize_function} of {value.column}"
+        header.append({"userEnteredValue": {"stringValue": value_name}})
+
+    pivot_rows = [{"values": header}]
+    previous_labels = None
+    for pivot_row in pivot_data.itertuples(index=False):
+        cells = []
+        for column_index, cell_value in enumerate(pivot_row):
+            if column_index < len(rows) and previous_labels is not None and \
+                    previous_labels[:column_index + 1] == pivot_row[:column_index + 1]:
+                cells.append({})
+            elif pd.isna(cell_value):
+                cells.append({})
+            elif isinstance(cell_value, str):
+                cells.append({"userEnteredValue": {"stringValue": cell_value}})
+            else:
+                cells.append({"userEnteredValue": {"numberValue": float(cell_value)}})
+        pivot_rows.append({"values": cells})
+        previous_labels = tuple(pivot_row)
+
+    body = {
+        "requests": [
+            {
+                "updateCells": {
+                    "rows": pivot_rows,
+                    "start": {
+                        "sheetId": location_spreadsheet,
+                        "rowIndex": pivot_spec.location[1],
+                        "columnIndex": pivot_spec.location[0]
+                    },
+                    "fields": "userEnteredValue"
+                }
+            }
+        ]
+    }
+
+    return body
+
+
 def google_auth(service_account_key, scope):
     # Use provided Google Service Account Key, otherwise try to use gcloud auth key to authenticate
     if service_account_key != "":
         try:
+            from oauth2client.service_account import ServiceAccountCredentials
             credentials = ServiceAccountCredentials.from_json_keyfile_name(service_account_key, scope)
         except IOError:
             print("Google Service account key: " + service_account_key + " does not appear to exist! Exiting...")
             exit()
     else:
         try:
+            import google.auth
             credentials, _ = google.auth.default(scopes=scope)
         except:
             print("Unable to auth against Google...")
@@ -1829,255 +2638,694 @@ def google_auth(service_account_key, scope):
     return credentials
 
 
-def import_mc_into_bq(mc_reports_directory, gcp_project_id, bq_dataset_name, bq_table_prefix, service_account_key,
-                      customer_name):
-    # GCP Scope for auth
-    scope = [
-        "https://www.googleapis.com/auth/drive",
-        "https://www.googleapis.com/auth/cloud-platform",
-    ]
+# Ensure the various MC & CUR import versions have the same column names
+def normalize_mc_column_name(file, column):
+    # Replacing column names since BQ doesn't like them with () & the python library "column character map" version doesn't appear to work.
+    column = mc_column_renames[file].get(column, column)
 
-    # Google Auth
-    credentials = google_auth(service_account_key, scope)
-    client = gspread.authorize(credentials)
+    # Ensure no spaces exist in any column names
+    column = column.replace(" ", "_")
 
-    mc_data = {}
-    mc_file_list = []
-    # Grabbing a list of files from the provided mc directory
-    try:
-        print("Importing pricing report files...")
-        for file in settings_file["mc_names"].keys():
-            if os.path.isfile(f"{mc_reports_directory}{file}.csv"):
-                mc_file_list.append(f"{file}")
-        # mc_file_list = os.listdir(f"{mc_reports_directory}/*.csv")
-    except:
-        print("Unable to access directory: " + mc_reports_directory)
-        exit()
+    # More ensuring the various MC & CUR import versions have the same column names
+    return column.replace("product_", "lineItem_")
 
-    # Verify MC files exist
-    if len(mc_file_list) < len(settings_file["mc_names"].keys()):
-        print("Required MC data files do not exist! Exiting!")
-        exit()
 
-    # Create BQ dataset
-    client = bigquery.Client()
-    dataset_id = f"{gcp_project_id}.{bq_dataset_name}"
+@run_metrics.timed("column_rename")
+def rename_mc_columns(mc_dataframe, file):
+    mc_dataframe.rename(columns=lambda x: normalize_mc_column_name(file, x), inplace=True)
 
-    # Construct a full Dataset object to send to the API.
-    dataset = bigquery.Dataset(dataset_id)
 
-    try:
-        client.get_dataset(dataset_id)  # Check if dataset exists
-        print(f"Dataset {dataset_id} already exists.")
-    except:
-        dataset.location = "US"
+# Build an explicit pyarrow schema from the mc_column_names types in settings.json
+def mc_arrow_schema(file):
+    arrow_fields = []
+    for column in mc_column_names[file].keys():
+        if mc_column_names[file][column] == 'FLOAT64':
+            arrow_fields.append(pa.field(column, pa.float64()))
+        else:
+            arrow_fields.append(pa.field(column, pa.string()))
+
+    return pa.schema(arrow_fields)
+
+
+# Convert MC data (read as strings) into a pyarrow table using the settings.json schema
+@run_metrics.timed("schema_conversion")
+def mc_dataframe_to_arrow(mc_dataframe, file):
+    arrow_schema = mc_arrow_schema(file)
+    arrow_columns = []
+    for arrow_field in arrow_schema:
+        if arrow_field.name not in mc_dataframe.columns:
+            arrow_columns.append(pa.nulls(len(mc_dataframe), type=arrow_field.type))
+        elif arrow_field.type == pa.float64():
+            arrow_columns.append(pa.array(pd.to_numeric(mc_dataframe[arrow_field.name], errors="coerce"),
+                                          type=pa.float64(), from_pandas=True))
+        else:
+            arrow_columns.append(pa.array(mc_dataframe[arrow_field.name], type=pa.string(), from_pandas=True))
+
+    return pa.Table.from_arrays(arrow_columns, schema=arrow_schema)
+
+
+# Convert CUR data into a pyarrow table, columns with mixed or no values are stored as strings
+@run_metrics.timed("schema_conversion")
+def cur_dataframe_to_arrow(cur_dataframe):
+    for column in cur_dataframe.columns:
+        if cur_dataframe[column].dtype == object:
+            cur_dataframe[column] = cur_dataframe[column].astype("string")
+
+    arrow_table = pa.Table.from_pandas(cur_dataframe, preserve_index=False)
+    for column_index, arrow_field in enumerate(arrow_table.schema):
+        if pa.types.is_null(arrow_field.type):
+            arrow_table = arrow_table.set_column(column_index, arrow_field.name,
+                                                 arrow_table.column(column_index).cast(pa.string()))
+
+    return arrow_table
+
+
+# Read a MC CSV file with the multi-threaded pyarrow parser, only the settings.json columns are read with their declared types
+def read_mc_csv_pyarrow(file_fullpath, file, chunk_size):
+    csv_profile = profile_report_file(file_fullpath)
+    arrow_schema = mc_arrow_schema(file)
+
+    column_types = {}
+    for column in csv_profile["header"]:
+        schema_column = normalize_mc_column_name(file, column)
+        if schema_column in arrow_schema.names:
+            column_types[column] = arrow_schema.field(schema_column).type
+
+    read_options = pyarrow_csv.ReadOptions(use_threads=True)
+    parse_options = pyarrow_csv.ParseOptions(newlines_in_values=True)
+    convert_options = pyarrow_csv.ConvertOptions(column_types=column_types, include_columns=list(column_types.keys()),
+                                                 strings_can_be_null=True)
+
+    report_file = open_report_file(file_fullpath)
+    if chunk_size is None:
         try:
-            dataset = client.create_dataset(dataset, timeout=30)  # Make an API request.
-        except:
-            print(f"Unable to create dataset: {dataset_id}")
-            exit()
+            arrow_batches = [pyarrow_csv.read_csv(report_file, read_options=read_options,
+                                                  parse_options=parse_options, convert_options=convert_options)]
+        except pa.ArrowInvalid as e:
+            print(f"Unable to parse {file_fullpath} with the settings.json column types, reading as text instead: {e}")
+            report_file.close()
+            yield from read_mc_csv_pandas(file_fullpath, file, chunk_size)
+            return
+    else:
+        # Streaming reader works on byte blocks, size them from the average row length
+        average_row_bytes = csv_profile["num_bytes"] / (csv_profile["num_rows"] + 1)
+        read_options.block_size = max(int(chunk_size * average_row_bytes), 1 << 20)
+        arrow_batches = pyarrow_csv.open_csv(report_file, read_options=read_options,
+                                             parse_options=parse_options, convert_options=convert_options)
+
+    for arrow_batch in arrow_batches:
+        mc_chunk = pa.Table.from_batches([arrow_batch]) if isinstance(arrow_batch, pa.RecordBatch) else arrow_batch
+        mc_chunk = mc_chunk.rename_columns([normalize_mc_column_name(file, x) for x in mc_chunk.column_names])
+
+        # Add any settings.json columns missing from the file & put columns in schema order
+        arrow_columns = []
+        for arrow_field in arrow_schema:
+            if arrow_field.name in mc_chunk.column_names:
+                arrow_columns.append(mc_chunk.column(arrow_field.name))
+            else:
+                arrow_columns.append(pa.nulls(mc_chunk.num_rows, type=arrow_field.type))
 
-        print(f"Dataset {dataset_id} created.")
+        yield pa.Table.from_arrays(arrow_columns, schema=arrow_schema)
 
-    # Importing all CSV files into a dictionary of dataframes
-    for file in mc_file_list:
-        with open(f"{mc_reports_directory}{file}.csv", "rb") as f:
-            num_lines = sum(1 for _ in f)
-        if num_lines > 1:
-            bq_table_name = (f"{bq_table_prefix}{file.replace('.csv', '')}")
-            table_id = (f"{gcp_project_id}.{bq_dataset_name}.{bq_table_name}")
-            print(f"Importing {file}.csv into BQ Table: {table_id}")
-            set_gcp_project = f"gcloud config set project {gcp_project_id} >/dev/null 2>&1"
-
-            schema = ""
-            for column in mc_column_names[file].keys():
-                schema = schema + f"\"{column}\":{mc_column_names[file][column]},"
-
-            # Remove last comma
-            schema = schema[:-1]
-            try:
-                os.system(set_gcp_project)
-            except Exception as e:
-                print(f"error: {e}")
-
-            # if file.endswith(".csv"):
-            file_fullpath = (f"{mc_reports_directory}{file}.csv")
-
-            sheet_name = mc_names[file]
-            mc_data[file] = pd.read_csv(file_fullpath, low_memory=False)
-            # Replacing column names since BQ doesn't like them with () & the python library "column character map" version doesn't appear to work.
-
-            # Ensure the various MC & CUR import versions have the same column names
-            if file == 'mapped':
-                mc_data[file].rename(columns={
-                    "Memory (GB)": "Memory_GB",
-                    "External Memory (GB)": "External_Memory_GB",
-                    "Sub-Type 1": "Sub_Type_1",
-                    "Sub-Type 2": "Sub_Type_2",
-                    "Dest Series": "Destination_Series",
-                    "Extended Memory GB": "External_Memory_GB",
-                    "Dest Shape": "Destination_Shape",
-                    "OS or Licenses Cost": "OS_Licenses_Cost",
-                    "Dest. Shape": "Destination_Shape",
-                    "Dest. Series": "Destination_Series",
-                    "OS / Licenses Cost": "OS_Licenses_Cost",
-                    "Account/Subscription": "Account_Or_Subscription",
-                    "Ext. Memory (GB)": "External_Memory_GB"
-                }, inplace=True)
-
-            if file == 'unmapped':
-                mc_data[file].rename(columns={
-                    "ID": "identity_LineItemIds"
-                }, inplace=True)
-
-            if file == 'discount':
-                mc_data[file].rename(columns={
-                    "ID": "identity_LineItemIds"
-                }, inplace=True)
+    report_file.close()
 
-            # Ensure no spaces exist in any column names
-            mc_data[file].rename(columns=lambda x: x.replace(" ", "_"), inplace=True)
-
-            # More ensuring the various MC & CUR import versions have the same column names
-            mc_data[file].rename(columns=lambda x: x.replace("product_", "lineItem_"), inplace=True)
-
-            schema = []
-            # Create Schema Fields for BQ
-            for column in mc_column_names[file].keys():
-                if mc_column_names[file][column] == 'STRING':
-                    schema.append(bigquery.SchemaField(column, bigquery.enums.SqlTypeNames.STRING))
-                elif mc_column_names[file][column] == 'FLOAT64':
-                    schema.append(bigquery.SchemaField(column, bigquery.enums.SqlTypeNames.FLOAT64))
-
-                # col_count += 1
-
-            job_config = bigquery.LoadJobConfig(
-
-                autodetect=True,
-                skip_leading_rows=1,
-                write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE,
-                create_disposition=bigquery.CreateDisposition.CREATE_IF_NEEDED,
-                column_name_character_map="V2",
-                allow_quoted_newlines=True,
-                schema=schema,
-                source_format=bigquery.SourceFormat.CSV
-            )
 
-            job = client.load_table_from_dataframe(
-                mc_data[file], table_id, job_config=job_config
-            )  # Make an API request.
-            job.result()  # Wait for the job to complete.
+# Read a MC CSV file as pyarrow tables matching the settings.json schema, chunk by chunk when a chunk size is given
+def read_mc_csv(file_fullpath, file, chunk_size, csv_engine):
+    if csv_engine == "pyarrow":
+        mc_chunks = read_mc_csv_pyarrow(file_fullpath, file, chunk_size)
+    else:
+        mc_chunks = read_mc_csv_pandas(file_fullpath, file, chunk_size)
 
-            mc_data[file] = mc_data[file].iloc[0:0]
+    yield from run_metrics.measure_chunks("csv_parse", mc_chunks)
 
-            table = client.get_table(table_id)  # Make an API request.
-            print(
-                "Loaded {} rows and {} columns to {}".format(
-                    table.num_rows, len(table.schema), table_id
-                )
-            )
+
+# Read a MC CSV file with pandas, columns are read as strings so every chunk ends up with the same types
+def read_mc_csv_pandas(file_fullpath, file, chunk_size):
+    with open_report_file(file_fullpath) as report_file:
+        if chunk_size is None:
+            mc_chunks = [pd.read_csv(report_file, dtype=str)]
         else:
-            print(f"Skipping {file}.csv since there is no Migration Center data in the file.")
+            mc_chunks = pd.read_csv(report_file, chunksize=chunk_size, dtype=str)
 
-    print("Completed loading of Migration Center Data into Big Query.")
+        for mc_chunk in mc_chunks:
+            rename_mc_columns(mc_chunk, file)
+            yield mc_dataframe_to_arrow(mc_chunk, file)
 
 
-def import_cur_into_bq(mc_reports_directory, gcp_project_id, bq_dataset_name, bq_table, service_account_key,
-                       customer_name):
-    # GCP Scope for auth
-    scope = [
-        "https://www.googleapis.com/auth/drive",
-        "https://www.googleapis.com/auth/cloud-platform",
-    ]
+# Read a CUR CSV file into a dataframe
+def read_cur_csv(file_fullpath, csv_engine):
+    with open_report_file(file_fullpath) as report_file, run_metrics.stage("csv_parse") as measurement:
+        if csv_engine == "pyarrow":
+            cur_dataframe = pyarrow_csv.read_csv(report_file, read_options=pyarrow_csv.ReadOptions(use_threads=True),
+                                                 parse_options=pyarrow_csv.ParseOptions(
+                                                     newlines_in_values=True)).to_pandas()
+        else:
+            cur_dataframe = pd.read_csv(report_file, low_memory=False)
+        measurement["rows"] = len(cur_dataframe)
+
+    return cur_dataframe
+
+
+# Read an AWS CUR Parquet file, only the settings.json CUR columns are read.
+# Parquet column names (i.e. line_item_product_code) are matched to the CSV style names (lineItem_ProductCode).
+def read_cur_parquet(file_fullpath):
+    parquet_columns = {}
+    for column in pq.read_schema(file_fullpath).names:
+        parquet_columns[re.sub("[^a-z0-9]", "", column.lower())] = column
+
+    cur_column_names = {}
+    for cur_column in cur_columns.keys():
+        for column in [cur_column] + cur_columns[cur_column]:
+            column = re.sub("[^a-z0-9]", "", column.lower())
+            if column in parquet_columns:
+                cur_column_names[parquet_columns[column]] = cur_column
+                break
+
+    with run_metrics.stage("parquet_read") as measurement:
+        cur_table = pq.read_table(file_fullpath, columns=list(cur_column_names.keys()))
+        measurement["rows"] = cur_table.num_rows
+
+    return cur_table.rename_columns([cur_column_names[x] for x in cur_table.column_names]).to_pandas()
+
+
+# Partitioning & clustering of a BQ table from settings.json, only the options enabled on the command line are kept
+def bq_table_layout(table_type, partition, cluster):
+    table_layout = {}
+    if partition is True and "time_partitioning_field" in bq_table_layouts[table_type]:
+        table_layout["time_partitioning_field"] = bq_table_layouts[table_type]["time_partitioning_field"]
+    if cluster is True and "clustering_fields" in bq_table_layouts[table_type]:
+        table_layout["clustering_fields"] = bq_table_layouts[table_type]["clustering_fields"]
+
+    return table_layout
+
+
+# Set the partitioning & clustering of a BQ load job, fields missing from the data are left out
+def set_bq_table_layout(job_config, table_layout, columns):
+    time_partitioning_field = table_layout.get("time_partitioning_field")
+    if time_partitioning_field in columns:
+        job_config.time_partitioning = bigquery.TimePartitioning(type_=bigquery.TimePartitioningType.DAY,
+                                                                 field=time_partitioning_field)
+
+    # BQ allows up to 4 clustering fields
+    clustering_fields = [x for x in table_layout.get("clustering_fields", []) if x in columns][:4]
+    if len(clustering_fields) > 0:
+        job_config.clustering_fields = clustering_fields
+
+
+# Load job for a dataframe. The BQ client uploads dataframes as CSV without a header row, so every row is data.
+def dataframe_load_job_config(write_disposition, table_layout, columns, column_types=None):
+    job_config = bigquery.LoadJobConfig(
+        write_disposition=write_disposition,
+        create_disposition=bigquery.CreateDisposition.CREATE_IF_NEEDED,
+        column_name_character_map="V2",
+        allow_quoted_newlines=True,
+        source_format=bigquery.SourceFormat.CSV
+    )
 
-    #Google Auth
-    credentials = google_auth(service_account_key, scope)
-    client = gspread.authorize(credentials)
+    if column_types is not None:
+        schema = []
+        # Create Schema Fields for BQ
+        for column in column_types.keys():
+            if column_types[column] == 'STRING':
+                schema.append(bigquery.SchemaField(column, bigquery.enums.SqlTypeNames.STRING))
+            elif column_types[column] == 'FLOAT64':
+                schema.append(bigquery.SchemaField(column, bigquery.enums.SqlTypeNames.FLOAT64))
+        job_config.schema = schema
 
-    cur_data = {}
-    cur_file_list = [f for f in os.listdir(mc_reports_directory) if
-                     os.path.isfile(os.path.join(mc_reports_directory, f))]
+    set_bq_table_layout(job_config, table_layout, columns)
 
-    # Create BQ dataset
-    client = bigquery.Client()
-    dataset_id = f"{gcp_project_id}.{bq_dataset_name}"
+    return job_config
 
-    # Construct a full Dataset object to send to the API.
-    dataset = bigquery.Dataset(dataset_id)
 
-    try:
-        client.get_dataset(dataset_id)  # Check if dataset exists
-        print(f"Dataset {dataset_id} already exists.")
-    except:
-        dataset.location = "US"
+# Convert a MC CSV file into a local Parquet file
+@run_metrics.timed("parquet_staging")
+def stage_mc_parquet(file_fullpath, file, parquet_file, chunk_size, csv_engine):
+    with pq.ParquetWriter(parquet_file, mc_arrow_schema(file), compression="zstd") as parquet_writer:
+        for mc_chunk in read_mc_csv(file_fullpath, file, chunk_size, csv_engine):
+            parquet_writer.write_table(mc_chunk)
+
+
+# Big Query destination for the imported data
+class BigQuerySink:
+    def __init__(self, gcp_project_id, service_account_key):
+        # GCP Scope for auth
+        scope = [
+            "https://www.googleapis.com/auth/drive",
+            "https://www.googleapis.com/auth/cloud-platform",
+        ]
+
+        # Google Auth
+        google_auth(service_account_key, scope)
+
+        self.client = bigquery.Client()
+        self.destination = "bigquery"
+
+        set_gcp_project = f"gcloud config set project {gcp_project_id} >/dev/null 2>&1"
         try:
-            dataset = client.create_dataset(dataset, timeout=30)  # Make an API request.
+            os.system(set_gcp_project)
+        except Exception as e:
+            print(f"error: {e}")
+
+    def create_dataset(self, dataset_id):
+        # Construct a full Dataset object to send to the API.
+        dataset = bigquery.Dataset(dataset_id)
+
+        try:
+            self.client.get_dataset(dataset_id)  # Check if dataset exists
+            print(f"Dataset {dataset_id} already exists.")
         except:
-            print(f"Unable to create dataset: {dataset_id}")
+            dataset.location = "US"
+            try:
+                dataset = self.client.create_dataset(dataset, timeout=30)  # Make an API request.
+            except:
+                print(f"Unable to create dataset: {dataset_id}")
+                exit()
+
+            print(f"Dataset {dataset_id} created.")
+
+    def table_exists(self, table_id):
+        import google.api_core.exceptions
+
+        try:
+            self.client.get_table(table_id)  # Make an API request.
+        except google.api_core.exceptions.NotFound:
+            return False
+
+        return True
+
+    def delete_table(self, table_id):
+        self.client.delete_table(table_id, not_found_ok=True)
+
+    # Number of rows & columns in a table
+    def table_size(self, table_id):
+        table = self.client.get_table(table_id)  # Make an API request.
+        return table.num_rows, len(table.schema)
+
+    # Whether the partitioning or clustering of an existing table differs from what a load job with table_layout sets.
+    # Load jobs can't change the layout of a table, appending with a different layout fails.
+    def table_layout_changed(self, table_id, table_layout):
+        table = self.client.get_table(table_id)  # Make an API request.
+        job_config = bigquery.LoadJobConfig()
+        set_bq_table_layout(job_config, table_layout, [x.name for x in table.schema])
+
+        table_partitioning = None
+        if table.time_partitioning is not None:
+            table_partitioning = (table.time_partitioning.type_, table.time_partitioning.field)
+        job_partitioning = None
+        if job_config.time_partitioning is not None:
+            job_partitioning = (job_config.time_partitioning.type_, job_config.time_partitioning.field)
+
+        return table_partitioning != job_partitioning or \
+            list(table.clustering_fields or []) != list(job_config.clustering_fields or [])
+
+    # Load a dataframe into a table, column_types (from settings.json) sets the BQ schema
+    def load_dataframe(self, dataframe, table_id, write_disposition, table_layout, column_types=None):
+        job_config = dataframe_load_job_config(write_disposition, table_layout, dataframe.columns, column_types)
+
+        started = time.perf_counter()
+        with run_metrics.stage("bq_upload", rows=len(dataframe)):
+            job = self.client.load_table_from_dataframe(
+                dataframe, table_id, job_config=job_config
+            )  # Make an API request.
+        with run_metrics.phase("bq_job_wait"):
+            job.result()  # Wait for the job to complete.
+        run_metrics.record_load_job(table_id, job.job_id, time.perf_counter() - started, job.output_rows,
+                                    job.input_file_bytes)
+
+        if job.output_rows != len(dataframe):
+            print(f"BQ load job {job.job_id} loaded {job.output_rows} of {len(dataframe)} rows into {table_id}! "
+                  "Exiting!")
             exit()
 
-        print(f"Dataset {dataset_id} created.")
+        return job.job_id
 
-    table_id = (f"{gcp_project_id}.{bq_dataset_name}.{bq_table}")
-    # Deleting table first if exists
+    # Upload a local Parquet file into a table
+    def load_parquet(self, parquet_file, table_id, write_disposition, table_layout):
+        job_config = bigquery.LoadJobConfig(
+            write_disposition=write_disposition,
+            create_disposition=bigquery.CreateDisposition.CREATE_IF_NEEDED,
+            source_format=bigquery.SourceFormat.PARQUET
+        )
+        set_bq_table_layout(job_config, table_layout, pq.read_schema(parquet_file).names)
 
-    client.delete_table(table_id, not_found_ok=True)
+        started = time.perf_counter()
+        with open(parquet_file, "rb") as f, run_metrics.stage("bq_upload", pq.read_metadata(parquet_file).num_rows,
+                                                              os.path.getsize(parquet_file)):
+            job = self.client.load_table_from_file(f, table_id, job_config=job_config)  # Make an API request.
+        with run_metrics.phase("bq_job_wait"):
+            job.result()  # Wait for the job to complete.
+        run_metrics.record_load_job(table_id, job.job_id, time.perf_counter() - started, job.output_rows,
+                                    job.input_file_bytes)
 
-    # Importing all CSV files into a dictionary of dataframes
-    for file in cur_file_list:
-        with open(f"{mc_reports_directory}{file}", "rb") as f:
-            num_lines = sum(1 for _ in f)
-        if num_lines > 1:
-            print(f"Importing {file} into BQ Table: {table_id}")
-            set_gcp_project = f"gcloud config set project {gcp_project_id} >/dev/null 2>&1"
-
-            # schema = ""
-            # for column in mc_column_names[file].keys():
-            #     schema = schema + f"\"{column}\":{mc_column_names[file][column]},"
-            #
-            # # Remove last comma
-            # schema = schema[:-1]
-            try:
-                os.system(set_gcp_project)
-            except Exception as e:
-                print(f"error: {e}")
+        return job.job_id
 
-            # if file.endswith(".csv"):
-            file_fullpath = (f"{mc_reports_directory}{file}")
 
-            cur_data[file] = pd.read_csv(file_fullpath, low_memory=False)
+# Local DuckDB destination for offline imports. BQ table IDs (project.dataset.table) are stored as dataset.table,
+# partitioning & clustering are ignored.
+class DuckDBSink:
+    def __init__(self, database_file):
+        try:
+            import duckdb
+        except ImportError:
+            print("DuckDB is not installed, install it with: pip install duckdb")
+            exit()
 
-            # Ensure no spaces exist in any column names
-            cur_data[file].rename(columns=lambda x: x.replace(" ", "_"), inplace=True)
-            cur_data[file].rename(columns=lambda x: x.replace("/", "_"), inplace=True)
-
-            job_config = bigquery.LoadJobConfig(
-
-                autodetect=True,
-                skip_leading_rows=1,
-                write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
-                create_disposition=bigquery.CreateDisposition.CREATE_IF_NEEDED,
-                column_name_character_map="V2",
-                allow_quoted_newlines=True,
-                #schema=schema,
-                source_format=bigquery.SourceFormat.CSV
-            )
+        self.database_file = database_file
+        self.destination = f"duckdb:{os.path.abspath(database_file)}"
+        self.connection = duckdb.connect(database_file)
+        # The DuckDB connection is shared by the load workers
+        self.lock = threading.Lock()
+
+    def table_name(self, table_id):
+        (dataset_name, table_name) = table_id.split(".")[-2:]
+        return f'"{dataset_name}"."{table_name}"'
+
+    def create_dataset(self, dataset_id):
+        with self.lock:
+            self.connection.execute(f'CREATE SCHEMA IF NOT EXISTS "{dataset_id.split(".")[-1]}"')
+        print(f"Dataset {dataset_id} ready in DuckDB database: {self.database_file}")
+
+    def table_exists(self, table_id):
+        (dataset_name, table_name) = table_id.split(".")[-2:]
+        with self.lock:
+            tables = self.connection.execute(
+                "SELECT count(*) FROM information_schema.tables WHERE table_schema = ? AND table_name = ?",
+                [dataset_name, table_name]).fetchone()[0]
+
+        return tables > 0
+
+    def delete_table(self, table_id):
+        with self.lock:
+            self.connection.execute(f"DROP TABLE IF EXISTS {self.table_name(table_id)}")
+
+    # Number of rows & columns in a table
+    def table_size(self, table_id):
+        with self.lock:
+            table = self.connection.execute(f"SELECT * FROM {self.table_name(table_id)} LIMIT 0")
+            num_columns = len(table.description)
+            num_rows = self.connection.execute(f"SELECT count(*) FROM {self.table_name(table_id)}").fetchone()[0]
+
+        return num_rows, num_columns
+
+    # Partitioning & clustering are ignored
+    def table_layout_changed(self, table_id, table_layout):
+        return False
+
+    # Create/replace or append to a table from a SELECT over the source data
+    def load_select(self, select, table_id, write_disposition):
+        if write_disposition == bigquery.WriteDisposition.WRITE_APPEND and self.table_exists(table_id):
+            sql = f"INSERT INTO {self.table_name(table_id)} BY NAME {select}"
+        else:
+            sql = f"CREATE OR REPLACE TABLE {self.table_name(table_id)} AS {select}"
+
+        job_id = f"duckdb_{uuid.uuid4().hex}"
+        started = time.perf_counter()
+        with self.lock, run_metrics.phase("duckdb_load"):
+            self.connection.execute(sql)
+        run_metrics.record_load_job(table_id, job_id, time.perf_counter() - started, None, None)
+
+        return job_id
+
+    # Load a dataframe into a table, column_types (from settings.json) sets the column types
+    def load_dataframe(self, dataframe, table_id, write_disposition, table_layout, column_types=None):
+        select_columns = []
+        for column in dataframe.columns:
+            if column_types is not None and column_types.get(column) == 'FLOAT64':
+                select_columns.append(f'CAST("{column}" AS DOUBLE) AS "{column}"')
+            elif column_types is not None and column_types.get(column) == 'STRING':
+                select_columns.append(f'CAST("{column}" AS VARCHAR) AS "{column}"')
+            else:
+                select_columns.append(f'"{column}"')
 
-            job = client.load_table_from_dataframe(
-                cur_data[file], table_id, job_config=job_config
-            )  # Make an API request.
-            job.result()  # Wait for the job to complete.
+        view_name = f"import_{uuid.uuid4().hex}"
+        with self.lock:
+            self.connection.register(view_name, dataframe)
+        try:
+            return self.load_select(f"SELECT {', '.join(select_columns)} FROM {view_name}", table_id,
+                                    write_disposition)
+        finally:
+            with self.lock:
+                self.connection.unregister(view_name)
+
+    # Load a local Parquet file into a table
+    def load_parquet(self, parquet_file, table_id, write_disposition, table_layout):
+        parquet_file = parquet_file.replace("'", "''")
+        return self.load_select(f"SELECT * FROM read_parquet('{parquet_file}')", table_id, write_disposition)
+
+
+# Parse a MC file & load it into a table
+def load_mc_file_into_bq(sink, file_fullpath, file, table_id, chunk_size, parquet_staging, csv_engine, table_layout):
+    if sink.table_exists(table_id) and sink.table_layout_changed(table_id, table_layout):
+        # A table can't be replaced by one with a different partitioning or clustering
+        sink.delete_table(table_id)
+
+    if parquet_staging is True:
+        with tempfile.TemporaryDirectory() as staging_directory:
+            parquet_file = os.path.join(staging_directory, f"{file}.parquet")
+            stage_mc_parquet(file_fullpath, file, parquet_file, chunk_size, csv_engine)
+            job_id = sink.load_parquet(parquet_file, table_id, bigquery.WriteDisposition.WRITE_TRUNCATE, table_layout)
+    elif chunk_size is None and csv_engine == "pandas":
+        with open_report_file(file_fullpath) as f, run_metrics.stage("csv_parse") as measurement:
+            mc_data = pd.read_csv(f, low_memory=False)
+            measurement["rows"] = len(mc_data)
+        rename_mc_columns(mc_data, file)
+
+        job_id = sink.load_dataframe(mc_data, table_id, bigquery.WriteDisposition.WRITE_TRUNCATE, table_layout,
+                                     mc_column_names[file])
+
+        del mc_data
+    else:
+        # Stream the CSV in chunks, first chunk replaces the table & the rest are appended.
+        write_disposition = bigquery.WriteDisposition.WRITE_TRUNCATE
+        for mc_chunk in read_mc_csv(file_fullpath, file, chunk_size, csv_engine):
+            job_id = sink.load_dataframe(mc_chunk.to_pandas(), table_id, write_disposition, table_layout,
+                                         mc_column_names[file])
 
-            cur_data[file] = cur_data[file].iloc[0:0]
+            write_disposition = bigquery.WriteDisposition.WRITE_APPEND
 
-            table = client.get_table(table_id)  # Make an API request.
+    # Table size for import_mc_into_bq to print, so the output of concurrent loads doesn't interleave
+    (num_rows, num_columns) = sink.table_size(table_id)
+
+    return job_id, num_rows, num_columns
+
+
+@run_metrics.timed("import_mc_into_bq")
+def import_mc_into_bq(mc_reports_directory, gcp_project_id, bq_dataset_name, bq_table_prefix, service_account_key,
+                      customer_name, chunk_size=None, parquet_staging=False, csv_engine="pandas", workers=1,
+                      incremental=False, partition=False, cluster=False, sink=None):
+    report_files = {}
+    # Grabbing a list of files from the provided mc directory
+    try:
+        print("Importing pricing report files...")
+        for file_name, file_fullpath in list_report_files(mc_reports_directory):
+            report_files[file_name] = file_fullpath
+    except:
+        print("Unable to access directory: " + mc_reports_directory)
+        exit()
+
+    # Files are loaded in the mc_names order
+    mc_file_list = {}
+    for file_name in settings_file["mc_names"].keys():
+        if file_name in report_files:
+            mc_file_list[file_name] = report_files[file_name]
+
+    # Verify MC files exist
+    if len(mc_file_list) < len(settings_file["mc_names"].keys()):
+        print("Required MC data files do not exist! Exiting!")
+        exit()
+
+    if sink is None:
+        sink = BigQuerySink(gcp_project_id, service_account_key)
+
+    # Create BQ dataset
+    sink.create_dataset(f"{gcp_project_id}.{bq_dataset_name}")
+
+    if incremental is True:
+        import_manifest = load_import_manifest(mc_reports_directory)
+
+    # Parse & load each MC file into its own BQ table, running up to "workers" files at the same time
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        mc_load_jobs = {}
+        for file, file_fullpath in mc_file_list.items():
+            if not profile_report_file(file_fullpath)["empty"]:
+                bq_table_name = (f"{bq_table_prefix}{file}")
+                table_id = (f"{gcp_project_id}.{bq_dataset_name}.{bq_table_name}")
+                table_layout = bq_table_layout(file, partition, cluster)
+
+                if incremental is True:
+                    file_hash = report_file_hash(file_fullpath)
+                    manifest_entry = import_manifest["files"].get(os.path.relpath(file_fullpath, mc_reports_directory))
+                    if import_manifest_entry_unchanged(manifest_entry, file_hash, table_id, sink, table_layout) and \
+                            sink.table_exists(table_id):
+                        print(f"Skipping {os.path.basename(file_fullpath)} since it is unchanged since the last import into {table_id}.")
+                        continue
+                else:
+                    file_hash = None
+
+                print(f"Importing {os.path.basename(file_fullpath)} into BQ Table: {table_id}")
+
+                mc_load_job = executor.submit(load_mc_file_into_bq, sink, file_fullpath, file, table_id,
+                                              chunk_size, parquet_staging, csv_engine, table_layout)
+                mc_load_jobs[mc_load_job] = (file_fullpath, file_hash, table_id, table_layout)
+            else:
+                print(f"Skipping {os.path.basename(file_fullpath)} since there is no Migration Center data in the file.")
+
+        # Raise any errors from the load jobs & record the loaded files, in the mc_names order
+        for mc_load_job, (file_fullpath, file_hash, table_id, table_layout) in mc_load_jobs.items():
+            (job_id, num_rows, num_columns) = mc_load_job.result()
             print(
                 "Loaded {} rows and {} columns to {}".format(
-                    table.num_rows, len(table.schema), table_id
+                    num_rows, num_columns, table_id
                 )
             )
+
+            if incremental is True:
+                record_import_manifest(import_manifest, mc_reports_directory, file_fullpath, file_hash, table_id, sink,
+                                       table_layout, job_id)
+                save_import_manifest(mc_reports_directory, import_manifest)
+
+    print("Completed loading of Migration Center Data into Big Query.")
+
+
+# Parse a batch of CUR files & append them to a BQ table with a single load job
+def load_cur_files_into_bq(sink, cur_files, table_id, parquet_staging, csv_engine, table_layout):
+    cur_data = []
+    for file_fullpath in cur_files:
+        print(f"Importing {os.path.basename(file_fullpath)} into BQ Table: {table_id}")
+
+        if file_fullpath.endswith(".parquet"):
+            cur_data.append(read_cur_parquet(file_fullpath))
         else:
-            print(f"Skipping {file} since there is no data in the file.")
+            cur_data.append(read_cur_csv(file_fullpath, csv_engine))
+
+            # Ensure no spaces exist in any column names
+            with run_metrics.stage("column_rename"):
+                cur_data[-1].rename(columns=lambda x: x.replace(" ", "_"), inplace=True)
+                cur_data[-1].rename(columns=lambda x: x.replace("/", "_"), inplace=True)
+
+    if len(cur_data) > 1:
+        cur_data = pd.concat(cur_data, ignore_index=True)
+    else:
+        cur_data = cur_data[0]
+
+    # Partitioning needs the usage date as a timestamp instead of a string
+    time_partitioning_field = table_layout.get("time_partitioning_field")
+    if time_partitioning_field in cur_data.columns:
+        cur_data[time_partitioning_field] = pd.to_datetime(cur_data[time_partitioning_field], utc=True,
+                                                           errors="coerce")
+
+    if parquet_staging is True:
+        with tempfile.TemporaryDirectory() as staging_directory:
+            parquet_file = os.path.join(staging_directory, "cur.parquet")
+            pq.write_table(cur_dataframe_to_arrow(cur_data), parquet_file, compression="zstd")
+            job_id = sink.load_parquet(parquet_file, table_id, bigquery.WriteDisposition.WRITE_APPEND, table_layout)
+    else:
+        job_id = sink.load_dataframe(cur_data, table_id, bigquery.WriteDisposition.WRITE_APPEND, table_layout)
+
+    return job_id
+
+
+@run_metrics.timed("import_cur_into_bq")
+def import_cur_into_bq(mc_reports_directory, gcp_project_id, bq_dataset_name, bq_table, service_account_key,
+                       customer_name, parquet_staging=False, csv_engine="pandas", workers=1, cur_batch_files=1,
+                       incremental=False, partition=False, cluster=False, sink=None):
+    cur_file_list = [file_fullpath for _, file_fullpath in list_report_files(mc_reports_directory, True)]
+
+    if sink is None:
+        sink = BigQuerySink(gcp_project_id, service_account_key)
+
+    # Create BQ dataset
+    sink.create_dataset(f"{gcp_project_id}.{bq_dataset_name}")
+
+    table_id = (f"{gcp_project_id}.{bq_dataset_name}.{bq_table}")
+    table_layout = bq_table_layout("cur", partition, cluster)
+
+    if incremental is True:
+        import_manifest = load_import_manifest(mc_reports_directory)
+        cur_file_hashes = {}
+        for file_fullpath in cur_file_list:
+            cur_file_hashes[os.path.relpath(file_fullpath, mc_reports_directory)] = report_file_hash(file_fullpath)
+
+        imported_files = {}
+        for file, manifest_entry in import_manifest["files"].items():
+            if manifest_entry["table_id"] == table_id:
+                imported_files[file] = manifest_entry
+
+        # Rows can only be appended, so a changed or removed file, a different sink or a different table layout
+        # (--partition/--cluster) means the whole table is reloaded
+        table_exists = sink.table_exists(table_id)
+        table_layout_changed = table_exists and sink.table_layout_changed(table_id, table_layout)
+        if table_exists and not table_layout_changed and \
+                all(import_manifest_entry_unchanged(manifest_entry, cur_file_hashes.get(file), table_id, sink,
+                                                    table_layout) for file, manifest_entry in imported_files.items()):
+            new_cur_file_list = []
+            for file_fullpath in cur_file_list:
+                if os.path.relpath(file_fullpath, mc_reports_directory) in imported_files:
+                    print(f"Skipping {os.path.basename(file_fullpath)} since it was already imported into {table_id}.")
+                else:
+                    new_cur_file_list.append(file_fullpath)
+            cur_file_list = new_cur_file_list
+        else:
+            if table_layout_changed:
+                print(f"Partitioning or clustering of {table_id} differs from the requested table layout, reloading "
+                      f"all files into {table_id}.")
+            elif len(imported_files) > 0:
+                print(f"AWS CUR files or their destination changed since the last import, reloading all files into "
+                      f"{table_id}.")
+            for file in imported_files.keys():
+                import_manifest["files"].pop(file)
+            sink.delete_table(table_id)
+    else:
+        # Deleting table first if exists
+        sink.delete_table(table_id)
+
+    # Group the CUR files into batches, each batch is loaded into BQ with a single load job
+    cur_file_batches = [[]]
+    for file_fullpath in cur_file_list:
+        if not profile_report_file(file_fullpath)["empty"]:
+            if len(cur_file_batches[-1]) >= cur_batch_files:
+                cur_file_batches.append([])
+            cur_file_batches[-1].append(file_fullpath)
+        else:
+            print(f"Skipping {os.path.basename(file_fullpath)} since there is no data in the file.")
+
+    if len(cur_file_batches[0]) > 0:
+        # First batch creates the table, the remaining batches are appended by up to "workers" load jobs at the same time
+        job_id = load_cur_files_into_bq(sink, cur_file_batches[0], table_id, parquet_staging, csv_engine,
+                                        table_layout)
+
+        if incremental is True:
+            for file_fullpath in cur_file_batches[0]:
+                record_import_manifest(import_manifest, mc_reports_directory, file_fullpath,
+                                       cur_file_hashes[os.path.relpath(file_fullpath, mc_reports_directory)],
+                                       table_id, sink, table_layout, job_id)
+            save_import_manifest(mc_reports_directory, import_manifest)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            cur_load_jobs = {}
+            for cur_file_batch in cur_file_batches[1:]:
+                cur_load_job = executor.submit(load_cur_files_into_bq, sink, cur_file_batch, table_id,
+                                               parquet_staging, csv_engine, table_layout)
+                cur_load_jobs[cur_load_job] = cur_file_batch
+
+            # Raise any errors from the load jobs & record the loaded files
+            for cur_load_job in concurrent.futures.as_completed(cur_load_jobs):
+                job_id = cur_load_job.result()
+
+                if incremental is True:
+                    for file_fullpath in cur_load_jobs[cur_load_job]:
+                        record_import_manifest(import_manifest, mc_reports_directory, file_fullpath,
+                                               cur_file_hashes[os.path.relpath(file_fullpath, mc_reports_directory)],
+                                               table_id, sink, table_layout, job_id)
+                    save_import_manifest(mc_reports_directory, import_manifest)
+
+        (num_rows, num_columns) = sink.table_size(table_id)
+        print(
+            "Loaded {} rows and {} columns to {}".format(
+                num_rows, num_columns, table_id
+            )
+        )
 
     print("Completed loading of AWS CUR Data into Big Query.\n")
 
@@ -2113,7 +3361,7 @@ def parse_cli_args():
     parser = argparse.ArgumentParser(prog='google-mc-c2c-data-import.py',
                                      usage='%(prog)s -d <mc report directory>\nThis creates an instance mapping between cloud providers and GCP')
     parser.add_argument('-d', metavar='Data Directory',
-                        help='Directory containing MC report output or AWS CUR data.',
+                        help='Directory containing MC report output or AWS CUR data. CSV files can be gzipped (.csv.gz) or inside .zip archives, AWS CUR can also be Parquet.',
                         required=True, )
     parser.add_argument('-c', metavar='Customer Name', help='Customer Name',
                         required=False, )
@@ -2137,10 +3385,48 @@ def parse_cli_args():
                         help='Do not import to BQ, use an existing BQ instance (-i) and only create connected Sheets & Looker artifacts.')
     parser.add_argument('-i', metavar='BQ Connect Info', required=False,
                         help='BQ Connection Info: Format is <GCP Project ID>.<BQ Dataset Name>.<BQ Table Prefix>, i.e. googleproject.bqdataset.bqtable_prefix')
+    parser.add_argument('--chunk-size', metavar='Rows', type=int, required=False,
+                        help='Stream Migration Center CSV files into Big Query in chunks of this many rows instead of reading whole files into memory.')
+    parser.add_argument('--parquet', action='store_true', required=False,
+                        help='Convert Migration Center & AWS CUR data to compressed Parquet files locally & upload those into Big Query.')
+    parser.add_argument('--csv-engine', metavar='Engine', choices=['pandas', 'pyarrow'], default='pandas', required=False,
+                        help='CSV parser for Big Query imports: pandas (default) or pyarrow (multi-threaded, uses the settings.json column types).')
+    parser.add_argument('--workers', metavar='Workers', type=int, default=1, required=False,
+                        help='Number of tasks run at the same time (default 1). One setting for all imports: Migration Center files parsed & loaded into Big Query, AWS CUR load jobs & data batches uploaded into Sheets.')
+    parser.add_argument('--sheets-batch-rows', metavar='Rows', type=int, default=10000, required=False,
+                        help='Number of rows per Sheets data upload request (default 10000).')
+    parser.add_argument('--sheets-upload', metavar='Mode', choices=['values', 'paste'], default='values', required=False,
+                        help='Sheets data upload: values (default, parsed rows) or paste (raw CSV text through pasteData requests, smaller payloads).')
+    parser.add_argument('--cur-batch-files', metavar='Files', type=int, default=1, required=False,
+                        help='Number of AWS CUR files to combine into each Big Query load job (default 1). Use with --workers to run load jobs at the same time.')
+    parser.add_argument('--incremental', action='store_true', required=False,
+                        help='Only import new or changed files into Big Query. File hashes & BQ tables are kept in a manifest in the data directory.')
+    parser.add_argument('--partition', action='store_true', required=False,
+                        help='Partition the AWS CUR BQ table by usage day.')
+    parser.add_argument('--cluster', action='store_true', required=False,
+                        help='Cluster the BQ tables on the columns used by the Sheets pivot tables & Looker reports.')
+    parser.add_argument('--aggregate', action='store_true', required=False,
+                        help='Sheets only: aggregate the MC data locally & only write the report tables to Sheets. No raw data worksheets & no 5 million cell limit.')
+    parser.add_argument('--sink', metavar='Sink', choices=['bigquery', 'duckdb'], default='bigquery', required=False,
+                        help='Destination for imported data: bigquery (default) or duckdb (local DuckDB database, see --duckdb-file).')
+    parser.add_argument('--duckdb-file', metavar='File', default='c2c-import.duckdb', required=False,
+                        help='DuckDB database file used with --sink duckdb (default c2c-import.duckdb).')
+    parser.add_argument('--sheets-quota', metavar='Requests', type=int, default=60, required=False,
+                        help='Sheets API read & write requests per minute (default 60, the per user quota). Lower it to share the quota between imports running at the same time.')
+    parser.add_argument('--sheets-template', metavar='Google Sheets ID', required=False,
+                        help='Connected Sheets only (-n): copy this previously created report Sheets & point its BQ data sources at the new BQ tables instead of building the report.')
+    parser.add_argument('--metrics', metavar='File', required=False,
+                        help='Write run metrics (time, rows & bytes per phase, Sheets/Drive API calls, BQ load jobs) as JSON to this file.')
+    parser.add_argument('--profile', metavar='Directory', required=False,
+                        help='Profile each pipeline stage (CSV sizing, parsing, BQ/Sheets uploads, sheet generation) with cProfile & tracemalloc. Writes pstats files & top allocation reports to this directory.')
     return parser.parse_args()
 
 
 def main():
+    if os.environ.get('USER') == 'root':
+        print("User root not allowed to run this application! Exiting...")
+        exit()
+
     args = parse_cli_args()
 
     enable_cur_import = args.a
@@ -2151,6 +3437,15 @@ def main():
     do_not_import_data = args.o
     bq_connection_info = args.i
 
+    if args.metrics is not None:
+        atexit.register(run_metrics.save, args.metrics)
+
+    if args.profile is not None:
+        stage_profiler.enable(args.profile)
+
+    api_quotas["sheets_read"] = args.sheets_quota
+    api_quotas["sheets_write"] = args.sheets_quota
+
     if args.r is not None:
         looker_template_id = args.r
     else:
@@ -2179,6 +3474,10 @@ def main():
         print("Migration Center Reports directory not defined, exiting!")
         exit()
 
+    if args.sheets_template is not None and connect_sheets_bq is False:
+        print("A Google Sheets template (--sheets-template) can only be used with Connected Sheets (-n)!")
+        exit()
+
     if connect_sheets_bq is True and (
             enable_bq_import is False and enable_cur_import is False and do_not_import_data is False):
         print("Must enable Big Query with -b or -a before creating a Connected BQ Google Sheets!")
@@ -2186,7 +3485,8 @@ def main():
 
     if enable_bq_import is not True and enable_cur_import is not True and do_not_import_data is not True:
 
-        check_csv_size(mc_reports_directory)
+        if args.aggregate is not True:
+            check_csv_size(mc_reports_directory)
 
         if sheets_emails is not None:
             sheets_email_addresses = sheets_emails.split(",")
@@ -2213,8 +3513,13 @@ def main():
         # import_mc_data_old(mc_reports_directory, spreadsheet, credentials)
         # worksheet_names = [mc_names["mapped"], mc_names["unmapped"]]
         worksheet_names = []
-        data_source = import_mc_data_sheets(mc_reports_directory, spreadsheet, credentials)
-        generate_mc_sheets(spreadsheet, worksheet_names, "SHEETS", data_source, mc_names["unmapped"])
+        if args.aggregate is True:
+            data_source = aggregate_mc_data(mc_reports_directory, args.chunk_size, args.csv_engine)
+            generate_mc_sheets(spreadsheet, worksheet_names, "LOCAL", data_source, None)
+        else:
+            data_source = import_mc_data_sheets(mc_reports_directory, spreadsheet, args.sheets_batch_rows, args.workers,
+                                                args.sheets_upload)
+            generate_mc_sheets(spreadsheet, worksheet_names, "SHEETS", data_source, mc_names["unmapped"])
 
         spreadsheet_url = 'https://docs.google.com/spreadsheets/d/%s' % spreadsheet.id
 
@@ -2239,6 +3544,15 @@ def main():
             for table in list(mc_names.keys()):
                 bq_tables.append(f'{bq_table_prefix}{table}')
 
+        if args.sink == "duckdb":
+            if display_looker == "Yes" or connect_sheets_bq is True or do_not_import_data is True:
+                print("Looker reports & Connected Sheets require the Big Query sink. Exiting!")
+                exit()
+
+            sink = DuckDBSink(args.duckdb_file)
+        else:
+            sink = None
+
         if do_not_import_data is False:
             print("Importing data into Big Query...")
             print(f"GCP Project ID: {gcp_project_id}")
@@ -2258,7 +3572,8 @@ def main():
             if enable_bq_import is True and enable_cur_import is False:
                 print("Migration Center Data import...")
                 import_mc_into_bq(mc_reports_directory, gcp_project_id, bq_dataset_name, bq_table_prefix,
-                                  service_account_key, customer_name)
+                                  service_account_key, customer_name, args.chunk_size, args.parquet, args.csv_engine,
+                                  args.workers, args.incremental, args.partition, args.cluster, sink)
 
             if enable_bq_import is True and enable_cur_import is True:
                 print("Unable to import Migration Center & AWS CUR data at the same time. Please do each separately.")
@@ -2268,7 +3583,8 @@ def main():
                 print("AWS CUR import...")
                 import_cur_into_bq(mc_reports_directory, gcp_project_id, bq_dataset_name, bq_table_prefix,
                                    service_account_key,
-                                   customer_name)
+                                   customer_name, args.parquet, args.csv_engine, args.workers,
+                                   args.cur_batch_files, args.incremental, args.partition, args.cluster, sink)
 
         if do_not_import_data is True:
             if enable_bq_import is not True and enable_cur_import is not True:
@@ -2305,33 +3621,54 @@ def main():
             else:
                 sheets_id = ""
 
+            if args.sheets_template is not None:
+                template_id = args.sheets_template
+            else:
+                template_id = ""
+
             # Create New Google Sheet
             spreadsheet, credentials = create_google_sheets(customer_name, sheets_email_addresses, service_account_key,
-                                                            sheets_id)
+                                                            sheets_id, template_id)
+
+            if template_id != "" and sheets_id == "":
+                # Copied report already has its worksheets, only point the data sources at the new BQ tables
+                data_sources = spreadsheet.fetch_sheet_metadata({"fields": "dataSources"}).get("dataSources", [])
+
+                sheets_requests = SheetsRequestBatch(spreadsheet)
+                sheets_requests.add(rebind_bq_data_sources_request(data_sources, gcp_project_id, bq_dataset_name,
+                                                                   bq_table_prefix, bq_tables))
+                sheets_requests.add(refresh_data_sources_body)
+                sheets_requests.execute()
+
+                spreadsheet_url = "https://docs.google.com/spreadsheets/d/%s" % spreadsheet.id
+
+                print("Migration Center Sheets: " + spreadsheet_url)
+                return
 
             data_source_ids = []
             worksheet_names = []
             unmapped_worksheet_name = ""
 
-            # Connect each BG Table to a Worksheet
+            # Connect each BG Table to a Worksheet, all in one batch
+            sheets_requests = SheetsRequestBatch(spreadsheet)
             for bq_table in bq_tables:
-                response = spreadsheet.batch_update(connect_bq_to_sheets(gcp_project_id, bq_dataset_name, bq_table))
-                bq_table_worksheet_id = spreadsheet.worksheet(bq_table)
+                sheets_requests.add(connect_bq_to_sheets(gcp_project_id, bq_dataset_name, bq_table))
+            response = sheets_requests.execute()
 
+            for bq_table_index, bq_table in enumerate(bq_tables):
                 if do_not_import_data is True:
+                    bq_table_worksheet_id = get_sheets_metadata(spreadsheet).worksheet(bq_table)
                     worksheet_names.append(bq_table_worksheet_id)
 
                 # Autosize first cols in BQ table worksheet
                 # res = spreadsheet.batch_update(autosize_worksheet(bq_table_worksheet_id, 0, 10))
 
                 # Get dataource ID from batch update response
-                data_source_ids.append(response['replies'][0]['addDataSource']['dataSource']['dataSourceId'])
+                data_source = response['replies'][bq_table_index]['addDataSource']['dataSource']
+                data_source_ids.append(data_source['dataSourceId'])
                 # print(response)
-                if 'unmapped' in response['replies'][0]['addDataSource']['dataSource']['spec']['bigQuery']['tableSpec'][
-                    'tableId']:
-                    unmapped_worksheet_name = \
-                        response['replies'][0]['addDataSource']['dataSource']['spec']['bigQuery']['tableSpec'][
-                            'tableId']
+                if 'unmapped' in data_source['spec']['bigQuery']['tableSpec']['tableId']:
+                    unmapped_worksheet_name = data_source['spec']['bigQuery']['tableSpec']['tableId']
 
             # pivot_table_location = [0, 0]
             if enable_bq_import is True:
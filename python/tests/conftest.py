@@ -0,0 +1,16 @@
+import importlib.util
+import os
+
+import pytest
+
+script_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# The import script, it isn't importable by name because of the dashes in the file name
+@pytest.fixture(scope="session")
+def c2c():
+    spec = importlib.util.spec_from_file_location("c2c_data_import",
+                                                  os.path.join(script_directory, "google-mc-c2c-data-import.py"))
+    c2c = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(c2c)
+    return c2c
@@ -0,0 +1,49 @@
+import csv
+import io
+import types
+
+import pandas as pd
+from google.auth.credentials import AnonymousCredentials
+from google.cloud import bigquery
+
+
+# BQ client that serializes dataframes like the real client, the load job reads the uploaded CSV the way BQ does
+class CsvLoadClient(bigquery.Client):
+    def __init__(self):
+        super().__init__(project="project", credentials=AnonymousCredentials())
+        self.load_jobs = []
+
+    def load_table_from_file(self, file_obj, destination, job_config=None, **kwargs):
+        data = file_obj.read()
+        rows = list(csv.reader(io.StringIO(data.decode("utf-8"), newline="")))
+        job = types.SimpleNamespace(job_id=f"job_{len(self.load_jobs)}", job_config=job_config,
+                                    output_rows=len(rows) - (job_config.skip_leading_rows or 0),
+                                    input_file_bytes=len(data), result=lambda: None)
+        self.load_jobs.append(job)
+        return job
+
+
+def bigquery_sink(c2c, monkeypatch):
+    client = CsvLoadClient()
+    monkeypatch.setattr(c2c, "google_auth", lambda service_account_key, scope: None)
+    monkeypatch.setattr(c2c.os, "system", lambda command: 0)
+    monkeypatch.setattr(c2c.bigquery, "Client", lambda: client)
+    return c2c.BigQuerySink("project", ""), client
+
+
+def test_load_dataframe_loads_every_source_row(c2c, monkeypatch, tmp_path):
+    source_file = tmp_path / "mapped.csv"
+    source_file.write_text('Region,Description,GCP_Cost\n'
+                           'us-east-1,"Compute Engine, n2",1.5\n'
+                           'us-west-2,"multi\nline",2\n'
+                           'eu-west-1,plain,3.25\n')
+    with open(source_file, newline="") as f:
+        source_rows = len(list(csv.reader(f))) - 1
+
+    sink, client = bigquery_sink(c2c, monkeypatch)
+    dataframe = pd.read_csv(source_file)
+    sink.load_dataframe(dataframe, "project.dataset.mapped", bigquery.WriteDisposition.WRITE_TRUNCATE, {},
+                        {"Region": "STRING", "Description": "STRING", "GCP_Cost": "FLOAT64"})
+
+    assert client.load_jobs[0].job_config.skip_leading_rows is None
+    assert client.load_jobs[0].output_rows == source_rows == 3
@@ -0,0 +1,70 @@
+import hashlib
+import os
+import types
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+bigquery_sink = types.SimpleNamespace(destination="bigquery")
+duckdb_sink = types.SimpleNamespace(destination="duckdb:/tmp/c2c.duckdb")
+table_layout = {"clustering_fields": ["lineItem_ProductCode"]}
+
+
+def test_load_import_manifest_missing(c2c, tmp_path):
+    assert c2c.load_import_manifest(str(tmp_path)) == {"files": {}}
+
+
+def test_import_manifest_round_trip(c2c, tmp_path):
+    file_fullpath = tmp_path / "cur" / "cur-00001.csv"
+    file_fullpath.parent.mkdir()
+    file_fullpath.write_bytes(b"identity_LineItemId,lineItem_UnblendedCost\n1,1.5\n2,2\n")
+    file_hash = c2c.report_file_hash(str(file_fullpath))
+
+    import_manifest = c2c.load_import_manifest(str(tmp_path))
+    c2c.record_import_manifest(import_manifest, str(tmp_path), str(file_fullpath), file_hash, "p.ds.cur",
+                               bigquery_sink, table_layout, "job_1")
+    c2c.save_import_manifest(str(tmp_path), import_manifest)
+
+    # Saved through a temporary file that replaces the manifest
+    assert sorted(os.listdir(tmp_path)) == sorted(["cur", c2c.import_manifest_file_name])
+    manifest_entry = c2c.load_import_manifest(str(tmp_path))["files"][os.path.join("cur", "cur-00001.csv")]
+    assert manifest_entry["hash"] == file_hash
+    assert manifest_entry["size"] == file_fullpath.stat().st_size
+    assert manifest_entry["rows"] == 2
+    assert manifest_entry["table_id"] == "p.ds.cur"
+    assert manifest_entry["sink"] == "bigquery"
+    assert manifest_entry["table_layout"] == table_layout
+    assert manifest_entry["job_id"] == "job_1"
+    assert c2c.import_manifest_entry_unchanged(manifest_entry, file_hash, "p.ds.cur", bigquery_sink, table_layout)
+
+
+def test_import_manifest_entry_unchanged(c2c):
+    manifest_entry = {"hash": "blake2b:1", "table_id": "p.ds.cur", "sink": "bigquery", "table_layout": table_layout}
+
+    assert c2c.import_manifest_entry_unchanged(manifest_entry, "blake2b:1", "p.ds.cur", bigquery_sink, table_layout)
+    assert not c2c.import_manifest_entry_unchanged(None, "blake2b:1", "p.ds.cur", bigquery_sink, table_layout)
+    assert not c2c.import_manifest_entry_unchanged(manifest_entry, "blake2b:2", "p.ds.cur", bigquery_sink,
+                                                   table_layout)
+    assert not c2c.import_manifest_entry_unchanged(manifest_entry, "blake2b:1", "p.ds.cur2", bigquery_sink,
+                                                   table_layout)
+    assert not c2c.import_manifest_entry_unchanged(manifest_entry, "blake2b:1", "p.ds.cur", duckdb_sink,
+                                                   table_layout)
+    assert not c2c.import_manifest_entry_unchanged(manifest_entry, "blake2b:1", "p.ds.cur", bigquery_sink, {})
+
+    # Entries written before the sink & table layout were recorded
+    old_manifest_entry = {"hash": "blake2b:1", "table_id": "p.ds.cur"}
+    assert not c2c.import_manifest_entry_unchanged(old_manifest_entry, "blake2b:1", "p.ds.cur", bigquery_sink, {})
+
+
+def test_report_file_hash(c2c, tmp_path):
+    (tmp_path / "a.csv").write_bytes(b"ID,Cost\n1,1.5\n")
+    (tmp_path / "b.csv").write_bytes(b"ID,Cost\n1,1.5\n")
+    (tmp_path / "c.csv").write_bytes(b"ID,Cost\n1,2.5\n")
+
+    assert c2c.report_file_hash(str(tmp_path / "a.csv")) == c2c.report_file_hash(str(tmp_path / "b.csv"))
+    assert c2c.report_file_hash(str(tmp_path / "a.csv")) != c2c.report_file_hash(str(tmp_path / "c.csv"))
+
+    parquet_file = tmp_path / "cur.parquet"
+    pq.write_table(pa.table({"ID": ["1"], "Cost": [1.5]}), parquet_file)
+    assert c2c.report_file_hash(str(parquet_file)) == \
+        f"blake2b:{hashlib.blake2b(parquet_file.read_bytes(), digest_size=16).hexdigest()}"
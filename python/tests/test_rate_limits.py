@@ -0,0 +1,97 @@
+import requests
+
+
+# Clock for TokenBucket, sleeping moves the time forward
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+# Session that answers requests with the given responses in order
+class FakeSession:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def request(self, *args, **kwargs):
+        self.calls += 1
+        return self.responses.pop(0)
+
+    get = post = put = request
+
+
+def response(status_code, headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    response._content = b"{}"
+    return response
+
+
+def fake_clock(c2c, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(c2c.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(c2c.time, "sleep", clock.sleep)
+    return clock
+
+
+def test_token_bucket_allows_a_burst_of_capacity(c2c, monkeypatch):
+    clock = fake_clock(c2c, monkeypatch)
+    bucket = c2c.TokenBucket(60)
+
+    assert bucket.capacity == 10
+    for _ in range(10):
+        bucket.acquire()
+    assert clock.sleeps == []
+
+    bucket.acquire()
+    assert clock.sleeps == [1.0]
+
+
+def test_token_bucket_refills_at_the_rate(c2c, monkeypatch):
+    clock = fake_clock(c2c, monkeypatch)
+    bucket = c2c.TokenBucket(120)
+    for _ in range(int(bucket.capacity)):
+        bucket.acquire()
+
+    clock.now += 1.5
+    for _ in range(3):
+        bucket.acquire()
+    assert clock.sleeps == []
+
+    clock.now += 60
+    bucket.acquire()
+    assert bucket.tokens == bucket.capacity - 1
+
+
+def test_token_bucket_holds_at_least_one_token(c2c, monkeypatch):
+    clock = fake_clock(c2c, monkeypatch)
+    bucket = c2c.TokenBucket(3)
+
+    assert bucket.capacity == 1
+    bucket.acquire()
+    assert clock.sleeps == []
+
+    bucket.acquire()
+    assert clock.sleeps == [20.0]
+
+
+def test_retry_after_is_capped_at_max_backoff(c2c, monkeypatch):
+    clock = fake_clock(c2c, monkeypatch)
+    monkeypatch.setattr(c2c, "api_rate_limiters", {})
+    session = FakeSession([response(429, {"Retry-After": "3600"}), response(200)])
+    client = c2c.rate_limited_client_class()(None, session=session)
+
+    client.request("post", c2c.gspread.urls.SPREADSHEETS_API_V4_BASE_URL + "/id:batchUpdate",
+                   json={"requests": [{}]})
+
+    assert session.calls == 2
+    assert clock.sleeps == [c2c.api_max_backoff]
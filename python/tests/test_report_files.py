@@ -0,0 +1,65 @@
+import gzip
+import hashlib
+
+
+def write_report(path, content):
+    if path.name.endswith(".gz"):
+        with gzip.open(path, "wb") as f:
+            f.write(content)
+    else:
+        path.write_bytes(content)
+    return str(path)
+
+
+# Counts the times a report file is opened
+def count_opens(c2c, monkeypatch):
+    opens = []
+    open_report_file = c2c.open_report_file
+
+    def counting_open_report_file(file_fullpath):
+        opens.append(file_fullpath)
+        return open_report_file(file_fullpath)
+
+    monkeypatch.setattr(c2c, "open_report_file", counting_open_report_file)
+    return opens
+
+
+def test_profile_report_file_single_pass(c2c, monkeypatch, tmp_path):
+    content = (b'ID,"Multi\nline name",Cost\n'
+               b'1,"a, b",1.5\n'
+               b'\n'
+               b'2,"quoted\n\nnewlines",2\n'
+               b'3,plain,3\n')
+    file_fullpath = write_report(tmp_path / "mapped.csv", content)
+    opens = count_opens(c2c, monkeypatch)
+
+    profile = c2c.profile_report_file(file_fullpath)
+
+    assert opens == [file_fullpath]
+    assert profile["header"] == ["ID", "Multi\nline name", "Cost"]
+    assert profile["num_columns"] == 3
+    assert profile["num_rows"] == 3
+    assert profile["num_bytes"] == len(content)
+    assert profile["empty"] is False
+    assert profile["hash"] == f"blake2b:{hashlib.blake2b(content, digest_size=16).hexdigest()}"
+
+    # The manifest hash comes from the same pass
+    assert c2c.report_file_hash(file_fullpath) == profile["hash"]
+    assert opens == [file_fullpath]
+
+
+def test_profile_report_file_gzip(c2c, tmp_path):
+    content = b'ID,Cost\n1,1.5\n2,2\n'
+    csv_profile = c2c.profile_report_file(write_report(tmp_path / "plain.csv", content))
+    gzip_profile = c2c.profile_report_file(write_report(tmp_path / "compressed.csv.gz", content))
+
+    assert gzip_profile == csv_profile
+    assert gzip_profile["num_rows"] == 2
+
+
+def test_profile_report_file_header_only(c2c, tmp_path):
+    profile = c2c.profile_report_file(write_report(tmp_path / "unmapped.csv", b'ID,Cost\n\n'))
+
+    assert profile["header"] == ["ID", "Cost"]
+    assert profile["num_rows"] == 0
+    assert profile["empty"] is True
@@ -0,0 +1,88 @@
+import json
+
+max_bytes = 4096
+
+
+# Spreadsheet that records the batchUpdate bodies it receives
+class FakeSpreadsheet:
+    def __init__(self):
+        self.id = f"fake-spreadsheet-{id(self)}"
+        self.batch_updates = []
+
+    def batch_update(self, body):
+        self.batch_updates.append(body)
+        replies = []
+        for request in body["requests"]:
+            if "addSheet" in request:
+                replies.append({"addSheet": {"properties": request["addSheet"]["properties"]}})
+            else:
+                replies.append({})
+        return {"spreadsheetId": self.id, "replies": replies}
+
+
+def update_cells_request(sheet_id, row_index, num_rows, num_columns):
+    rows = []
+    for row in range(num_rows):
+        rows.append({"values": [{"userEnteredValue": {"stringValue": f"r{row}c{column}" + "x" * 20}}
+                                for column in range(num_columns)]})
+    return {"updateCells": {"rows": rows, "start": {"sheetId": sheet_id, "rowIndex": row_index, "columnIndex": 1},
+                            "fields": "userEnteredValue"}}
+
+
+def test_requests_under_the_limit_are_sent_together(c2c, monkeypatch):
+    monkeypatch.setattr(c2c, "sheets_batch_max_bytes", max_bytes)
+    spreadsheet = FakeSpreadsheet()
+    sheets_requests = c2c.SheetsRequestBatch(spreadsheet)
+    sheet_id = sheets_requests.add_worksheet("Overview", 10, 5)
+    sheets_requests.add({"requests": [update_cells_request(sheet_id, 0, 2, 2)]})
+    sheets_requests.delete_worksheet(0)
+
+    response = sheets_requests.execute()
+
+    assert len(spreadsheet.batch_updates) == 1
+    assert len(response["replies"]) == 3
+    assert sheets_requests.requests == []
+
+
+def test_requests_are_split_into_batches_in_order(c2c, monkeypatch):
+    monkeypatch.setattr(c2c, "sheets_batch_max_bytes", max_bytes)
+    spreadsheet = FakeSpreadsheet()
+    sheets_requests = c2c.SheetsRequestBatch(spreadsheet)
+    sheet_id = sheets_requests.add_worksheet("Overview", 10, 5)
+    requests = [update_cells_request(sheet_id, row_index, 1, 10) for row_index in range(40)]
+    sheets_requests.add({"requests": requests})
+
+    response = sheets_requests.execute()
+
+    assert len(spreadsheet.batch_updates) > 1
+    assert all(len(json.dumps(x)) <= max_bytes for x in spreadsheet.batch_updates)
+    sent_requests = [x for body in spreadsheet.batch_updates for x in body["requests"]]
+    assert sent_requests[1:] == requests
+    assert len(response["replies"]) == len(sent_requests)
+    assert "addSheet" in response["replies"][0]
+
+
+def test_oversized_update_cells_is_split_into_row_ranges(c2c, monkeypatch):
+    monkeypatch.setattr(c2c, "sheets_batch_max_bytes", max_bytes)
+    spreadsheet = FakeSpreadsheet()
+    sheets_requests = c2c.SheetsRequestBatch(spreadsheet)
+    sheet_id = sheets_requests.add_worksheet("Overview", 10, 5)
+    request = update_cells_request(sheet_id, 3, 200, 4)
+    sheets_requests.add({"requests": [request]})
+
+    # The new worksheet grows to fit the cells: rows 3-202 & columns B-E
+    grid_properties = sheets_requests.requests[0]["addSheet"]["properties"]["gridProperties"]
+    assert grid_properties == {"rowCount": 203, "columnCount": 5}
+
+    sheets_requests.execute()
+
+    assert all(len(json.dumps(x)) <= max_bytes for x in spreadsheet.batch_updates)
+    update_cells = [x["updateCells"] for body in spreadsheet.batch_updates for x in body["requests"]
+                    if "updateCells" in x]
+    assert len(update_cells) > 1
+    row_index = 3
+    for x in update_cells:
+        assert x["start"] == {"sheetId": sheet_id, "rowIndex": row_index, "columnIndex": 1}
+        assert x["fields"] == "userEnteredValue"
+        row_index += len(x["rows"])
+    assert [row for x in update_cells for row in x["rows"]] == request["updateCells"]["rows"]
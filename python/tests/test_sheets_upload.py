@@ -0,0 +1,54 @@
+import csv
+import io
+import types
+
+import pytest
+
+# Blank lines, a whitespace only line & quoted values spanning lines, one of them with an empty line inside
+csv_content = ('ID,Description,Cost\n'
+               '1,plain,1.5\n'
+               '\n'
+               '2,"two\nlines",2\n'
+               '   \n'
+               '3,"empty\n\nline inside",3\n'
+               '4,"a, b",4\n'
+               '\n'
+               '5,last,5\n'
+               '\n')
+
+
+# Spreadsheet that records the rows written by each upload request
+class FakeSpreadsheet:
+    def __init__(self):
+        self.uploads = []
+
+    def values_update(self, value_range, params=None, body=None):
+        self.uploads.append((int(value_range.split("!A")[1]), body["values"]))
+
+    def batch_update(self, body):
+        paste_data = body["requests"][0]["pasteData"]
+        rows = list(csv.reader(io.StringIO(paste_data["data"], newline="")))
+        self.uploads.append((paste_data["coordinate"]["rowIndex"] + 1, rows))
+
+
+@pytest.mark.parametrize("upload_mode", ["values", "paste"])
+def test_upload_sheets_csv_fills_the_profiled_rows(c2c, tmp_path, upload_mode):
+    file_fullpath = tmp_path / "mapped.csv"
+    file_fullpath.write_text(csv_content)
+    profile = c2c.profile_report_file(str(file_fullpath))
+    worksheet = types.SimpleNamespace(title="GCP Mapped Data", _properties={"sheetId": 1})
+    spreadsheet = FakeSpreadsheet()
+
+    c2c.upload_sheets_csv(spreadsheet, worksheet, str(file_fullpath), 2, 2, upload_mode)
+
+    # The worksheet is sized for the header & num_rows rows, the uploads fill rows 1 to num_rows + 1 without gaps
+    assert profile["num_rows"] == 5
+    next_row = 1
+    rows = []
+    for start_row, upload_rows in sorted(spreadsheet.uploads):
+        assert start_row == next_row
+        next_row += len(upload_rows)
+        rows += upload_rows
+    assert next_row - 1 == profile["num_rows"] + 1
+    assert [x[0] for x in rows] == ["ID", "1", "2", "3", "4", "5"]
+    assert rows[3] == ["3", "empty\n\nline inside", "3"]
@@ -0,0 +1,65 @@
+import concurrent.futures
+import os
+import pstats
+import tracemalloc
+
+import pytest
+
+
+def outer_work():
+    return sum(range(1000))
+
+
+def inner_work():
+    return [str(number) for number in range(1000)]
+
+
+def worker_work():
+    return sorted(range(1000), reverse=True)
+
+
+@pytest.fixture
+def profiler(c2c, tmp_path):
+    profiler = c2c.StageProfiler()
+    profiler.enable(str(tmp_path))
+    yield profiler
+    tracemalloc.stop()
+
+
+def profiled_functions(directory, stage_file_name):
+    stats = pstats.Stats(os.path.join(directory, f"{stage_file_name}.pstats"))
+    return {function_name for (_, _, function_name) in stats.stats}
+
+
+def test_nested_stages_get_their_own_profile(profiler, tmp_path):
+    with profiler.profile("outer"):
+        outer_work()
+        with profiler.profile("inner"):
+            inner_work()
+        outer_work()
+
+    assert sorted(os.listdir(tmp_path)) == ["01-outer-allocations.txt", "01-outer-functions.txt", "01-outer.pstats",
+                                            "02-inner-allocations.txt", "02-inner-functions.txt", "02-inner.pstats"]
+
+    inner_functions = profiled_functions(tmp_path, "02-inner")
+    assert "inner_work" in inner_functions
+    assert "outer_work" not in inner_functions
+    assert {"outer_work", "inner_work"} <= profiled_functions(tmp_path, "01-outer")
+
+
+def test_stages_of_worker_threads_are_profiled(profiler, tmp_path):
+    def worker():
+        with profiler.profile("worker"):
+            worker_work()
+        inner_work()
+
+    with profiler.profile("outer"):
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+            for future in [executor.submit(worker) for _ in range(2)]:
+                future.result()
+
+    worker_functions = profiled_functions(tmp_path, "02-worker")
+    assert "worker_work" in worker_functions
+    assert "inner_work" not in worker_functions
+    assert {"worker_work", "inner_work"} <= profiled_functions(tmp_path, "01-outer")
+    assert profiler.running == []